@@ -71,6 +71,44 @@ def calculate_ai_score(trainset):
 
     return score, reasons
 
+
+# Reason bits returned by calculate_ai_scores, in the order calculate_ai_score lists them
+REASON_INVALID_FITNESS = 1
+REASON_OPEN_JOB_CARDS = 2
+REASON_HIGH_WEAR = 4
+REASON_REQUIRES_CLEANING = 8
+REASON_RELIABILITY = 16
+REASON_BRANDING_DEFICIT = 32
+
+
+def calculate_ai_scores(trainsets):
+    """
+    Batch version of calculate_ai_score for a whole fleet.
+    Returns: (scores: int array, reason_bits: int array)
+    """
+    overall_valid = np.array([bool(t['fitness']['overall_valid']) for t in trainsets], dtype=bool)
+    open_jobs = np.array([t['job_cards']['open'] for t in trainsets], dtype=np.int64)
+    wear_avg = np.array([sum(t['mileage']['component_wear'].values()) for t in trainsets], dtype=float) / 3
+    needs_cleaning = np.array([t['cleaning']['interior_status'] != "Clean" or t['cleaning']['exterior_status'] != "Clean"
+                               for t in trainsets], dtype=bool)
+    reliability = np.array([t['operational']['reliability_score'] for t in trainsets], dtype=np.int64)
+    exposure_deficit = np.array([t['branding']['exposure_deficit'] for t in trainsets], dtype=np.int64)
+
+    invalid = ~overall_valid
+    has_jobs = open_jobs > 0
+    high_wear = wear_avg > 70
+    deficit = exposure_deficit > 10
+
+    score = (100 - 30 * invalid - np.where(has_jobs, np.minimum(20, open_jobs * 5), 0)
+             - 20 * high_wear - 10 * needs_cleaning - 10 * deficit
+             + np.floor_divide(reliability - 70, 2))
+    reason_bits = (REASON_INVALID_FITNESS * invalid | REASON_OPEN_JOB_CARDS * has_jobs |
+                   REASON_HIGH_WEAR * high_wear | REASON_REQUIRES_CLEANING * needs_cleaning |
+                   REASON_RELIABILITY | REASON_BRANDING_DEFICIT * deficit)
+
+    return np.clip(score, 0, 100).astype(np.int64), reason_bits.astype(np.int64)
+
+
 # -----------------------
 # Enhanced Data Generation & Simulation
 # -----------------------
@@ -205,17 +243,16 @@ class KMRLDataSimulator:
         """
         Generate a more realistic dataset with correlated patterns
         """
-        trainsets = []
         simulator = KMRLDataSimulator(n)
-        
-        for i in range(1, n + 1):
-            trainset_id = f"KMRL-{str(i).zfill(3)}"
-            trainset = simulator.generate_synthetic_trainset(trainset_id, historical_patterns)
-            
-            # AI scoring
-            ai_score, reasons = calculate_ai_score(trainset)
+        trainsets = [simulator.generate_synthetic_trainset(f"KMRL-{str(i).zfill(3)}", historical_patterns)
+                     for i in range(1, n + 1)]
+
+        # AI scoring for the whole fleet at once
+        scores, reason_bits = calculate_ai_scores(trainsets)
+
+        for trainset, ai_score, bits in zip(trainsets, scores.tolist(), reason_bits.tolist()):
             trainset['ai_score'] = ai_score
-            trainset['score_reasons'] = reasons
+            trainset['score_reason_bits'] = bits
 
             # Recommendation assignment
             if ai_score < 30 or trainset['operational']['status'] == 'IBL' or trainset['job_cards']['open'] > 2:
@@ -225,8 +262,6 @@ class KMRLDataSimulator:
             else:
                 trainset['recommendation'] = 'Standby'
 
-            trainsets.append(trainset)
-
         # Sort descending by ai_score
         trainsets.sort(key=lambda x: x['ai_score'], reverse=True)
         return trainsets
@@ -426,57 +461,56 @@ class PredictiveMaintenanceModel:
         if not self.is_trained or self.model is None:
             return self._fallback_predictions(trainsets)
             
-        predictions = []
-        for trainset in trainsets:
+        # Feature matrix for the whole fleet; rows with missing features get NaN
+        now = datetime.now()
+        features = np.array([self._feature_vector(t, now) for t in trainsets], dtype=float).reshape(len(trainsets), 9)
+        missing = ~np.isfinite(features).all(axis=1)
+        complete = ~missing
+        
+        predictions = pd.DataFrame({'trainset_id': [t['id'] for t in trainsets], 'risk_score': np.nan,
+                                    'days_until_maintenance': np.nan, 'recommended_action': None,
+                                    'priority': None, 'confidence': None})
+        if complete.any():
             try:
-                # Prepare features for prediction
-                features = np.array([[
-                    trainset['mileage']['total_km'],
-                    trainset['mileage']['since_maintenance'],
-                    sum(trainset['mileage']['component_wear'].values()) / 3,
-                    trainset['job_cards']['open'],
-                    1 if trainset['fitness']['rolling_stock'] else 0,
-                    1 if trainset['fitness']['signalling'] else 0,
-                    1 if trainset['fitness']['telecom'] else 0,
-                    (trainset['operational']['last_service'] - datetime.now()).days if trainset['operational']['last_service'] else 30,
-                    trainset['operational']['reliability_score']
-                ]])
-                
-                # Scale and predict
-                features_scaled = self.scaler.transform(features)
-                days_until_maintenance = self.model.predict(features_scaled)[0]
-                
-                # Calculate risk score
-                risk_score = min(100, max(0, 100 - (days_until_maintenance / 30 * 100)))
-                
-                # Determine recommendation
-                if risk_score > 75:
-                    action = 'Schedule Immediately'
-                    priority = 'High'
-                elif risk_score > 50:
-                    action = 'Schedule Soon'
-                    priority = 'Medium'
-                elif risk_score > 25:
-                    action = 'Monitor Closely'
-                    priority = 'Low'
-                else:
-                    action = 'OK'
-                    priority = 'None'
-                
-                predictions.append({
-                    'trainset_id': trainset['id'],
-                    'risk_score': round(risk_score, 1),
-                    'days_until_maintenance': round(max(0, days_until_maintenance), 1),
-                    'recommended_action': action,
-                    'priority': priority,
-                    'confidence': 'High' if self.is_trained else 'Low'
-                })
-                
+                # Scale and predict in one call each
+                days_until_maintenance = self.model.predict(self.scaler.transform(features[complete]))
             except Exception as e:
-                # Fallback if prediction fails
-                predictions.append(self._fallback_prediction(trainset))
-                
-        return pd.DataFrame(predictions)
+                warnings.warn(f"Maintenance model prediction failed, using heuristic predictions for the whole fleet: {e}",
+                              RuntimeWarning)
+                return self._fallback_predictions(trainsets)
+            
+            # Risk score and recommendation bands
+            risk_score = np.clip(100 - days_until_maintenance / 30 * 100, 0, 100)
+            bands = [risk_score > 75, risk_score > 50, risk_score > 25]
+            predictions.loc[complete, 'risk_score'] = np.round(risk_score, 1)
+            predictions.loc[complete, 'days_until_maintenance'] = np.round(np.maximum(0, days_until_maintenance), 1)
+            predictions.loc[complete, 'recommended_action'] = np.select(
+                bands, ['Schedule Immediately', 'Schedule Soon', 'Monitor Closely'], 'OK')
+            predictions.loc[complete, 'priority'] = np.select(bands, ['High', 'Medium', 'Low'], 'None')
+            predictions.loc[complete, 'confidence'] = 'High'
+            
+        # Heuristic fallback only for rows the model cannot score
+        for i in np.flatnonzero(missing).tolist():
+            predictions.loc[i] = self._fallback_prediction(trainsets[i])
+            
+        return predictions
+    
+    def _feature_vector(self, trainset, now):
+        """Model inputs for one trainset, or NaNs if a feature is missing"""
+        try:
+            return [
+                trainset['mileage']['total_km'],
+                trainset['mileage']['since_maintenance'],
+                sum(trainset['mileage']['component_wear'].values()) / 3,
+                trainset['job_cards']['open'],
+                1 if trainset['fitness']['rolling_stock'] else 0,
+                1 if trainset['fitness']['signalling'] else 0,
+                1 if trainset['fitness']['telecom'] else 0,
+                (trainset['operational']['last_service'] - now).days if trainset['operational']['last_service'] else 30,
+                trainset['operational']['reliability_score']
+            ]
+        except (KeyError, TypeError):
+            return [np.nan] * 9
     
     def _fallback_predictions(self, trainsets):
         """Fallback predictions when model is not trained"""
@@ -608,12 +642,13 @@ class RealTimeDataIntegrator:
         trainsets, updates = self.connect_to_fitness_db(trainsets)
         total_updates += updates
         
-        # Recalculate scores after updates
-        for trainset in trainsets:
-            score, reasons = calculate_ai_score(trainset)
+        # Recalculate scores after updates; reason strings are decoded only when shown
+        scores, reason_bits = calculate_ai_scores(trainsets)
+        for trainset, score, bits in zip(trainsets, scores.tolist(), reason_bits.tolist()):
             trainset['ai_score'] = score
-            trainset['score_reasons'] = reasons
-            
+            trainset['score_reason_bits'] = bits
+
+
         return trainsets, total_updates
 # -----------------------
 # Alert & Notification System
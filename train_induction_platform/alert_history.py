@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_HISTORY_PATH = os.environ.get('KMRL_ALERT_HISTORY',
+                                      os.path.join(os.path.expanduser('~'), '.local', 'share',
+                                                   'train_induction_platform', 'alerts.sqlite3'))
+
+# One row per alert occurrence: opened when a rule trips, closed (resolved_at set) when it clears.
+# Timestamps are epoch seconds so range scans stay on the indexes; alert_hourly keeps opened counts
+# per (hour, type) up to date on insert so hourly summaries never scan the alerts themselves.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    row_id INTEGER PRIMARY KEY,
+    alert_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    trainset_id TEXT,
+    message TEXT,
+    value REAL,
+    opened_at REAL NOT NULL,
+    acknowledged_at REAL,
+    resolved_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_trainset ON alerts (trainset_id, opened_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts (type, opened_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_priority ON alerts (priority, opened_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_opened ON alerts (opened_at, type);
+CREATE INDEX IF NOT EXISTS idx_alerts_open ON alerts (priority, alert_id) WHERE resolved_at IS NULL;
+CREATE TABLE IF NOT EXISTS alert_hourly (
+    hour INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, type)
+) WITHOUT ROWID;
+"""
+COLUMNS = ['row_id', 'alert_id', 'type', 'priority', 'trainset_id', 'message', 'value', 'opened_at',
+           'acknowledged_at', 'resolved_at']
+
+def _epoch(timestamp):
+    return timestamp.timestamp() if isinstance(timestamp, datetime) else timestamp
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class AlertHistory:
+    """
+    Persistent alert history in SQLite (WAL mode, so the UI can read while a run writes).
+    AlertManager calls record_run once per check with the alerts that opened and resolved, which is
+    written in a single transaction; acknowledgements update the open row in place.
+    """
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_HISTORY_PATH
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Streamlit reruns on different threads; one shared connection guarded by a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+    def record_run(self, opened, resolved, timestamp=None):
+        """Insert newly opened alerts and close resolved ones in one transaction"""
+        resolved_at = _epoch(timestamp or datetime.now())
+        rows = [(alert['id'], alert['type'], alert['priority'],
+                 None if alert['trainset_id'] is None else str(alert['trainset_id']), alert['message'],
+                 _number(alert.get('value')), _epoch(alert['timestamp'])) for alert in opened]
+        hourly = Counter((int(row[6] // 3600), row[1]) for row in rows)
+        with self.lock, self.conn:
+            self.conn.executemany('INSERT INTO alerts (alert_id, type, priority, trainset_id, message, value, opened_at) '
+                                  'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.conn.executemany('UPDATE alerts SET resolved_at = ?, value = ? WHERE alert_id = ? AND priority = ? '
+                                  'AND resolved_at IS NULL',
+                                  [(_epoch(alert.get('resolved_at', resolved_at)), _number(alert.get('value')),
+                                    alert['id'], alert['priority']) for alert in resolved])
+            self.conn.executemany('INSERT INTO alert_hourly (hour, type, count) VALUES (?, ?, ?) '
+                                  'ON CONFLICT (hour, type) DO UPDATE SET count = count + excluded.count',
+                                  [(hour, alert_type, count) for (hour, alert_type), count in hourly.items()])
+        return len(rows)
+    def acknowledge(self, alerts, timestamp=None):
+        """Stamp the open rows of acknowledged alerts"""
+        acknowledged_at = _epoch(timestamp or datetime.now())
+        with self.lock, self.conn:
+            self.conn.executemany('UPDATE alerts SET acknowledged_at = ? WHERE alert_id = ? AND priority = ? '
+                                  'AND resolved_at IS NULL',
+                                  [(acknowledged_at, alert['id'], alert['priority']) for alert in alerts])
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+    def _records(self, rows):
+        records = []
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            for key in ('opened_at', 'acknowledged_at', 'resolved_at'):
+                if record[key] is not None:
+                    record[key] = datetime.fromtimestamp(record[key])
+            record['status'] = ('resolved' if record['resolved_at'] else
+                                'acknowledged' if record['acknowledged_at'] else 'open')
+            records.append(record)
+        return records
+    def last_for_trainset(self, trainset_id, n=10):
+        """The n most recent alerts of a trainset, newest first"""
+        return self._records(self._query(f"SELECT {', '.join(COLUMNS)} FROM alerts WHERE trainset_id = ? "
+                                         "ORDER BY opened_at DESC LIMIT ?", (str(trainset_id), n)))
+    def between(self, start, end=None, alert_type=None, limit=1000):
+        """Alerts opened in [start, end), optionally of one type, newest first"""
+        end = _epoch(end or datetime.now())
+        if alert_type is None:
+            sql, params = "WHERE opened_at >= ? AND opened_at < ?", (_epoch(start), end)
+        else:
+            sql, params = "WHERE type = ? AND opened_at >= ? AND opened_at < ?", (alert_type, _epoch(start), end)
+        return self._records(self._query(f"SELECT {', '.join(COLUMNS)} FROM alerts {sql} "
+                                         "ORDER BY opened_at DESC LIMIT ?", params + (limit,)))
+    def hourly_counts(self, start, end=None):
+        """Alerts opened per type per hour for the hours overlapping [start, end): [(hour start, type, count)]"""
+        rows = self._query("SELECT hour, type, count FROM alert_hourly WHERE hour >= ? AND hour < ? ORDER BY hour, type",
+                           (int(_epoch(start) // 3600), int(-(-_epoch(end or datetime.now()) // 3600))))
+        return [(datetime.fromtimestamp(hour * 3600), alert_type, count) for hour, alert_type, count in rows]
+    def iter_rows(self, start=None, end=None, chunk_size=10000):
+        """Raw rows (COLUMNS order, epoch timestamps) of alerts opened in [start, end), in insertion order,
+        as lists of at most chunk_size. Pages by row_id, so the lock is not held between chunks."""
+        start = _epoch(start) if start is not None else float('-inf')
+        end = _epoch(end) if end is not None else float('inf')
+        last = 0
+        while True:
+            rows = self._query(f"SELECT {', '.join(COLUMNS)} FROM alerts WHERE row_id > ? AND opened_at >= ? "
+                               "AND opened_at < ? ORDER BY row_id LIMIT ?", (last, start, end, chunk_size))
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][0]
+    def open_alerts(self, priority=None):
+        """Alerts not yet resolved, optionally of one priority"""
+        if priority is None:
+            rows = self._query(f"SELECT {', '.join(COLUMNS)} FROM alerts INDEXED BY idx_alerts_open "
+                               "WHERE resolved_at IS NULL")
+        else:
+            rows = self._query(f"SELECT {', '.join(COLUMNS)} FROM alerts INDEXED BY idx_alerts_open "
+                               "WHERE priority = ? AND resolved_at IS NULL", (priority,))
+        return self._records(rows)
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM alerts")[0][0]
+    def close(self):
+        with self.lock:
+            self.conn.close()
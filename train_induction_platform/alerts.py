@@ -1,4 +1,3 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
@@ -9,88 +8,266 @@ import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
 import warnings
+from collections import deque
+from fleet_store import fleet_columns
+
+# Declarative alert rules. 'trainset' rules compare a fleet column (or an aggregate over several
+# columns) with a threshold; 'fleet' rules compare a value from the optimization results.
+# An open alert resolves only once the value is `hysteresis` past the threshold on the safe side.
+DEFAULT_ALERT_RULES = {
+    'fitness_expiry': {'field': 'fitness.days_until_expiry', 'comparator': '<=', 'threshold': 2, 'hysteresis': 1,
+                       'priority': 'High', 'message': "{trainset_id}: Fitness expires in {value} days"},
+    'high_risk_maintenance': {'field': ['mileage.component_wear.brake_pads', 'mileage.component_wear.bogies',
+                                        'mileage.component_wear.hvac'],
+                              'aggregate': 'mean', 'comparator': '>=', 'threshold': 75, 'hysteresis': 3,
+                              'priority': 'Critical', 'message': "{trainset_id}: High component wear ({value:.1f}%)"},
+    'branding_deficit': {'field': 'branding.exposure_deficit', 'comparator': '>=', 'threshold': 15, 'hysteresis': 2,
+                         'priority': 'Medium', 'message': "{trainset_id}: High exposure deficit ({value} hours)"},
+    'service_readiness': {'scope': 'fleet', 'field': 'service_ready', 'comparator': '<', 'threshold': 12,
+                          'hysteresis': 1, 'priority': 'High',
+                          'message': "Low service readiness: Only {value} trains available"},
+    'conflict_detection': {'scope': 'fleet', 'field': 'conflicts', 'aggregate': 'count', 'comparator': '>',
+                           'threshold': 0, 'priority': 'High', 'message': "Found {value} optimization conflicts"}
+}
+COMPARATORS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal, '==': np.equal,
+               '!=': np.not_equal}
+AGGREGATES = {'mean': np.mean, 'max': np.max, 'min': np.min, 'sum': np.sum}
+
+class AlertRule:
+    """A rule spec compiled to a NumPy predicate"""
+    def __init__(self, name, spec):
+        self.name = name
+        self.scope = spec.get('scope', 'trainset')
+        self.fields = [spec['field']] if isinstance(spec['field'], str) else list(spec['field'])
+        self.aggregate = spec.get('aggregate')
+        self.comparator = spec['comparator']
+        self.threshold = spec['threshold']
+        self.hysteresis = spec.get('hysteresis', 0)
+        self.priority = spec['priority']
+        self.message = spec['message']
+        if self.scope not in ('trainset', 'fleet'):
+            raise ValueError(f"Alert rule {name}: unknown scope {self.scope!r}")
+        if self.comparator not in COMPARATORS:
+            raise ValueError(f"Alert rule {name}: unknown comparator {self.comparator!r}")
+        if len(self.fields) > 1 and self.aggregate not in AGGREGATES:
+            raise ValueError(f"Alert rule {name}: several fields need an aggregate from {sorted(AGGREGATES)}")
+        if self.scope == 'fleet' and self.aggregate not in (None, 'count'):
+            raise ValueError(f"Alert rule {name}: fleet rules support only the 'count' aggregate")
+    def values(self, columns):
+        """Rule input per trainset from the fleet columns"""
+        if len(self.fields) == 1:
+            return columns[self.fields[0]]
+        return AGGREGATES[self.aggregate](np.column_stack([columns[f] for f in self.fields]).astype(float), axis=1)
+    def matches(self, values):
+        return COMPARATORS[self.comparator](values, self.threshold)
+    def holds(self, values):
+        """Whether an open alert stays open: the predicate with the threshold relaxed by the hysteresis band"""
+        if self.comparator in ('<', '<='):
+            return COMPARATORS[self.comparator](values, self.threshold + self.hysteresis)
+        if self.comparator in ('>', '>='):
+            return COMPARATORS[self.comparator](values, self.threshold - self.hysteresis)
+        return self.matches(values)
+    def fleet_value(self, results):
+        """Rule input from optimization results, or None when the results lack it"""
+        if not results or self.fields[0] not in results:
+            return None
+        value = results[self.fields[0]]
+        return len(value) if self.aggregate == 'count' else value
+    def alert(self, trainset_id, value, timestamp):
+        return {
+            'id': alert_id(self.name, trainset_id),
+            'type': self.name,
+            'priority': self.priority,
+            'message': self.message.format(trainset_id=trainset_id, value=value),
+            'trainset_id': trainset_id,
+            'value': value,
+            'status': 'open',
+            'timestamp': timestamp,
+            'last_notified': timestamp,
+            'notify_count': 1
+        }
+
+def alert_id(rule_name, trainset_id=None):
+    """Stable id: the same rule and trainset always map to the same alert"""
+    return f"{rule_name}:{'fleet' if trainset_id is None else trainset_id}"
 
 class AlertManager:
-    def __init__(self):
+    """
+    Stateful alerting. Each (rule, trainset) pair has one alert with a stable id that moves through
+    open -> acknowledged -> resolved; rules re-fire only after resolving. Every state change is queued
+    once in self.notifications. Open alerts are re-notified at most every renotify_interval, and when more
+    than storm_threshold trainsets trip (or re-notify) the same rule in one run they are reported as one
+    grouped summary.
+    """
+    def __init__(self, rules=None, renotify_interval=timedelta(minutes=30), storm_threshold=5, history=1000):
+        self.alert_rules = dict(DEFAULT_ALERT_RULES if rules is None else rules)
+        self.renotify_interval = renotify_interval
+        self.storm_threshold = storm_threshold
+        # Open and acknowledged alerts by id; resolved ones move to a bounded history
+        self.active = {}
+        self.resolved = deque(maxlen=history)
+        self.notifications = []
         self.alerts = []
-        self.alert_rules = {
-            'fitness_expiry': {'threshold': 2, 'priority': 'High'},
-            'high_risk_maintenance': {'threshold': 75, 'priority': 'Critical'},
-            'branding_deficit': {'threshold': 15, 'priority': 'Medium'},
-            'service_readiness': {'threshold': 12, 'priority': 'High'},
-            'conflict_detection': {'priority': 'High'}
-        }
+        self.changes = None
+        self.history = None
+        self._compile()
+    def _compile(self):
+        self._rules = [AlertRule(name, spec) for name, spec in self.alert_rules.items()]
+        self._train_rules = [rule for rule in self._rules if rule.scope == 'trainset']
+        self._fields = sorted({field for rule in self._train_rules for field in rule.fields})
+        self._checked_count = None
+    def add_rule(self, name, spec):
+        """Add or replace a rule; all trainsets are re-checked on the next run"""
+        AlertRule(name, spec)
+        self.alert_rules[name] = spec
+        self._compile()
+    def load_rules(self, config):
+        """Add rules from a {name: spec} dict or a JSON file holding one"""
+        if isinstance(config, str):
+            with open(config) as f:
+                config = json.load(f)
+        for name, spec in config.items():
+            AlertRule(name, spec)
+        self.alert_rules.update(config)
+        self._compile()
+    def attach_history(self, history):
+        """Persist opened, acknowledged and resolved alerts; alerts still open in the history are restored"""
+        self.history = history
+        for record in history.open_alerts():
+            if record['alert_id'] not in self.active and record['type'] in self.alert_rules:
+                self.active[record['alert_id']] = {
+                    'id': record['alert_id'], 'type': record['type'], 'priority': record['priority'],
+                    'message': record['message'], 'trainset_id': record['trainset_id'], 'value': record['value'],
+                    'status': record['status'], 'timestamp': record['opened_at'], 'last_notified': record['opened_at'],
+                    'notify_count': 1
+                }
+        self._checked_count = None
+    def watched_fields(self):
+        """Fleet fields the trainset rules read"""
+        return set(self._fields)
+    def watch(self, change_log):
+        """Re-check only trainsets the change log reports, keeping alert state for the rest"""
+        self.changes = change_log
+        self._checked_count = None
     def check_alerts(self, trainsets, optimization_results=None):
-        """Check all alert conditions"""
-        self.alerts = []
-        self._check_fitness_alerts(trainsets)
-        self._check_maintenance_alerts(trainsets)
-        self._check_branding_alerts(trainsets)
-        self._check_service_alerts(trainsets, optimization_results)
-        self._check_conflict_alerts(optimization_results)
+        """Evaluate all rules in one pass over the fleet columns and advance alert states.
+        Returns the open and acknowledged alerts; state changes of this run are in self.notifications."""
+        full_check = self.changes is None or self._checked_count != len(trainsets)
+        to_check = trainsets if full_check else self.changes.touched(self._fields)
+        if self.changes is not None:
+            self.changes.clear()
+        self._checked_count = len(trainsets)
+        now = datetime.now()
+        opened, resolved = {}, []
+        if full_check:
+            # Alerts for trainsets that left the fleet resolve
+            current = {trainset['id'] for trainset in trainsets}
+            resolved.extend(alert for alert in self.active.values()
+                            if alert['trainset_id'] is not None and alert['trainset_id'] not in current)
+        if len(to_check):
+            columns = fleet_columns(to_check, self._fields + ['id'])
+            ids = columns['id']
+            for rule in self._train_rules:
+                values = rule.values(columns)
+                active_ids = [tid for tid in ids if alert_id(rule.name, tid) in self.active]
+                was_active = np.isin(ids, active_ids) if active_ids else np.zeros(len(ids), dtype=bool)
+                tripped = rule.matches(values)
+                holding = rule.holds(values)
+                # Alert records are built or touched only for rows whose state may change
+                for i in np.flatnonzero(tripped | was_active).tolist():
+                    value = values[i].item() if hasattr(values[i], 'item') else values[i]
+                    self._advance(rule, ids[i], value, was_active[i], holding[i], now, opened, resolved)
+        for rule in self._rules:
+            if rule.scope == 'fleet':
+                value = rule.fleet_value(optimization_results)
+                if value is not None:
+                    was_active = alert_id(rule.name) in self.active
+                    holding = rule.holds(value) if was_active else rule.matches(value)
+                    self._advance(rule, None, value, was_active, holding, now, opened, resolved)
+        for alert in resolved:
+            alert.update({'status': 'resolved', 'resolved_at': now})
+            self.resolved.append(self.active.pop(alert['id']))
+        renotified = {}
+        for alert in self.active.values():
+            if (alert['status'] == 'open' and alert['id'] not in opened.get(alert['type'], {}) and
+                    now - alert['last_notified'] >= self.renotify_interval):
+                alert['last_notified'] = now
+                alert['notify_count'] += 1
+                renotified.setdefault(alert['type'], {})[alert['id']] = alert
+        if self.history is not None:
+            self.history.record_run([alert for alerts in opened.values() for alert in alerts.values()], resolved, now)
+        self.notifications = (self._group('opened', opened, now) + self._group('renotify', renotified, now) +
+                              [dict(alert, event='resolved') for alert in resolved])
+        order = {rule.name: i for i, rule in enumerate(self._rules)}
+        self.alerts = sorted(self.active.values(), key=lambda alert: order.get(alert['type'], len(order)))
         return self.alerts
-    def _check_fitness_alerts(self, trainsets):
-        """Check fitness certificate alerts"""
-        for trainset in trainsets:
-            if trainset['fitness']['days_until_expiry'] <= self.alert_rules['fitness_expiry']['threshold']:
-                self.alerts.append({
-                    'type': 'fitness_expiry',
-                    'priority': self.alert_rules['fitness_expiry']['priority'],
-                    'message': f"{trainset['id']}: Fitness expires in {trainset['fitness']['days_until_expiry']} days",
-                    'trainset_id': trainset['id'],
-                    'timestamp': datetime.now()
-                })
-    def _check_maintenance_alerts(self, trainsets):
-        """Check maintenance risk alerts"""
-        for trainset in trainsets:
-            wear_avg = sum(trainset['mileage']['component_wear'].values()) / 3
-            if wear_avg >= self.alert_rules['high_risk_maintenance']['threshold']:
-                self.alerts.append({
-                    'type': 'high_risk_maintenance',
-                    'priority': self.alert_rules['high_risk_maintenance']['priority'],
-                    'message': f"{trainset['id']}: High component wear ({wear_avg:.1f}%)",
-                    'trainset_id': trainset['id'],
-                    'timestamp': datetime.now()
-                })    
-    def _check_branding_alerts(self, trainsets):
-        """Check branding commitment alerts"""
-        for trainset in trainsets:
-            if trainset['branding']['exposure_deficit'] >= self.alert_rules['branding_deficit']['threshold']:
-                self.alerts.append({
-                    'type': 'branding_deficit',
-                    'priority': self.alert_rules['branding_deficit']['priority'],
-                    'message': f"{trainset['id']}: High exposure deficit ({trainset['branding']['exposure_deficit']} hours)",
-                    'trainset_id': trainset['id'],
-                    'timestamp': datetime.now()
+    def _advance(self, rule, trainset_id, value, was_active, holding, now, opened, resolved):
+        """Open a newly tripped alert, refresh a held one or queue a released one for resolution"""
+        if was_active:
+            alert = self.active[alert_id(rule.name, trainset_id)]
+            if holding:
+                alert['value'] = value
+                alert['message'] = rule.message.format(trainset_id=trainset_id, value=value)
+            else:
+                resolved.append(alert)
+        elif holding:
+            alert = rule.alert(trainset_id, value, now)
+            self.active[alert['id']] = alert
+            opened.setdefault(rule.name, {})[alert['id']] = alert
+    def _group(self, event, alerts_by_rule, now):
+        """Notifications for one kind of event; storms on a rule collapse into a summary"""
+        notifications = []
+        for rule_name, alerts in alerts_by_rule.items():
+            alerts = list(alerts.values())
+            if len(alerts) > self.storm_threshold:
+                ids = [alert['trainset_id'] for alert in alerts]
+                notifications.append({
+                    'event': event,
+                    'id': f"{rule_name}:summary",
+                    'type': rule_name,
+                    'priority': alerts[0]['priority'],
+                    'message': f"{len(alerts)} trainsets: {rule_name.replace('_', ' ')} ({', '.join(map(str, ids[:5]))}"
+                               f"{', ...' if len(ids) > 5 else ''})",
+                    'trainset_id': None,
+                    'trainset_ids': ids,
+                    'count': len(alerts),
+                    'timestamp': now
                 })
-    def _check_service_alerts(self, trainsets, optimization_results):
-        """Check service readiness alerts"""
-        if optimization_results and optimization_results.get('service_ready', 0) < self.alert_rules['service_readiness']['threshold']:
-            self.alerts.append({
-                'type': 'service_readiness',
-                'priority': self.alert_rules['service_readiness']['priority'],
-                'message': f"Low service readiness: Only {optimization_results['service_ready']} trains available",
-                'trainset_id': None,
-                'timestamp': datetime.now()
-            })
-    def _check_conflict_alerts(self, optimization_results):
-        """Check optimization conflict alerts"""
-        if optimization_results and optimization_results.get('conflicts'):
-            self.alerts.append({
-                'type': 'conflict_detection',
-                'priority': self.alert_rules['conflict_detection']['priority'],
-                'message': f"Found {len(optimization_results['conflicts'])} optimization conflicts",
-                'trainset_id': None,
-                'timestamp': datetime.now()
-            }) 
+            else:
+                notifications.extend(dict(alert, event=event) for alert in alerts)
+        return notifications
+    def acknowledge(self, alert_ids):
+        """Acknowledge open alerts (one id or a list); acknowledged alerts are not re-notified"""
+        now = datetime.now()
+        acknowledged = []
+        for aid in [alert_ids] if isinstance(alert_ids, str) else alert_ids:
+            alert = self.active.get(aid)
+            if alert is not None and alert['status'] == 'open':
+                alert.update({'status': 'acknowledged', 'acknowledged_at': now})
+                acknowledged.append(alert)
+        if self.history is not None and acknowledged:
+            self.history.acknowledge(acknowledged, now)
+    def grouped_alerts(self, alerts=None):
+        """Active alerts with every rule that has more than storm_threshold alerts folded into one summary"""
+        alerts = self.alerts if alerts is None else alerts
+        by_type = {}
+        for alert in alerts:
+            by_type.setdefault(alert['type'], []).append(alert)
+        grouped = []
+        for alert_type, members in by_type.items():
+            if len(members) > self.storm_threshold:
+                grouped.append({'id': f"{alert_type}:summary", 'type': alert_type, 'priority': members[0]['priority'],
+                                'message': f"{len(members)} trainsets affected", 'trainset_id': None,
+                                'timestamp': min(alert['timestamp'] for alert in members), 'members': members,
+                                'status': 'open' if any(a['status'] == 'open' for a in members) else 'acknowledged'})
+            else:
+                grouped.extend(members)
+        return grouped
     def get_priority_alerts(self, priority_level='Critical'):
         """Get alerts filtered by priority"""
         return [alert for alert in self.alerts if alert['priority'] == priority_level]
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from integrator import RealTimeDataIntegrator, ChangeEvent
+
+# Fields each source reads and may update, and the simulated poll that stands in for it
+SOURCE_FIELDS = {
+    'maximo': ['job_cards.open', 'job_cards.priority'],
+    'iot_sensors': ['mileage.total_km', 'mileage.since_maintenance', 'mileage.component_wear.brake_pads',
+                    'mileage.component_wear.bogies', 'mileage.component_wear.hvac'],
+    'fitness_certs': ['fitness.rolling_stock', 'fitness.signalling', 'fitness.telecom', 'fitness.expires_at',
+                      'fitness.days_until_expiry']
+}
+SOURCE_POLLS = {'maximo': 'poll_maximo', 'iot_sensors': 'poll_iot_sensors', 'fitness_certs': 'poll_fitness_db'}
+DATETIME_FIELDS = {'fitness.expires_at'}
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _decode(path, value):
+    return datetime.fromisoformat(value) if path in DATETIME_FIELDS and value is not None else value
+
+def _get_path(trainset, path):
+    value = trainset
+    for key in path.split('.'):
+        value = value[key]
+    return value
+
+def _nest(record):
+    """Nested trainset dict from {'id': ..., dotted path: value}"""
+    trainset = {}
+    for path, value in record.items():
+        keys = path.split('.')
+        section = trainset
+        for key in keys[:-1]:
+            section = section.setdefault(key, {})
+        section[keys[-1]] = _decode(path, value)
+    return trainset
+
+class StubSourceServer:
+    """
+    Local HTTP stand-in for one data source (Maximo, IoT or fitness certificates).
+    POST /sync with {"trainsets": [{"id": ..., field path: value}]} answers, after `latency` seconds,
+    with the change events produced by the simulated poll of RealTimeDataIntegrator.
+    """
+    def __init__(self, source, latency=0.2, host='127.0.0.1', port=0, seed=None):
+        self.source = source
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    def respond(self, payload):
+        """Run the simulated poll over the posted fields and return its change events"""
+        trainsets = [_nest(record) for record in payload.get('trainsets', [])]
+        simulator = RealTimeDataIntegrator()
+        with self.lock:
+            # The polls draw from the module RNG; reseed it from this server's stream
+            state = random.getstate()
+            random.seed(self.rng.random())
+            try:
+                events, updated_count = getattr(simulator, SOURCE_POLLS[self.source])(trainsets)
+            finally:
+                random.setstate(state)
+            self.requests += 1
+        return {'source': self.source, 'updated_count': updated_count, 'events': [event.to_dict() for event in events]}
+    def _handler(self):
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, so clients can pool connections
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                time.sleep(server.latency)
+                if self.path != '/sync':
+                    self._send(404, {'error': f"unknown endpoint {self.path}"})
+                    return
+                self._send(200, server.respond(payload))
+            def _send(self, status, body):
+                data = json.dumps(body, default=_encode).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (timed out) before the answer was ready
+            def log_message(self, format, *args):
+                pass
+        return Handler
+
+def start_stub_servers(latency=0.2, seed=None):
+    """Start one stub server per source. latency is seconds, or {source: seconds}."""
+    servers = {}
+    for i, source in enumerate(SOURCE_FIELDS):
+        source_latency = latency.get(source, 0.2) if isinstance(latency, dict) else latency
+        servers[source] = StubSourceServer(source, source_latency,
+                                           seed=None if seed is None else seed + i).start()
+    return servers
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most `size` in use at a time"""
+    def __init__(self, url, size=4):
+        parsed = urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.size = size
+        self.idle = []
+        self.semaphore = None
+        self.opened = 0
+    async def request(self, method, path, payload=None):
+        """JSON request; a reused connection the server already closed is retried once on a new one"""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.size)
+        body = json.dumps(payload, default=_encode).encode() if payload is not None else b''
+        async with self.semaphore:
+            for attempt in range(2):
+                reused = bool(self.idle)
+                try:
+                    return await self._exchange(method, path, body)
+                except ConnectionError:
+                    if not reused or attempt:
+                        raise
+    async def _exchange(self, method, path, body):
+        if self.idle:
+            reader, writer = self.idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            self.opened += 1
+        try:
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError("connection closed by server")
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            data = await reader.readexactly(int(headers.get('content-length', 0)))
+        except BaseException:
+            # Timeouts cancel mid-exchange; the connection state is unknown, so drop it
+            writer.close()
+            raise
+        if headers.get('connection', '').lower() == 'close':
+            writer.close()
+        else:
+            self.idle.append((reader, writer))
+        status = int(status_line.split()[1])
+        if status != 200:
+            raise ConnectionError(f"HTTP {status} from {self.host}:{self.port}{path}")
+        return json.loads(data)
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+class AsyncDataIntegrator(RealTimeDataIntegrator):
+    """
+    Fetches Maximo, IoT and fitness updates concurrently over pooled HTTP connections.
+    Each source has its own timeout; a source that times out or fails is skipped for this refresh and
+    flagged in data_sources. Each source's events are applied as it answers, so fast sources do not
+    wait for slow ones. Requests run on a private event loop thread, which keeps the pools alive
+    between refreshes; refresh_all_data keeps the synchronous signature of the base class.
+    """
+    def __init__(self, endpoints, timeouts=None, pool_size=4):
+        super().__init__()
+        self.endpoints = endpoints
+        self.timeouts = {'maximo': 2.0, 'iot_sensors': 2.0, 'fitness_certs': 2.0}
+        self.timeouts.update(timeouts or {})
+        self.pool_size = pool_size
+        self.pools = {}
+        self._loop = None
+        self._thread = None
+    def _run(self, coro):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+            self._thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    def _pool(self, source):
+        if source not in self.pools:
+            self.pools[source] = ConnectionPool(self.endpoints[source], self.pool_size)
+        return self.pools[source]
+    async def fetch_source(self, source, trainsets):
+        """POST the fields a source owns and return its change events and update count,
+        or raise on timeout/failure"""
+        payload = {'trainsets': [dict({'id': t['id']}, **{path: _get_path(t, path) for path in SOURCE_FIELDS[source]})
+                                 for t in trainsets]}
+        response = await asyncio.wait_for(self._pool(source).request('POST', '/sync', payload), self.timeouts[source])
+        events = [ChangeEvent(e['trainset_id'], e['path'], _decode(e['path'], e['old']), _decode(e['path'], e['new']),
+                              e['source'], datetime.fromisoformat(e['timestamp'])) for e in response['events']]
+        return events, response['updated_count']
+    async def refresh_all_data_async(self, trainsets, concurrent=True, on_source=None):
+        """Fetch all sources (concurrently unless concurrent=False) and apply each as it arrives.
+        on_source(source, updated_count, elapsed) is called after each source is applied."""
+        start = time.perf_counter()
+        total_updates = 0
+        async def fetch(source):
+            try:
+                return source, await self.fetch_source(source, trainsets), None
+            except asyncio.TimeoutError:
+                return source, None, f"timed out after {self.timeouts[source]}s"
+            except (ConnectionError, OSError, ValueError) as e:
+                return source, None, str(e)
+        sources = [source for source in SOURCE_FIELDS if source in self.endpoints]
+        if concurrent:
+            results = asyncio.as_completed([fetch(source) for source in sources])
+        else:
+            results = (fetch(source) for source in sources)
+        for result in results:
+            source, response, error = await result
+            if error is not None:
+                self.data_sources[source].update({'connected': False, 'error': error})
+                continue
+            events, updates = response
+            self.apply_events(trainsets, events)
+            self.data_sources[source].update({'connected': True, 'last_update': datetime.now(), 'error': None})
+            total_updates += updates
+            if on_source is not None:
+                on_source(source, updates, time.perf_counter() - start)
+        return trainsets, total_updates
+    def refresh_all_data(self, trainsets, full_rescore=False, concurrent=True, on_source=None):
+        """Refresh data from all sources, rescoring only trainsets whose scoring inputs changed"""
+        trainsets, total_updates = self._run(self.refresh_all_data_async(trainsets, concurrent, on_source))
+        self.rescore(trainsets, full_rescore)
+        return trainsets, total_updates
+    def close(self):
+        """Close pooled connections and stop the event loop thread"""
+        if self._loop is None:
+            return
+        async def close_pools():
+            for pool in self.pools.values():
+                pool.close()
+        self._run(close_pools())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self.pools = {}
+
+def benchmark_refresh(trainsets, latency=0.2, repeats=3, seed=None):
+    """Sequential vs concurrent refresh time against local stub servers.
+    Returns {'sequential': seconds, 'concurrent': seconds, 'speedup': ratio} (best of repeats)."""
+    servers = start_stub_servers(latency, seed=seed)
+    integrator = AsyncDataIntegrator({source: server.url for source, server in servers.items()})
+    try:
+        timings = {}
+        for mode, concurrent in (('sequential', False), ('concurrent', True)):
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                integrator.refresh_all_data(trainsets, concurrent=concurrent)
+                best = min(best, time.perf_counter() - start)
+            timings[mode] = round(best, 4)
+        timings['speedup'] = round(timings['sequential'] / timings['concurrent'], 2)
+        return timings
+    finally:
+        integrator.close()
+        for server in servers.values():
+            server.stop()
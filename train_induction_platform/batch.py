@@ -0,0 +1,236 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import joblib
+import numpy as np
+import pandas as pd
+from fleet_store import FleetStore, FLEET_SCHEMA
+from event_log import FleetEventLog
+from snapshot import SNAPSHOT_MAGIC, load_snapshot
+from exporter import HAS_PARQUET, EXPORT_FORMATS, FILE_EXTENSIONS, fleet_chunks, frame_chunks, records_chunks, write_export
+from utils import calculate_ai_scores
+from system_manager import SystemIntegrationManager
+
+# Headless runs of the induction pipeline: load a fleet, optimize, build the timetable and reports,
+# write the results and exit. Nothing here imports Streamlit, Plotly or Folium.
+#   python batch.py --fleet fleet.csv --output runs/
+#   python batch.py scenarios/*.json --output runs/ --workers 4
+
+DEFAULT_CONSTRAINTS = {'service_target': 15, 'max_ibl': 5, 'branding_priority': 'Medium', 'maintenance_buffer': 3,
+                       'solver': 'greedy', 'time_budget': 10}
+DEFAULT_FORMAT = 'parquet' if HAS_PARQUET else 'jsonl'
+_KINDS = dict(FLEET_SCHEMA)
+# Fleet CSVs use dotted field paths as columns (as written by the fleet status export) or the flat
+# underscore names of trainsets_ml_ready.csv; these are the underscore names that differ from the path
+CSV_ALIASES = {
+    'trainset_id': 'id',
+    'branding_hours_required': 'branding.hours_required_today',
+    'mileage_brake_wear': 'mileage.component_wear.brake_pads',
+    'mileage_bogie_wear': 'mileage.component_wear.bogies',
+    'mileage_hvac_wear': 'mileage.component_wear.hvac'
+}
+# Day counts converted to dates, relative to the CSV's 'timestamp' column when present
+CSV_DAYS_SINCE = {'operational_days_since_service': 'operational.last_service',
+                  'cleaning_days_since_clean': 'cleaning.last_cleaned'}
+
+def _csv_value(kind, value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if kind == 'datetime':
+        return pd.Timestamp(value).to_pydatetime()
+    if kind == 'bool':
+        return value.strip().lower() in ('true', '1', 'yes') if isinstance(value, str) else bool(value)
+    if kind == 'int':
+        # e.g. fractional AI scores in exported files; the fleet stores whole numbers
+        return int(round(float(value)))
+    if kind == 'float':
+        return float(value)
+    return value.item() if hasattr(value, 'item') else value
+
+def read_fleet_csv(path):
+    """FleetStore from a CSV with one trainset per row. Fields the file lacks get schema defaults;
+    overall fitness validity and AI scores are derived when not given."""
+    df = pd.read_csv(path)
+    paths = {name.replace('.', '_'): name for name in _KINDS}
+    paths.update({name: name for name in _KINDS})
+    paths.update(CSV_ALIASES)
+    reference = pd.to_datetime(df['timestamp']) if 'timestamp' in df else pd.Series(pd.Timestamp.now(), index=df.index)
+    columns = {}
+    for column in df.columns:
+        if column in CSV_DAYS_SINCE:
+            columns[CSV_DAYS_SINCE[column]] = reference - pd.to_timedelta(df[column], unit='D')
+        elif column in paths:
+            columns[paths[column]] = df[column]
+    if 'id' not in columns:
+        raise ValueError(f"{path}: no trainset id column ('id' or 'trainset_id')")
+    trainsets = []
+    for row in range(len(df)):
+        trainset = {}
+        for name, values in columns.items():
+            value = _csv_value(_KINDS[name], values.iat[row])
+            if value is None and _KINDS[name] in ('int', 'float', 'bool'):
+                continue
+            section = trainset
+            keys = name.split('.')
+            for key in keys[:-1]:
+                section = section.setdefault(key, {})
+            section[keys[-1]] = value
+        fitness = trainset.setdefault('fitness', {})
+        if 'overall_valid' not in fitness:
+            fitness['overall_valid'] = all(fitness.get(k, False) for k in ('rolling_stock', 'signalling', 'telecom'))
+        trainsets.append(trainset)
+    store = FleetStore.from_trainsets(trainsets)
+    if 'ai_score' not in columns:
+        views = store.views()
+        scores, reason_bits = calculate_ai_scores(views)
+        for trainset, ai_score, bits in zip(views, scores.tolist(), reason_bits.tolist()):
+            trainset['ai_score'] = ai_score
+            trainset['score_reason_bits'] = bits
+    return store
+
+def load_fleet(path):
+    """FleetStore from a CSV file, a system snapshot, an event log fleet snapshot (.joblib) or an event log
+    directory (latest state)"""
+    if os.path.isdir(path):
+        fleet = FleetEventLog(path).state_at()
+        if fleet is None:
+            raise ValueError(f"{path}: event log has no snapshot")
+        return fleet
+    if path.endswith('.csv'):
+        return read_fleet_csv(path)
+    with open(path, 'rb') as f:
+        if f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC:
+            return load_snapshot(path)[0]
+    fleet = joblib.load(path)
+    fleet = fleet['fleet'] if isinstance(fleet, dict) else fleet
+    if not isinstance(fleet, FleetStore):
+        raise ValueError(f"{path}: not a fleet snapshot")
+    return fleet
+
+def load_scenario(path):
+    """Scenario JSON: {"name", "fleet": path or {"simulate": n}, "seed", "constraints", "reports", "timetable"}.
+    Relative fleet paths are resolved against the scenario file."""
+    with open(path) as f:
+        scenario = json.load(f)
+    scenario.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    fleet = scenario.get('fleet')
+    if isinstance(fleet, str) and not os.path.isabs(fleet):
+        scenario['fleet'] = os.path.join(os.path.dirname(os.path.abspath(path)), fleet)
+    return scenario
+
+def timetable_rows(timetable):
+    """One row per (time slot, train) of a generated timetable"""
+    for slot in timetable:
+        for train in slot['trains']:
+            yield {'time_slot': slot['time_slot'], 'peak_hour': slot['peak_hour'], **train}
+
+def run_scenario(scenario, output_dir, fmt=DEFAULT_FORMAT):
+    """Run one scenario end to end and write its outputs to output_dir/<name>/; returns a summary"""
+    started = time.perf_counter()
+    name = scenario['name']
+    directory = os.path.join(output_dir, name)
+    os.makedirs(directory, exist_ok=True)
+    if scenario.get('seed') is not None:
+        random.seed(scenario['seed'])
+        np.random.seed(scenario['seed'])
+    fleet = scenario.get('fleet') or {'simulate': 25}
+    store = None if isinstance(fleet, dict) else load_fleet(fleet)
+    manager = SystemIntegrationManager(data_dir=os.path.join(directory, 'state'))
+    trainsets = manager.initialize_system(fleet['simulate']) if store is None else manager.load_fleet(store)
+    constraints = dict(DEFAULT_CONSTRAINTS, **scenario.get('constraints', {}))
+    optimized, metrics, alerts, predictions = manager.run_complete_optimization(trainsets, constraints)
+    outputs = {'assignments': fleet_chunks(optimized), 'maintenance': frame_chunks(predictions)}
+    if scenario.get('timetable', True):
+        timetable = manager.generate_timetable(optimized, constraints)
+        outputs['timetable'] = records_chunks(timetable_rows(timetable))
+    files = {}
+    for output, chunks in outputs.items():
+        files[output] = os.path.join(directory, output + FILE_EXTENSIONS[fmt])
+        write_export(chunks, files[output], fmt)
+    reports = manager.report_generator.generate_reports(optimized, metrics, alerts, scenario.get('reports'))
+    files['reports'] = os.path.join(directory, 'reports.json')
+    with open(files['reports'], 'w') as f:
+        json.dump(reports, f, default=str, indent=2)
+    summary = {
+        'name': name,
+        'status': 'ok',
+        'trainsets': len(optimized),
+        'constraints': constraints,
+        'metrics': metrics,
+        'alerts': len(alerts),
+        'stage_timings': manager.optimization_history.last().get('stage_timings', {}),
+        'wall_time': time.perf_counter() - started,
+        'outputs': files
+    }
+    with open(os.path.join(directory, 'summary.json'), 'w') as f:
+        json.dump(summary, f, default=str, indent=2)
+    return summary
+
+def _run_worker(scenario, output_dir, fmt):
+    try:
+        return run_scenario(scenario, output_dir, fmt)
+    except Exception as e:
+        return {'name': scenario.get('name'), 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+
+def run_batch(scenarios, output_dir, fmt=DEFAULT_FORMAT, workers=None):
+    """Run scenarios across worker processes (in this process when workers is 1); a failed scenario
+    is reported in its summary rather than stopping the batch"""
+    names = [scenario['name'] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Scenario names must be unique: {names}")
+    workers = min(workers or os.cpu_count() or 1, len(scenarios))
+    if workers <= 1:
+        summaries = [_run_worker(scenario, output_dir, fmt) for scenario in scenarios]
+    else:
+        # Spawned, not forked: workers must not inherit the parent's threads and open database handles
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_run_worker, scenario, output_dir, fmt) for scenario in scenarios]
+            summaries = [future.result() for future in futures]
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'batch_summary.json'), 'w') as f:
+        json.dump({'finished': datetime.now(), 'format': fmt, 'scenarios': summaries}, f, default=str, indent=2)
+    return summaries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the train induction pipeline without the UI")
+    parser.add_argument('scenarios', nargs='*', help="scenario JSON files")
+    parser.add_argument('--fleet', help="fleet CSV, system snapshot, event log snapshot (.joblib) or event log directory")
+    parser.add_argument('--simulate', type=int, default=25, help="simulated fleet size when no fleet is given")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--constraints', type=json.loads, default={}, help="constraint overrides as JSON")
+    parser.add_argument('--reports', nargs='*', help="report types (default: all)")
+    parser.add_argument('--no-timetable', action='store_true')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=DEFAULT_FORMAT)
+    parser.add_argument('--output', default='runs')
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    if args.scenarios:
+        scenarios = [load_scenario(path) for path in args.scenarios]
+    else:
+        scenarios = [{
+            'name': datetime.now().strftime('run_%Y%m%d_%H%M%S'),
+            'fleet': args.fleet or {'simulate': args.simulate},
+            'seed': args.seed,
+            'constraints': args.constraints,
+            'reports': args.reports,
+            'timetable': not args.no_timetable
+        }]
+    summaries = run_batch(scenarios, args.output, args.format, args.workers)
+    for summary in summaries:
+        if summary['status'] == 'ok':
+            metrics = summary['metrics']
+            print(f"{summary['name']}: {summary['trainsets']} trainsets, {metrics['service_ready']} service, "
+                  f"{metrics['standby']} standby, {metrics['ibl_maintenance']} IBL, {summary['alerts']} alerts "
+                  f"in {summary['wall_time']:.2f}s")
+        else:
+            print(f"{summary['name']}: FAILED {summary['error']}", file=sys.stderr)
+    return 0 if all(summary['status'] == 'ok' for summary in summaries) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,4 @@
 # Common imports for KMRL AI Platform
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
@@ -10,9 +9,6 @@ import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
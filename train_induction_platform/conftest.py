@@ -0,0 +1,19 @@
+import random
+import numpy as np
+import pytest
+import model_cache
+from simulator import KMRLDataSimulator
+
+@pytest.fixture
+def make_fleet():
+    """Reproducible simulated fleets: make_fleet(n, seed) -> list of trainset dicts"""
+    def make(n=40, seed=0):
+        random.seed(seed)
+        np.random.seed(seed)
+        return KMRLDataSimulator().generate_realistic_dataset(n)
+    return make
+
+@pytest.fixture
+def isolated_model_cache(tmp_path, monkeypatch):
+    """Keep trained maintenance models out of the user's cache directory"""
+    monkeypatch.setattr(model_cache, 'DEFAULT_CACHE_DIR', str(tmp_path / 'models'))
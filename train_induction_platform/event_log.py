@@ -0,0 +1,312 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+import numpy as np
+import joblib
+from datetime import datetime
+from fleet_store import assign_field
+from utils import calculate_ai_scores, AI_SCORE_FIELDS
+from integrator import ChangeEvent, apply_change_events
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking (Windows): one writer per log directory
+    fcntl = None
+
+DEFAULT_LOG_DIR = os.environ.get('KMRL_EVENT_LOG',
+                                 os.path.join(os.path.expanduser('~'), '.local', 'share', 'train_induction_platform',
+                                              'event_log'))
+# Record kinds
+EVENT_UPDATE, EVENT_DECISION, EVENT_OVERRIDE, EVENT_RUN = 0, 1, 2, 3
+EVENT_KINDS = ['update', 'decision', 'override', 'run']
+# Value encodings: numbers and timestamps are stored inline, strings as string-table indices
+VALUE_NONE, VALUE_BOOL, VALUE_INT, VALUE_FLOAT, VALUE_STR, VALUE_DATETIME = range(6)
+
+LOG_MAGIC = b'KMRLEVT1'
+LOG_VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('record_size', '<u4'), ('count', '<u8')])
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'), ('old', '<f8'), ('new', '<f8'), ('trainset', '<i4'), ('field', '<i4'),
+                         ('source', '<i4'), ('kind', 'u1'), ('old_type', 'u1'), ('new_type', 'u1'), ('pad', 'u1')])
+
+class FleetEventLog:
+    """
+    Append-only log of integrator updates, optimizer decisions, manual overrides and run metrics.
+    Records are fixed-size (RECORD_DTYPE) in a memory-mapped file; trainset ids, field paths, sources
+    and string values are interned in a side table. Fleet snapshots taken every snapshot_every
+    records let state_at rebuild any past fleet from the nearest snapshot, replaying only the last
+    write per (trainset, field) after it.
+
+    Several logs (threads or processes) may write to one directory: appends and new strings are made
+    under an exclusive lock on events.lock, after catching up with what other writers added.
+    """
+    def __init__(self, directory=None, snapshot_every=50000, initial_capacity=4096):
+        self.directory = directory or DEFAULT_LOG_DIR
+        self.snapshot_every = snapshot_every
+        os.makedirs(os.path.join(self.directory, 'snapshots'), exist_ok=True)
+        self.path = os.path.join(self.directory, 'events.bin')
+        self.strings_path = os.path.join(self.directory, 'strings.jsonl')
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = open(os.path.join(self.directory, 'events.lock'), 'a+b')
+        self.strings = []
+        self._string_index = {}
+        self._strings_offset = 0
+        with self._locked():
+            if not os.path.exists(self.path):
+                with open(self.path, 'wb') as f:
+                    f.truncate(HEADER_SIZE + initial_capacity * RECORD_DTYPE.itemsize)
+                self._map()
+                self._header['magic'] = LOG_MAGIC
+                self._header['version'] = LOG_VERSION
+                self._header['record_size'] = RECORD_DTYPE.itemsize
+                self._header['count'] = 0
+                self._mm.flush()
+            else:
+                self._map()
+                header = self._header[0]
+                if header['magic'] != LOG_MAGIC or header['version'] != LOG_VERSION or header['record_size'] != RECORD_DTYPE.itemsize:
+                    raise ValueError(f"{self.path} is not a version {LOG_VERSION} fleet event log")
+            self._sync_strings()
+        self._last_snapshot = max(self.snapshot_indices(), default=None)
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to the log files, across threads and processes; re-entrant"""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    def _sync_strings(self):
+        """Load strings other writers appended to the table since it was last read"""
+        if not os.path.exists(self.strings_path) or os.path.getsize(self.strings_path) == self._strings_offset:
+            return
+        with open(self.strings_path, 'rb') as f:
+            f.seek(self._strings_offset)
+            data = f.read()
+        # Only whole lines: a writer may be part-way through one
+        data = data[:data.rfind(b'\n') + 1]
+        for line in data.splitlines():
+            value = json.loads(line)
+            self._string_index[value] = len(self.strings)
+            self.strings.append(value)
+        self._strings_offset += len(data)
+    def _sync_map(self):
+        """Remap when another writer has grown the file"""
+        if os.path.getsize(self.path) != len(self._mm):
+            self._mm.flush()
+            del self._records, self._header, self._mm
+            self._map()
+    def _map(self):
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode='r+')
+        self._header = self._mm[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+        capacity = (len(self._mm) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self._records = self._mm[HEADER_SIZE:HEADER_SIZE + capacity * RECORD_DTYPE.itemsize].view(RECORD_DTYPE)
+    def __len__(self):
+        return int(self._header['count'][0])
+    @property
+    def records(self):
+        """Logged records (a read-only view of the mapped file)"""
+        if len(self) > len(self._records):
+            self._sync_map()
+        records = self._records[:len(self)]
+        records.flags.writeable = False
+        return records
+    def _reserve(self, extra):
+        """Grow the file (doubling) so extra more records fit; call with the lock held"""
+        self._sync_map()
+        needed = len(self) + extra
+        if needed <= len(self._records):
+            return
+        capacity = max(needed, 2 * len(self._records))
+        self._mm.flush()
+        del self._records, self._header, self._mm
+        with open(self.path, 'r+b') as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        self._map()
+    def intern(self, value):
+        """String-table index of a string, adding it (durably) if new"""
+        index = self._string_index.get(value)
+        if index is None:
+            with self._locked():
+                # Another writer may have added it (or others) since the table was read
+                self._sync_strings()
+                index = self._string_index.get(value)
+                if index is None:
+                    line = (json.dumps(value) + '\n').encode()
+                    with open(self.strings_path, 'ab') as f:
+                        f.write(line)
+                    index = len(self.strings)
+                    self.strings.append(value)
+                    self._string_index[value] = index
+                    self._strings_offset += len(line)
+        return index
+    def _encode(self, value):
+        if value is None:
+            return VALUE_NONE, 0.0
+        if isinstance(value, (bool, np.bool_)):
+            return VALUE_BOOL, float(value)
+        if isinstance(value, (int, np.integer)):
+            return VALUE_INT, float(value)
+        if isinstance(value, (float, np.floating)):
+            return VALUE_FLOAT, float(value)
+        if isinstance(value, datetime):
+            return VALUE_DATETIME, value.timestamp()
+        return VALUE_STR, float(self.intern(str(value)))
+    def _decode(self, value_type, value):
+        if value_type == VALUE_NONE:
+            return None
+        if value_type == VALUE_BOOL:
+            return bool(value)
+        if value_type == VALUE_INT:
+            return int(value)
+        if value_type == VALUE_DATETIME:
+            return datetime.fromtimestamp(value)
+        if value_type == VALUE_STR:
+            return self._string(int(value))
+        return float(value)
+    def _string(self, index):
+        if index >= len(self.strings):
+            self._sync_strings()
+        return self.strings[index]
+    def append(self, events, kind=EVENT_UPDATE):
+        """Append ChangeEvents (trainset_id None for fleet-level records); returns the new record count"""
+        if not events:
+            return len(self)
+        batch = np.zeros(len(events), dtype=RECORD_DTYPE)
+        intern = self.intern
+        with self._locked():
+            batch['timestamp'] = [e.timestamp.timestamp() if isinstance(e.timestamp, datetime) else e.timestamp
+                                  for e in events]
+            batch['trainset'] = [-1 if e.trainset_id is None else intern(e.trainset_id) for e in events]
+            batch['field'] = [intern(e.path) for e in events]
+            batch['source'] = [intern(e.source or '') for e in events]
+            batch['kind'] = kind
+            batch['old_type'], batch['old'] = zip(*(self._encode(e.old) for e in events))
+            batch['new_type'], batch['new'] = zip(*(self._encode(e.new) for e in events))
+            self._reserve(len(batch))
+            start = len(self)
+            self._records[start:start + len(batch)] = batch
+            # Publish the records only after they are written
+            self._header['count'] = start + len(batch)
+            self._mm.flush()
+            return len(self)
+    def record_updates(self, events):
+        """EventBus subscriber for integrator updates"""
+        self.append(events, EVENT_UPDATE)
+    def record_decisions(self, trainsets, previous, timestamp=None):
+        """Log recommendation changes made by an optimization run (previous: {trainset id: label before the run})"""
+        timestamp = timestamp or datetime.now()
+        self.append([ChangeEvent(t['id'], 'recommendation', previous.get(t['id']), t.get('recommendation'), 'optimizer',
+                                 timestamp) for t in trainsets if t.get('recommendation') != previous.get(t['id'])],
+                    EVENT_DECISION)
+    def record_override(self, trainset, status, reason, timestamp=None):
+        """Log a manual override (status None clears it)"""
+        timestamp = timestamp or datetime.now()
+        self.append([ChangeEvent(trainset['id'], 'manual_override', trainset.get('manual_override'), status,
+                                 'manual', timestamp),
+                     ChangeEvent(trainset['id'], 'override_reason', trainset.get('override_reason'), reason,
+                                 'manual', timestamp)], EVENT_OVERRIDE)
+    def record_run(self, metrics, alert_count, timestamp=None):
+        """Log the headline metrics of an optimization run"""
+        timestamp = timestamp or datetime.now()
+        values = {name: metrics.get(name) for name in ('service_ready', 'standby', 'ibl_maintenance',
+                                                        'fitness_compliance', 'processing_time')}
+        values['alert_count'] = alert_count
+        self.append([ChangeEvent(None, f'metrics.{name}', None, value, 'system', timestamp)
+                     for name, value in values.items()], EVENT_RUN)
+    def events(self, start=0, stop=None, kinds=None):
+        """Decoded records as (kind name, ChangeEvent) pairs"""
+        records = self.records[start:stop]
+        if kinds is not None:
+            records = records[np.isin(records['kind'], kinds)]
+        return [(EVENT_KINDS[r['kind']], self._event(r)) for r in records]
+    def _event(self, record):
+        trainset = int(record['trainset'])
+        return ChangeEvent(None if trainset < 0 else self._string(trainset), self._string(int(record['field'])),
+                           self._decode(record['old_type'], record['old']), self._decode(record['new_type'], record['new']),
+                           self._string(int(record['source'])), datetime.fromtimestamp(record['timestamp']))
+    def run_history(self):
+        """Logged optimization runs as [{'timestamp': ..., metric: value}], oldest first"""
+        runs = {}
+        for _, event in self.events(kinds=[EVENT_RUN]):
+            runs.setdefault(event.timestamp, {'timestamp': event.timestamp})[event.path[len('metrics.'):]] = event.new
+        return list(runs.values())
+    # Snapshots and replay
+    def snapshot_path(self, index):
+        return os.path.join(self.directory, 'snapshots', f'{index:012d}.joblib')
+    def snapshot_indices(self):
+        return sorted(int(name.split('.')[0]) for name in os.listdir(os.path.join(self.directory, 'snapshots'))
+                      if name.endswith('.joblib'))
+    def snapshot(self, fleet):
+        """Save the fleet state as of the current end of the log"""
+        with self._locked():
+            index = len(self)
+            tmp_path = self.snapshot_path(index) + '.tmp'
+            joblib.dump({'index': index, 'timestamp': datetime.now(), 'fleet': fleet}, tmp_path)
+            os.replace(tmp_path, self.snapshot_path(index))
+        self._last_snapshot = index
+        return index
+    def snapshot_due(self):
+        return self._last_snapshot is None or len(self) - self._last_snapshot >= self.snapshot_every
+    def index_at(self, timestamp):
+        """Number of records logged at or before timestamp"""
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        return int(np.searchsorted(self.records['timestamp'], timestamp, side='right'))
+    def state_at(self, timestamp=None, index=None):
+        """FleetStore as of a timestamp or record index (default: now), rebuilt from the nearest
+        earlier snapshot. Returns None when no snapshot precedes it."""
+        target = len(self) if index is None and timestamp is None else (index if index is not None
+                                                                       else self.index_at(timestamp))
+        base = max((i for i in self.snapshot_indices() if i <= target), default=None)
+        if base is None:
+            return None
+        fleet = joblib.load(self.snapshot_path(base))['fleet']
+        self.replay_into(fleet, base, target)
+        return fleet
+    def iter_states(self, timestamps):
+        """Yield (timestamp, fleet) for ascending timestamps, replaying incrementally between them.
+        The same FleetStore is updated in place; copy it if a state must be kept."""
+        fleet, position = None, None
+        for timestamp in timestamps:
+            target = self.index_at(timestamp)
+            base = max((i for i in self.snapshot_indices() if i <= target), default=None)
+            if base is None:
+                yield timestamp, None
+                continue
+            if fleet is None or base > position:
+                # A later snapshot is closer than continuing the replay (or a new fleet started there)
+                fleet = joblib.load(self.snapshot_path(base))['fleet']
+                position = base
+            self.replay_into(fleet, position, target)
+            position = target
+            yield timestamp, fleet
+    def replay_into(self, fleet, start, stop):
+        """Apply records [start, stop) to a FleetStore; only the last write per (trainset, field) is applied"""
+        records = self.records[start:stop]
+        records = records[(records['kind'] != EVENT_RUN) & (records['trainset'] >= 0)]
+        if not len(records):
+            return 0
+        key = (records['trainset'].astype(np.int64) << 32) | records['field'].astype(np.int64)
+        _, last_reversed = np.unique(key[::-1], return_index=True)
+        latest = records[np.sort(len(records) - 1 - last_reversed)]
+        applied, by_id = apply_change_events(fleet.views(), [self._event(r) for r in latest])
+        # AI scores are derived, not logged: recompute them where their inputs changed
+        rescore = list({event.trainset_id: by_id[event.trainset_id] for event in applied
+                        if event.path in AI_SCORE_FIELDS}.values())
+        if rescore:
+            scores, reason_bits = calculate_ai_scores(rescore)
+            assign_field(rescore, 'ai_score', scores)
+            assign_field(rescore, 'score_reason_bits', reason_bits)
+        return len(applied)
+    def close(self):
+        self._mm.flush()
+        del self._records, self._header, self._mm
+        self._lock_file.close()
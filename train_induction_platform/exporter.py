@@ -0,0 +1,170 @@
+import io
+import os
+import bz2
+import gzip
+import lzma
+import tempfile
+import numpy as np
+import pandas as pd
+from fleet_store import fleet_columns, FLEET_SCHEMA
+from alert_history import COLUMNS as ALERT_HISTORY_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PARQUET = True
+except ImportError:  # CSV and JSON Lines only
+    HAS_PARQUET = False
+
+EXPORT_FORMATS = ['csv', 'jsonl', 'parquet']
+# Stream compression for CSV / JSON Lines; Parquet compresses per column chunk with its own codecs
+STREAM_COMPRESSION = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+PARQUET_COMPRESSION = ['snappy', 'gzip', 'zstd', 'brotli', 'none']
+FILE_EXTENSIONS = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet', 'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz'}
+MIME_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'parquet': 'application/vnd.apache.parquet'}
+# Fleet status export: column name -> fleet field
+FLEET_STATUS_COLUMNS = {
+    'Trainset': 'id',
+    'Depot': 'depot',
+    'AI_Score': 'ai_score',
+    'Recommendation': 'recommendation',
+    'Fitness_Valid': 'fitness.overall_valid',
+    'Open_Jobs': 'job_cards.open',
+    'Reliability': 'operational.reliability_score'
+}
+DEFAULT_CHUNK_SIZE = 10000
+_FLEET_PATHS = {path for path, _ in FLEET_SCHEMA}
+
+# Chunk sources: each yields DataFrames of at most chunk_size rows
+
+def fleet_chunks(trainsets, columns=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fleet status in chunks. columns are FLEET_STATUS_COLUMNS names or fleet field paths;
+    only the selected fields are read."""
+    columns = columns or list(FLEET_STATUS_COLUMNS)
+    paths = {name: FLEET_STATUS_COLUMNS.get(name, name) for name in columns}
+    unknown = [name for name, path in paths.items() if path not in _FLEET_PATHS]
+    if unknown:
+        raise KeyError(f"Unknown fleet export columns: {unknown}")
+    trainsets = trainsets if isinstance(trainsets, list) else list(trainsets)
+    for start in range(0, len(trainsets), chunk_size):
+        chunk = fleet_columns(trainsets[start:start + chunk_size], list(paths.values()))
+        yield pd.DataFrame({name: chunk[path] for name, path in paths.items()})
+
+def frame_chunks(df, columns=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """An existing DataFrame (e.g. maintenance predictions) in row slices"""
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        yield chunk[columns] if columns else chunk
+
+def alert_history_chunks(history, start=None, end=None, columns=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Alert history rows opened in [start, end), read from the store a chunk at a time.
+    Timestamps are exported as naive UTC."""
+    for rows in history.iter_rows(start, end, chunk_size):
+        chunk = pd.DataFrame(rows, columns=ALERT_HISTORY_COLUMNS)
+        for column in ('opened_at', 'acknowledged_at', 'resolved_at'):
+            chunk[column] = pd.to_datetime(chunk[column], unit='s')
+        chunk['status'] = np.select([chunk['resolved_at'].notna(), chunk['acknowledged_at'].notna()],
+                                    ['resolved', 'acknowledged'], 'open')
+        yield chunk[columns] if columns else chunk
+
+def optimization_history_chunks(optimization_history, columns=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Retained optimization runs (an OptimizationHistory), one row per run, oldest first"""
+    for start in range(0, len(optimization_history), chunk_size):
+        chunk = optimization_history.frame(start, start + chunk_size)
+        yield chunk.reindex(columns=columns) if columns else chunk
+
+def records_chunks(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Any iterable of row dicts, without materializing it"""
+    rows = []
+    for record in records:
+        rows.append(record)
+        if len(rows) == chunk_size:
+            yield pd.DataFrame(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+# Writers
+
+def write_export(chunks, destination, fmt='csv', compression=None):
+    """Write DataFrame chunks to a path or binary file object, one chunk in memory at a time.
+    Returns the number of rows written."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {EXPORT_FORMATS}")
+    if fmt == 'parquet':
+        return _write_parquet(chunks, destination, compression)
+    if compression is not None and compression not in STREAM_COMPRESSION:
+        raise ValueError(f"Unknown compression {compression!r} for {fmt}; expected one of {list(STREAM_COMPRESSION)}")
+    own_file = isinstance(destination, (str, os.PathLike))
+    raw = open(destination, 'wb') if own_file else destination
+    stream = STREAM_COMPRESSION[compression](raw, 'wb') if compression else raw
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    rows = 0
+    try:
+        for i, chunk in enumerate(chunks):
+            if fmt == 'csv':
+                text.write(chunk.to_csv(index=False, header=i == 0))
+            else:
+                lines = chunk.to_json(orient='records', lines=True, date_format='iso', default_handler=str)
+                text.write(lines if not lines or lines.endswith('\n') else lines + '\n')
+            rows += len(chunk)
+        text.flush()
+    finally:
+        # Closing the wrapper would close a caller's file object too
+        text.detach()
+        if compression:
+            stream.close()
+        if own_file:
+            raw.close()
+    return rows
+
+def _write_parquet(chunks, destination, compression):
+    if not HAS_PARQUET:
+        raise ImportError("Parquet export requires pyarrow")
+    compression = compression or 'snappy'
+    if compression not in PARQUET_COMPRESSION:
+        raise ValueError(f"Unknown Parquet compression {compression!r}; expected one of {PARQUET_COMPRESSION}")
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                # The first chunk fixes the schema; all-null columns are widened to strings
+                schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                    for f in table.schema]).remove_metadata()
+                writer = pq.ParquetWriter(destination, schema, compression=compression)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def export_file_name(prefix, fmt, compression=None, timestamp=None):
+    """File name with the format and stream-compression extensions"""
+    name = f"{prefix}_{timestamp.strftime('%Y%m%d_%H%M%S')}" if timestamp else prefix
+    name += FILE_EXTENSIONS[fmt]
+    if fmt != 'parquet' and compression:
+        name += FILE_EXTENSIONS[compression]
+    return name
+
+def export_to_named_file(chunks, fmt='csv', compression=None, directory=None):
+    """Stream an export to a new named temporary file and return its path; the caller removes it"""
+    fd, path = tempfile.mkstemp(dir=directory, prefix='export_', suffix=export_file_name('', fmt, compression))
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            write_export(chunks, spool, fmt, compression)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def export_to_tempfile(chunks, fmt='csv', compression=None):
+    """Stream an export to a temporary file on disk and return it rewound for reading
+    (e.g. by st.download_button), so the export never has to fit in memory"""
+    # Unbuffered, so the object is a raw file (io.FileIO) that st.download_button accepts
+    spool = tempfile.TemporaryFile(buffering=0)
+    write_export(chunks, spool, fmt, compression)
+    spool.seek(0)
+    return spool
@@ -0,0 +1,474 @@
+import numpy as np
+import itertools
+from collections.abc import Mapping, MutableMapping
+
+# Leaf fields of the trainset model, one NumPy column each.
+# Kinds: int, float, bool, datetime, category (integer codes) and object.
+FLEET_SCHEMA = [
+    ('id', 'object'),
+    ('depot', 'category'),
+    ('fitness.rolling_stock', 'bool'),
+    ('fitness.signalling', 'bool'),
+    ('fitness.telecom', 'bool'),
+    ('fitness.expires_at', 'datetime'),
+    ('fitness.days_until_expiry', 'int'),
+    ('fitness.overall_valid', 'bool'),
+    ('job_cards.open', 'int'),
+    ('job_cards.closed_today', 'int'),
+    ('job_cards.priority', 'category'),
+    ('job_cards.maintenance_type', 'category'),
+    ('job_cards.estimated_hours', 'int'),
+    ('branding.advertiser', 'category'),
+    ('branding.contract_start', 'datetime'),
+    ('branding.hours_required_today', 'int'),
+    ('branding.contract_value', 'int'),
+    ('branding.exposure_deficit', 'int'),
+    ('mileage.total_km', 'int'),
+    ('mileage.since_maintenance', 'int'),
+    ('mileage.daily_target', 'int'),
+    ('mileage.balance_deviation', 'int'),
+    ('mileage.component_wear.brake_pads', 'float'),
+    ('mileage.component_wear.bogies', 'float'),
+    ('mileage.component_wear.hvac', 'float'),
+    ('cleaning.interior_status', 'category'),
+    ('cleaning.exterior_status', 'category'),
+    ('cleaning.last_cleaned', 'datetime'),
+    ('cleaning.deep_clean_due', 'bool'),
+    ('cleaning.cleaning_slot_assigned', 'object'),
+    ('cleaning.estimated_duration', 'int'),
+    ('stabling.current_bay', 'object'),
+    ('stabling.optimal_bay', 'object'),
+    ('stabling.shunting_moves_required', 'int'),
+    ('stabling.turn_out_time_minutes', 'int'),
+    ('stabling.energy_cost_shunting', 'int'),
+    ('operational.status', 'category'),
+    ('operational.last_service', 'datetime'),
+    ('operational.next_scheduled_maintenance', 'datetime'),
+    ('operational.reliability_score', 'int'),
+    ('operational.punctuality_impact', 'float'),
+    ('manual_override', 'object'),
+    ('override_reason', 'object'),
+    ('ai_score', 'int'),
+    ('score_reasons', 'object'),
+    ('score_reason_bits', 'int'),
+    ('recommendation', 'category'),
+    ('optimization_score', 'float'),
+    ('objective_scores', 'object'),
+    ('optimization_note', 'object'),
+]
+# Fields added by scoring/optimization; absent until first written
+OPTIONAL_FIELDS = {'ai_score', 'score_reasons', 'score_reason_bits', 'recommendation', 'optimization_score',
+                   'objective_scores', 'optimization_note'}
+# Optional fields computed on read from another field: path -> (source path, func(view))
+DERIVED_FIELDS = {}
+# Seed categories so codes are stable across stores
+DEFAULT_CATEGORIES = {
+    'depot': ['Aluva Depot', 'Petta Depot', 'Muttom Yard', 'Kakkanad Depot'],
+    'job_cards.priority': ['Low', 'Medium', 'High', 'Critical'],
+    'job_cards.maintenance_type': ['Routine', 'Preventive', 'Corrective', 'Emergency'],
+    'branding.advertiser': [None],
+    'cleaning.interior_status': ['Clean', 'Requires Cleaning'],
+    'cleaning.exterior_status': ['Clean', 'Requires Cleaning'],
+    'operational.status': ['Available', 'Maintenance', 'IBL', 'Standby'],
+    'recommendation': ['Service', 'Standby', 'IBL'],
+}
+_DTYPES = {'int': np.int64, 'float': np.float64, 'bool': np.bool_, 'datetime': 'datetime64[us]',
+           'category': np.int32, 'object': object}
+_KINDS = dict(FLEET_SCHEMA)
+# Section path -> ordered child names ('' is the trainset root)
+_CHILDREN = {'': []}
+for _path, _kind in FLEET_SCHEMA:
+    _parts = _path.split('.')
+    for _depth in range(len(_parts)):
+        _prefix = '.'.join(_parts[:_depth])
+        _CHILDREN.setdefault(_prefix, [])
+        if _parts[_depth] not in _CHILDREN[_prefix]:
+            _CHILDREN[_prefix].append(_parts[_depth])
+_SECTIONS = set(_CHILDREN) - {''}
+_STORE_TOKENS = itertools.count()
+
+def register_derived_field(path, source, func):
+    """Compute an optional field lazily from `source` when it has not been stored explicitly"""
+    DERIVED_FIELDS[path] = (source, func)
+
+def _default(kind):
+    """Fill value for a field missing from a trainset"""
+    return {'int': 0, 'float': 0.0, 'bool': False, 'datetime': None}.get(kind)
+
+class FleetStore:
+    """Struct-of-arrays fleet: one NumPy column per leaf field of the trainset dict."""
+    def __init__(self, n=0):
+        self.n = n
+        # Identifies this store and counts its writes, so results can be cached per fleet state
+        self.token = next(_STORE_TOKENS)
+        self.version = 0
+        self.columns = {}
+        self.categories = {}
+        self._category_index = {}
+        self._present = {path: np.zeros(n, dtype=bool) for path in OPTIONAL_FIELDS}
+        self._extra = [dict() for _ in range(n)]
+        # 2-D per-train arrays (e.g. objective score vectors), name -> (n, width) array
+        self.blocks = {}
+        # Blocks computed from fields: name -> source paths, and the rows whose sources changed since
+        self._block_sources = {}
+        self._block_stale = {}
+        for path, kind in FLEET_SCHEMA:
+            if kind == 'category':
+                self.categories[path] = list(DEFAULT_CATEGORIES.get(path, []))
+                self._category_index[path] = {v: i for i, v in enumerate(self.categories[path])}
+                self.columns[path] = np.full(n, self.category_code(path, None, add=True), dtype=np.int32)
+            elif kind == 'datetime':
+                self.columns[path] = np.full(n, np.datetime64('NaT'), dtype='datetime64[us]')
+            else:
+                self.columns[path] = np.zeros(n, dtype=_DTYPES[kind]) if kind != 'object' else np.full(n, None, dtype=object)
+    @classmethod
+    def from_trainsets(cls, trainsets):
+        """Build a store from a list of nested trainset dicts, preserving order"""
+        trainsets = list(trainsets)
+        store = cls(len(trainsets))
+        flat_rows = [_flatten(t) for t in trainsets]
+        for path, kind in FLEET_SCHEMA:
+            values = []
+            for row, flat in enumerate(flat_rows):
+                if path in flat:
+                    values.append(flat.pop(path))
+                    if path in OPTIONAL_FIELDS:
+                        store._present[path][row] = True
+                else:
+                    values.append(_default(kind))
+            store._fill(path, values)
+        # Anything left over is not part of the schema and is kept per row
+        store._extra = flat_rows
+        return store
+    def to_arrays(self):
+        """(arrays, state) for persistence: every fixed-width column, presence mask and block as
+        {name: array}, and the rest (object columns, categories, extra keys) as plain python"""
+        arrays = {f'column:{path}': self.columns[path] for path, kind in FLEET_SCHEMA if kind != 'object'}
+        arrays.update({f'present:{path}': mask for path, mask in self._present.items()})
+        arrays.update({f'block:{name}': block for name, block in self.blocks.items()})
+        arrays.update({f'stale:{name}': stale for name, stale in self._block_stale.items()})
+        state = {'n': self.n, 'version': self.version, 'categories': self.categories, 'extra': self._extra,
+                 'block_sources': {name: sorted(sources) for name, sources in self._block_sources.items()},
+                 'objects': {path: self.columns[path].tolist() for path, kind in FLEET_SCHEMA if kind == 'object'}}
+        return arrays, state
+    @classmethod
+    def from_arrays(cls, arrays, state):
+        """Store over arrays from to_arrays (used as given, e.g. memory-mapped; not copied)"""
+        store = cls.__new__(cls)
+        store.n = state['n']
+        store.token = next(_STORE_TOKENS)
+        store.version = state['version']
+        store.categories = state['categories']
+        store._category_index = {path: {v: i for i, v in enumerate(labels)} for path, labels in store.categories.items()}
+        store._extra = state['extra']
+        store.columns = {}
+        for path, kind in FLEET_SCHEMA:
+            if kind == 'object':
+                store.columns[path] = _object_array(state['objects'][path])
+            else:
+                store.columns[path] = arrays[f'column:{path}']
+        store._present = {path: arrays[f'present:{path}'] for path in OPTIONAL_FIELDS}
+        store.blocks = {name[len('block:'):]: array for name, array in arrays.items() if name.startswith('block:')}
+        store._block_sources = {name: frozenset(sources) for name, sources in state.get('block_sources', {}).items()}
+        store._block_stale = {name: arrays.get(f'stale:{name}', np.ones(store.n, dtype=bool))
+                              for name in store._block_sources}
+        return store
+    def _fill(self, path, values, rows=None):
+        """Write python values into a column"""
+        self.version += 1
+        kind = _KINDS[path]
+        column = self.columns[path]
+        if rows is None:
+            rows = np.arange(self.n)
+        if kind == 'category':
+            column[rows] = [self.category_code(path, v, add=True) for v in values]
+        elif kind == 'object':
+            for row, value in zip(rows, values):
+                column[row] = value
+        else:
+            column[rows] = np.asarray(values, dtype=_DTYPES[kind]) if kind != 'datetime' else np.array(values, dtype='datetime64[us]')
+    def __len__(self):
+        return self.n
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.n
+        if not 0 <= row < self.n:
+            raise IndexError(row)
+        return TrainsetView(self, row)
+    def __iter__(self):
+        return iter(self.views())
+    def views(self, rows=None):
+        """Dict-compatible views for the frontend, in row order or the given order"""
+        rows = range(self.n) if rows is None else rows
+        return [TrainsetView(self, int(r)) for r in rows]
+    def to_trainsets(self):
+        """Materialize plain nested dicts (a detached copy)"""
+        return [TrainsetView(self, r).to_dict() for r in range(self.n)]
+    # Column access
+    def column(self, path):
+        """Raw storage for a leaf field (codes for categorical fields); not a copy"""
+        return self.columns[path]
+    def present(self, path):
+        """Mask of rows where an optional field has been set"""
+        return self._present[path] if path in self._present else np.ones(self.n, dtype=bool)
+    def category_code(self, path, value, add=False):
+        """Integer code of a category label, -1 if unknown"""
+        index = self._category_index[path]
+        if value not in index:
+            if not add:
+                return -1
+            index[value] = len(self.categories[path])
+            self.categories[path].append(value)
+        return index[value]
+    def decoded(self, path, rows=None):
+        """Column values as python labels / objects"""
+        column = self.columns[path] if rows is None else self.columns[path][rows]
+        if _KINDS[path] == 'category':
+            labels = np.empty(len(self.categories[path]), dtype=object)
+            labels[:] = self.categories[path]
+            return labels[column]
+        return column
+    def set_column(self, path, values, rows=None):
+        """Vectorized write of a leaf field, optionally only for some rows"""
+        kind = _KINDS[path]
+        self.version += 1
+        if rows is None:
+            rows = np.arange(self.n)
+        if kind in ('category', 'object'):
+            self._fill(path, list(values), rows)
+        else:
+            self.columns[path][rows] = values
+        self._mark_present(path, rows)
+    def _mark_present(self, path, rows):
+        """Flag an optional field as set; stored values derived from it become stale"""
+        if path in self._present:
+            self._present[path][rows] = True
+        for derived, (source, _) in DERIVED_FIELDS.items():
+            if source == path:
+                self._present[derived][rows] = False
+        for name, sources in self._block_sources.items():
+            if path in sources:
+                self._block_stale[name][rows] = True
+    def block(self, name, width=None, sources=None):
+        """2-D per-train array, created zero-filled with the given width on first use. With sources
+        (field paths), every write to one of them marks the row stale in block_stale(name)."""
+        if name not in self.blocks:
+            if width is None:
+                raise KeyError(name)
+            self.blocks[name] = np.zeros((self.n, width))
+        if sources is not None and name not in self._block_sources:
+            self._block_sources[name] = frozenset(sources)
+            self._block_stale[name] = np.ones(self.n, dtype=bool)
+        return self.blocks[name]
+    def block_stale(self, name):
+        """Mask of rows whose block values are outdated (never computed or a source field written since)"""
+        return self._block_stale[name]
+    def refresh_block(self, name, rows, values):
+        """Store freshly computed block rows and mark them current"""
+        self.blocks[name][rows] = values
+        self._block_stale[name][rows] = False
+    def has(self, row, path):
+        """Whether a field is readable for a row (always true for required fields)"""
+        if path not in self._present or self._present[path][row]:
+            return True
+        return path in DERIVED_FIELDS and self._present[DERIVED_FIELDS[path][0]][row]
+    # Scalar access used by the view layer
+    def get_value(self, row, path):
+        kind = _KINDS[path]
+        if path in self._present and not self._present[path][row]:
+            if not self.has(row, path):
+                raise KeyError(path)
+            return DERIVED_FIELDS[path][1](TrainsetView(self, row))
+        value = self.columns[path][row]
+        if kind == 'category':
+            return self.categories[path][value]
+        if kind == 'object':
+            return value
+        if kind == 'datetime':
+            return None if np.isnat(value) else value.item()
+        return value.item()
+    def set_value(self, row, path, value):
+        kind = _KINDS[path]
+        self.version += 1
+        if kind == 'category':
+            self.columns[path][row] = self.category_code(path, value, add=True)
+        elif kind == 'datetime':
+            self.columns[path][row] = np.datetime64('NaT') if value is None else np.datetime64(value, 'us')
+        else:
+            self.columns[path][row] = value
+        self._mark_present(path, row)
+    def extend(self, trainsets):
+        """Append trainsets as new rows"""
+        other = FleetStore.from_trainsets(trainsets)
+        for path, kind in FLEET_SCHEMA:
+            values = other.columns[path]
+            if kind == 'category':
+                values = np.array([self.category_code(path, v, add=True) for v in other.decoded(path)], dtype=np.int32)
+            self.columns[path] = np.concatenate([self.columns[path], values])
+        for path in self._present:
+            self._present[path] = np.concatenate([self._present[path], other._present[path]])
+        for name, block in self.blocks.items():
+            self.blocks[name] = np.concatenate([block, np.zeros((other.n, block.shape[1]))])
+        for name, stale in self._block_stale.items():
+            self._block_stale[name] = np.concatenate([stale, np.ones(other.n, dtype=bool)])
+        self._extra.extend(other._extra)
+        self.version += 1
+        start = self.n
+        self.n += other.n
+        return self.views(range(start, self.n))
+
+def _flatten(trainset, prefix=''):
+    """Nested dict -> {dotted path: value}, descending only into known sections"""
+    flat = {}
+    for key, value in trainset.items():
+        path = prefix + key
+        if path in _SECTIONS and isinstance(value, Mapping):
+            flat.update(_flatten(value, path + '.'))
+        else:
+            flat[path] = value
+    return flat
+
+class SectionView(MutableMapping):
+    """Dict-like view of one trainset (or one nested section of it) inside a FleetStore"""
+    __slots__ = ('store', 'row', 'prefix')
+    def __init__(self, store, row, prefix=''):
+        self.store = store
+        self.row = row
+        self.prefix = prefix
+    def _path(self, key):
+        return self.prefix + '.' + key if self.prefix else key
+    def __getitem__(self, key):
+        path = self._path(key)
+        if path in _KINDS:
+            return self.store.get_value(self.row, path)
+        if path in _SECTIONS:
+            return SectionView(self.store, self.row, path)
+        try:
+            return self.store._extra[self.row][path]
+        except KeyError:
+            raise KeyError(key) from None
+    def __setitem__(self, key, value):
+        path = self._path(key)
+        if path in _KINDS:
+            self.store.set_value(self.row, path, value)
+        elif path in _SECTIONS and isinstance(value, Mapping):
+            section = SectionView(self.store, self.row, path)
+            for child_key, child_value in value.items():
+                section[child_key] = child_value
+        else:
+            self.store._extra[self.row][path] = value
+            self.store.version += 1
+    def __delitem__(self, key):
+        path = self._path(key)
+        self.store.version += 1
+        if path in self.store._present and self.store._present[path][self.row]:
+            self.store._present[path][self.row] = False
+        elif path in self.store._extra[self.row]:
+            del self.store._extra[self.row][path]
+        else:
+            raise KeyError(key)
+    def __iter__(self):
+        for key in _CHILDREN[self.prefix]:
+            if self.store.has(self.row, self._path(key)):
+                yield key
+        depth = self.prefix.count('.') + 1 if self.prefix else 0
+        for path in list(self.store._extra[self.row]):
+            if path.count('.') == depth and (not self.prefix or path.startswith(self.prefix + '.')):
+                yield path.rsplit('.', 1)[-1]
+    def __len__(self):
+        return sum(1 for _ in self)
+    def to_dict(self):
+        """Plain nested dict copy of this view"""
+        return {k: (v.to_dict() if isinstance(v, SectionView) else v) for k, v in self.items()}
+    def copy(self):
+        return self.to_dict()
+    def __repr__(self):
+        return repr(self.to_dict())
+
+class TrainsetView(SectionView):
+    """Dict-compatible handle on one row of a FleetStore"""
+    __slots__ = ()
+    def __init__(self, store, row):
+        super().__init__(store, row, '')
+
+def attached_fleet(trainsets):
+    """(store, rows) when trainsets are views onto a single FleetStore, else (None, None)"""
+    if isinstance(trainsets, FleetStore):
+        return trainsets, np.arange(trainsets.n)
+    trainsets = list(trainsets)
+    if trainsets and isinstance(trainsets[0], TrainsetView):
+        store = trainsets[0].store
+        if all(isinstance(t, TrainsetView) and t.store is store for t in trainsets):
+            return store, np.fromiter((t.row for t in trainsets), dtype=np.int64, count=len(trainsets))
+    return None, None
+
+def fleet_version(trainsets):
+    """Hashable key of the current state of an attached fleet: (store token, write count, row order).
+    None for plain dicts, whose changes cannot be observed."""
+    store, rows = attached_fleet(trainsets)
+    if store is None:
+        return None
+    return store.token, store.version, hash(rows.tobytes())
+
+def fleet_columns(trainsets, paths):
+    """{path: array} for leaf fields: column slices for attached views, gathered from dicts otherwise.
+    Categorical fields come back as label arrays."""
+    store, rows = attached_fleet(trainsets)
+    if store is not None:
+        return {path: store.decoded(path, rows) for path in paths}
+    columns = {}
+    for path in paths:
+        values = _gather(trainsets, path.split('.'))
+        kind = _KINDS[path]
+        dtype = object if kind == 'category' else _DTYPES[kind]
+        if kind == 'float' or (kind == 'int' and any(isinstance(v, float) for v in values)):
+            dtype = np.float64
+        columns[path] = np.array(values, dtype=dtype) if dtype is not object else _object_array(values)
+    return columns
+
+def _gather(trainsets, keys):
+    # Unrolled for the one- to three-level paths of the trainset model
+    if len(keys) == 1:
+        k0, = keys
+        return [trainset[k0] for trainset in trainsets]
+    if len(keys) == 2:
+        k0, k1 = keys
+        return [trainset[k0][k1] for trainset in trainsets]
+    if len(keys) == 3:
+        k0, k1, k2 = keys
+        return [trainset[k0][k1][k2] for trainset in trainsets]
+    values = []
+    for trainset in trainsets:
+        value = trainset
+        for key in keys:
+            value = value[key]
+        values.append(value)
+    return values
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+def resolve_fleet(trainsets):
+    """Columnar form of a fleet for whole-column operations.
+    Returns (store, rows, attached): rows maps list positions to store rows, and attached
+    is False when plain dicts were copied into a detached store (writes must go back to the dicts)."""
+    store, rows = attached_fleet(trainsets)
+    if store is not None:
+        return store, rows, True
+    store = FleetStore.from_trainsets([t.to_dict() if isinstance(t, SectionView) else t for t in trainsets])
+    return store, np.arange(store.n), False
+
+def assign_field(trainsets, path, values):
+    """Write one value per trainset to a (dotted) field, column-wise when the fleet is attached"""
+    store, rows = attached_fleet(trainsets)
+    if store is not None:
+        store.set_column(path, values, rows)
+        return
+    keys = path.split('.')
+    for trainset, value in zip(trainsets, values):
+        target = trainset
+        for key in keys[:-1]:
+            target = target[key]
+        target[keys[-1]] = value.item() if isinstance(value, np.generic) else value
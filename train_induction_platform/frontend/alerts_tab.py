@@ -93,19 +93,48 @@ def create_alerts_tab():
             </div>
             """, unsafe_allow_html=True)
 
-        # Display alerts by priority
+        # Display alerts by priority; a rule tripped by many trainsets is shown as one summary card
+        alert_manager = st.session_state.system_manager.alert_manager
         for priority, alert_list in [('Critical', critical_alerts), ('High', high_alerts), ('Medium', medium_alerts)]:
             if alert_list:
                 st.subheader(f"{priority} Priority Alerts")
                 
-                for alert in alert_list:
+                for alert in alert_manager.grouped_alerts(alert_list):
                     alert_class = f"alert-{priority.lower()}"
                     st.markdown(f"""
                     <div class="metric-card {alert_class}">
                         <strong>{alert['type'].replace('_', ' ').title()}</strong><br>
                         {alert['message']}<br>
-                        <small>Time: {alert['timestamp'].strftime('%H:%M:%S')}</small>
+                        <small>Since: {alert['timestamp'].strftime('%H:%M:%S')} · {alert['status'].title()}</small>
                     </div>
                     """, unsafe_allow_html=True)
+                    members = alert.get('members', [alert])
+                    if 'members' in alert:
+                        with st.expander(f"Show {len(members)} trainsets"):
+                            for member in members:
+                                st.write(f"{member['message']} ({member['status']})")
+                    pending = [member['id'] for member in members if member['status'] == 'open']
+                    if pending and st.button("Acknowledge" + (" all" if len(pending) > 1 else ""), key=f"ack_{alert['id']}"):
+                        alert_manager.acknowledge(pending)
+                        st.rerun()
+
+        # Persistent history, queried from the alert store rather than filtered in memory
+        history = alert_manager.history
+        if history is not None:
+            st.subheader("📜 Alert History")
+            col1, col2 = st.columns(2)
+            with col1:
+                hourly = pd.DataFrame(history.hourly_counts(datetime.now() - timedelta(hours=24)),
+                                      columns=['hour', 'type', 'count'])
+                if not hourly.empty:
+                    fig = px.bar(hourly, x='hour', y='count', color='type', title="Alerts Opened per Hour (24h)")
+                    st.plotly_chart(fig, use_container_width=True)
+            with col2:
+                trainset_ids = sorted({a['trainset_id'] for a in alerts if a['trainset_id'] is not None})
+                if trainset_ids:
+                    selected = st.selectbox("Trainset", trainset_ids, key="alert_history_trainset")
+                    recent = pd.DataFrame(history.last_for_trainset(selected, 10))
+                    st.dataframe(recent[['type', 'priority', 'status', 'opened_at', 'resolved_at', 'message']],
+                                 use_container_width=True)
     else:
         st.info("Run AI optimization to generate alerts")
\ No newline at end of file
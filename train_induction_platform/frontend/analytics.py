@@ -4,6 +4,9 @@ import plotly.graph_objects as go   # Time series plots
 from plotly.subplots import make_subplots  # Multiple plots
 from datetime import datetime       # Timestamps for exports
 import json                         # Export report JSON
+from exporter import (EXPORT_FORMATS, HAS_PARQUET, PARQUET_COMPRESSION, STREAM_COMPRESSION, MIME_TYPES,
+                      export_file_name, export_to_tempfile, frame_chunks)  # Streaming exports
+from tracing import TRACER          # Stage latency histograms
 
 def create_analytics_tab():
     """Create the analytics and trends tab"""
@@ -15,7 +18,7 @@ def create_analytics_tab():
         fig = make_subplots(
             rows=2, cols=2,
             subplot_titles=('Service Readiness', 'Fitness Compliance', 
-                           'Alert Counts', 'Processing Time'),
+                           'Alert Counts', 'Processing Time per Stage (ms)'),
             vertical_spacing=0.1
         )
         # Service readiness trend
@@ -36,16 +39,41 @@ def create_analytics_tab():
                       name='Alerts', line=dict(color='red')),
             row=2, col=1
         )
-        # Processing times
-        fig.add_trace(
-            go.Scatter(x=trends['timestamps'], y=trends['processing_times'], 
-                      name='Processing Time (s)', line=dict(color='orange')),
-            row=2, col=2
-        ) 
-        fig.update_layout(height=600, showlegend=False)
+        # Processing time per pipeline stage, stacked
+        stages = trends['stage_timings']
+        for stage, seconds in stages.items():
+            fig.add_trace(
+                go.Bar(x=trends['timestamps'], y=seconds * 1000, name=stage.replace('_', ' ').title(),
+                       legendgroup='stages'),
+                row=2, col=2
+            )
+        if not stages:
+            fig.add_trace(
+                go.Scatter(x=trends['timestamps'], y=trends['processing_times'],
+                          name='Processing Time (s)', line=dict(color='orange')),
+                row=2, col=2
+            )
+        fig.update_layout(height=600, barmode='stack', showlegend=bool(stages))
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Run multiple optimizations to see trends")
+    # Latency percentiles of every traced span, across all runs in this process
+    latency = TRACER.summary()
+    if latency:
+        st.subheader("⏱️ Pipeline Latency")
+        latency_df = pd.DataFrame([
+            {'Span': name, 'Calls': stats['count'], 'p50 (ms)': stats['p50'] * 1000, 'p95 (ms)': stats['p95'] * 1000,
+             'p99 (ms)': stats['p99'] * 1000, 'Max (ms)': stats['max'] * 1000}
+            for name, stats in latency.items()
+        ]).sort_values('p95 (ms)', ascending=False)
+        st.dataframe(latency_df.round(3), use_container_width=True, hide_index=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download Prometheus Metrics", TRACER.to_prometheus(), file_name="kmrl_latency.prom",
+                               mime="text/plain")
+        with col2:
+            st.download_button("Download Latency JSON", TRACER.to_json(indent=2), file_name="kmrl_latency.json",
+                               mime="application/json")
     # Performance metrics summary
     if 'current_metrics' in st.session_state:
         metrics = st.session_state.current_metrics
@@ -62,38 +90,48 @@ def create_analytics_tab():
             st.metric("Energy Efficiency", f"{metrics.get('energy_efficiency', 0)}%")
     # Export options
     st.subheader("📊 Export Options")
+    # Exports are streamed to a temporary file in chunks rather than built in memory
+    fmt_col, compression_col = st.columns(2)
+    with fmt_col:
+        fmt = st.selectbox("Format", [f for f in EXPORT_FORMATS if f != 'parquet' or HAS_PARQUET], key="export_format")
+    with compression_col:
+        options = ['none'] + (PARQUET_COMPRESSION[:-1] if fmt == 'parquet' else list(STREAM_COMPRESSION))
+        compression = st.selectbox("Compression", options, key="export_compression")
+        compression = None if compression == 'none' else compression
+    label = fmt.upper() if fmt != 'jsonl' else "JSON Lines"
+    system_manager = st.session_state.system_manager
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("📄 Export Fleet Status"):
-            fleet_df = pd.DataFrame([
-                {
-                    'Trainset': t['id'],
-                    'Depot': t['depot'],
-                    'AI_Score': t['ai_score'],
-                    'Recommendation': t['recommendation'],
-                    'Fitness_Valid': t['fitness']['overall_valid'],
-                    'Open_Jobs': t['job_cards']['open'],
-                    'Reliability': t['operational']['reliability_score']
-                }
-                for t in st.session_state.trainsets
-            ])
-            csv = fleet_df.to_csv(index=False)
             st.download_button(
-                label="Download Fleet Status CSV",
-                data=csv,
-                file_name=f"fleet_status_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
+                label=f"Download Fleet Status {label}",
+                data=system_manager.export_fleet_status(st.session_state.trainsets, fmt, compression),
+                file_name=export_file_name("fleet_status", fmt, compression, datetime.now()),
+                mime=MIME_TYPES[fmt]
+            )
+        if st.button("📈 Export Optimization History"):
+            st.download_button(
+                label=f"Download Optimization History {label}",
+                data=system_manager.export_optimization_history(fmt, compression),
+                file_name=export_file_name("optimization_history", fmt, compression, datetime.now()),
+                mime=MIME_TYPES[fmt]
             )
     with col2:
         if st.button("🔧 Export Maintenance Plan"):
             if 'maintenance_predictions' in st.session_state:
-                csv = st.session_state.maintenance_predictions.to_csv(index=False)
                 st.download_button(
-                    label="Download Maintenance Plan CSV",
-                    data=csv,
-                    file_name=f"maintenance_plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
+                    label=f"Download Maintenance Plan {label}",
+                    data=export_to_tempfile(frame_chunks(st.session_state.maintenance_predictions), fmt, compression),
+                    file_name=export_file_name("maintenance_plan", fmt, compression, datetime.now()),
+                    mime=MIME_TYPES[fmt]
                 )
+        if system_manager.alert_manager.history is not None and st.button("⚠️ Export Alert History"):
+            st.download_button(
+                label=f"Download Alert History {label}",
+                data=system_manager.export_alert_history(fmt, compression),
+                file_name=export_file_name("alert_history", fmt, compression, datetime.now()),
+                mime=MIME_TYPES[fmt]
+            )
     with col3:
         if st.button("📊 Export Analytics Report"):
             # Generate comprehensive report
@@ -75,6 +75,9 @@ def create_trainset_card(train):
             wear_avg = sum(train['mileage']['component_wear'].values()) / 3
             st.write(f"**Avg Wear:** {wear_avg:.1f}%")
             st.write(f"**Days to Fitness Expiry:** {train['fitness']['days_until_expiry']}")
+        # Reason strings are decoded from the score bitmask only here
+        if train.get('score_reasons'):
+            st.caption("Score factors: " + ", ".join(train['score_reasons']))
         # Manual override
         st.subheader("Manual Override")
         override_status = st.selectbox(
@@ -90,10 +93,8 @@ def create_trainset_card(train):
         )
         if st.button(f"Apply Override", key=f"apply_{train['id']}"):
             if override_status != "None":
-                train['manual_override'] = override_status
-                train['override_reason'] = override_reason
+                st.session_state.system_manager.record_override(train, override_status, override_reason)
                 st.success(f"Override applied: {train['id']} → {override_status}")
             else:
-                train['manual_override'] = None
-                train['override_reason'] = ''
+                st.session_state.system_manager.record_override(train, None, '')
                 st.info("Override removed")
\ No newline at end of file
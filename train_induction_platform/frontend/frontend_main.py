@@ -9,6 +9,7 @@ import math
 import threading
 import queue
 import json
+import uuid
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -20,7 +21,7 @@ import warnings
 
 
 
-from system_manager import SystemIntegrationManager
+from system_manager import SystemIntegrationManager, session_data_dir
 from frontend.dashboard import create_dashboard_tab
 from frontend.fleet_status import create_fleet_status_tab
 from frontend.maintenance import create_maintenance_tab
@@ -32,12 +33,24 @@ from frontend.timetable_f import create_timetable_tab
 
 
 
+def session_dir():
+    """Data directory of this browser session. Its id is kept in the page URL (?session=...), so a
+    reload or bookmark resumes the same state while other sessions keep theirs."""
+    session_id = st.query_params.get('session')
+    try:
+        return session_data_dir(session_id)
+    except ValueError:
+        session_id = uuid.uuid4().hex
+        st.query_params['session'] = session_id
+        return session_data_dir(session_id)
+
 def create_streamlit_frontend():
     """ Create a comprehensive Streamlit frontend for the KMRL AI Induction Planning Platform"""
     # Initialize session state
     if 'system_manager' not in st.session_state:
-        st.session_state.system_manager = SystemIntegrationManager()
-        st.session_state.trainsets = st.session_state.system_manager.initialize_system(25)
+        st.session_state.system_manager = SystemIntegrationManager(data_dir=session_dir())
+        # Resume from the last saved snapshot; without one, generate a fleet and train from scratch
+        st.session_state.trainsets = st.session_state.system_manager.restore_or_initialize(25)
         st.session_state.last_refresh = datetime.now()
         st.session_state.auto_refresh = False
     # Page configuration
@@ -84,7 +97,7 @@ def create_streamlit_frontend():
         # Manual refresh button
         if st.button("🔄 Refresh Data", type="primary"):
             with st.spinner("Refreshing real-time data..."):
-                st.session_state.trainsets, update_count = st.session_state.system_manager.data_integrator.refresh_all_data(
+                st.session_state.trainsets, update_count = st.session_state.system_manager.refresh_data(
                     st.session_state.trainsets
                 )
                 st.success(f"Updated {update_count} records")
@@ -98,7 +111,10 @@ def create_streamlit_frontend():
             'service_target': service_target,
             'max_ibl': max_ibl,
             'branding_priority': st.selectbox("Branding Priority", ["Low", "Medium", "High"]),
-            'maintenance_buffer': st.slider("Maintenance Buffer (days)", 1, 7, 3)
+            'maintenance_buffer': st.slider("Maintenance Buffer (days)", 1, 7, 3),
+            'solver': st.selectbox("Assignment Solver", ["Greedy", "Exact", "Anytime"]).lower(),
+            'time_budget': st.slider("Time Budget (s)", 1, 60, 10),
+            'sharding': 'depot' if st.checkbox("Optimize per Depot", value=False) else None
         }
         # Run optimization
         if st.button("🚀 Run AI Optimization", type="primary"):
@@ -114,8 +130,15 @@ def create_streamlit_frontend():
                 st.session_state.current_alerts = alerts
                 st.session_state.maintenance_predictions = maintenance_pred
                 st.session_state.timetable = timetable  # Store timetable in session state
+                # Keep fleet, model and history across restarts
+                st.session_state.system_manager.save_snapshot(optimized_trainsets)
                 
                 st.success("Optimization completed!")
+                report = st.session_state.system_manager.optimizer.last_solver_report
+                if (constraints['solver'] != 'greedy' or constraints['sharding']) and report:
+                    # No gap without a bound (no solution found, or a shard without a bound)
+                    gap = 'n/a' if report.get('gap') is None else f"{report['gap']:.2%}"
+                    st.caption(f"Solver: {report['backend']}, {report['status']}, gap {gap}")
         # Data source status
         st.subheader("🔗 Data Sources")
         for source, status in st.session_state.system_manager.data_integrator.data_sources.items():
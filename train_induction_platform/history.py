@@ -0,0 +1,156 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Per-run values kept as columns; stage timings get a 'stage.<name>' column the first time a stage appears
+HISTORY_COLUMNS = ['service_ready', 'fitness_compliance', 'alert_count', 'processing_time']
+ROLLUP_PERIODS = {'hourly': 3600, 'daily': 86400}
+
+class Rollup:
+    """
+    Downsampled history: count, sum, min and max per column for each period bucket (hour or day).
+    Samples arrive in time order, so only the newest bucket is ever updated; the oldest buckets are
+    dropped once capacity is reached.
+    """
+    def __init__(self, period, capacity):
+        self.period = period
+        self.capacity = capacity
+        self.bucket = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.stats = {}
+        self.start = 0
+        self.size = 0
+    def _columns(self, name):
+        if name not in self.stats:
+            self.stats[name] = {'sum': np.zeros(self.capacity), 'min': np.full(self.capacity, np.inf),
+                                'max': np.full(self.capacity, -np.inf)}
+        return self.stats[name]
+    def add(self, timestamp, values):
+        """Fold one sample (epoch seconds, {column: value}) into its bucket"""
+        bucket = int(timestamp // self.period)
+        last = (self.start + self.size - 1) % self.capacity
+        if not self.size or self.bucket[last] != bucket:
+            if self.size == self.capacity:
+                self.start = (self.start + 1) % self.capacity
+            else:
+                self.size += 1
+            last = (self.start + self.size - 1) % self.capacity
+            self.bucket[last] = bucket
+            self.count[last] = 0
+            for stats in self.stats.values():
+                stats['sum'][last], stats['min'][last], stats['max'][last] = 0.0, np.inf, -np.inf
+        self.count[last] += 1
+        for name, value in values.items():
+            if not np.isnan(value):
+                stats = self._columns(name)
+                stats['sum'][last] += value
+                stats['min'][last] = min(stats['min'][last], value)
+                stats['max'][last] = max(stats['max'][last], value)
+    def frame(self):
+        """Buckets oldest first: period start, run count and mean/min/max per column"""
+        order = (self.start + np.arange(self.size)) % self.capacity
+        data = {'period_start': pd.to_datetime(self.bucket[order] * self.period, unit='s'),
+                'runs': self.count[order]}
+        for name, stats in self.stats.items():
+            with np.errstate(invalid='ignore', divide='ignore'):
+                data[f'{name}_mean'] = stats['sum'][order] / self.count[order]
+            data[f'{name}_min'] = np.where(np.isinf(stats['min'][order]), np.nan, stats['min'][order])
+            data[f'{name}_max'] = np.where(np.isinf(stats['max'][order]), np.nan, stats['max'][order])
+        return pd.DataFrame(data)
+
+class OptimizationHistory:
+    """
+    Fixed-capacity history of optimization runs in preallocated NumPy columns. Each value is written
+    twice, at i and i + capacity, so the last `capacity` runs are always one contiguous slice and
+    trend views are zero-copy. Runs pushed out of the window are folded into hourly and daily rollups.
+    The full record dicts (metrics, constraints, convergence traces) are kept only for the most
+    recent `detail` runs.
+    """
+    def __init__(self, capacity=2048, detail=200, hourly_capacity=24 * 90, daily_capacity=3650):
+        self.capacity = capacity
+        self.timestamps = np.full(2 * capacity, np.datetime64('NaT'), dtype='datetime64[us]')
+        self.columns = {name: np.full(2 * capacity, np.nan) for name in HISTORY_COLUMNS}
+        self.head = 0
+        self.size = 0
+        # Runs ever recorded; unlike len() it keeps growing after the window is full
+        self.total = 0
+        self.recent = deque(maxlen=detail)
+        self.rollups = {'hourly': Rollup(ROLLUP_PERIODS['hourly'], hourly_capacity),
+                        'daily': Rollup(ROLLUP_PERIODS['daily'], daily_capacity)}
+    def __len__(self):
+        return self.size
+    def __bool__(self):
+        return self.size > 0
+    def _column(self, name):
+        if name not in self.columns:
+            self.columns[name] = np.full(2 * self.capacity, np.nan)
+        return self.columns[name]
+    def append(self, record):
+        """Record a run: {'timestamp', 'metrics', 'alert_count', ...} as built by the pipeline"""
+        if self.size == self.capacity:
+            self._roll_up(self.head)
+        slot = self.head
+        metrics = record.get('metrics', {})
+        values = {name: metrics.get(name, 0) for name in HISTORY_COLUMNS}
+        values['alert_count'] = record.get('alert_count', 0)
+        values.update({f'stage.{stage}': seconds for stage, seconds in record.get('stage_timings', {}).items()})
+        self._write(slot, 'timestamp', np.datetime64(record['timestamp'], 'us'))
+        for name, column in self.columns.items():
+            self._write(slot, name, values.get(name, np.nan))
+        for name in values.keys() - self.columns.keys():
+            self._write(slot, name, values[name])
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.total += 1
+        self.recent.append(record)
+    def _write(self, slot, name, value):
+        column = self.timestamps if name == 'timestamp' else self._column(name)
+        column[slot] = column[slot + self.capacity] = value
+    def _roll_up(self, slot):
+        timestamp = self.timestamps[slot].astype('datetime64[us]').astype(np.int64) / 1e6
+        values = {name: float(column[slot]) for name, column in self.columns.items()}
+        for rollup in self.rollups.values():
+            rollup.add(timestamp, values)
+    def set_stage_timings(self, timings):
+        """Attach stage timings to the most recent run"""
+        if not self.size:
+            return
+        slot = (self.head - 1) % self.capacity
+        for stage, seconds in timings.items():
+            self._write(slot, f'stage.{stage}', seconds)
+        if self.recent:
+            self.recent[-1]['stage_timings'] = timings
+    def _window(self):
+        start = (self.head - self.size) % self.capacity
+        return slice(start, start + self.size)
+    def view(self, name):
+        """Column over the retained runs, oldest first, as a read-only zero-copy view"""
+        column = self.timestamps if name == 'timestamp' else self.columns[name]
+        view = column[self._window()]
+        view.flags.writeable = False
+        return view
+    def stages(self):
+        return [name[len('stage.'):] for name in self.columns if name.startswith('stage.')]
+    def trends(self):
+        """Trend series as zero-copy views; valid until the next append"""
+        return {
+            'timestamps': self.view('timestamp'),
+            'service_readiness': self.view('service_ready'),
+            'fitness_compliance': self.view('fitness_compliance'),
+            'alert_counts': self.view('alert_count'),
+            'processing_times': self.view('processing_time'),
+            'stage_timings': {stage: self.view(f'stage.{stage}') for stage in self.stages()}
+        }
+    def frame(self, start=0, stop=None):
+        """Retained runs [start, stop) (oldest first) as a DataFrame"""
+        window = self._window()
+        rows = slice(window.start + start, window.start + (self.size if stop is None else min(stop, self.size)))
+        data = {'timestamp': self.timestamps[rows]}
+        data.update({name: self.columns[name][rows] for name in self.columns})
+        return pd.DataFrame(data)
+    def rollup(self, period='hourly'):
+        """Hourly or daily rollup of runs that have left the raw window"""
+        return self.rollups[period].frame()
+    def last(self):
+        """Full record of the most recent run, or None"""
+        return self.recent[-1] if self.recent else None
@@ -0,0 +1,303 @@
+import numpy as np
+import time
+from fleet_store import fleet_columns
+
+try:
+    from scipy.optimize import milp, LinearConstraint, Bounds
+    from scipy.sparse import csr_matrix
+    HAS_MILP = True
+except ImportError:  # pure-Python branch-and-bound is used instead
+    HAS_MILP = False
+
+SERVICE, STANDBY, IBL = 0, 1, 2
+ASSIGNMENT_LABELS = ['Service', 'Standby', 'IBL']
+BRANDING_PRIORITY_WEIGHTS = {'Low': 0.1, 'Medium': 0.25, 'High': 0.5}
+
+class InductionSolver:
+    """
+    Exact nightly induction decision: every trainset goes to Service, Standby or IBL.
+    Integer program:
+        maximize   sum_i vS_i * s_i + vI_i * b_i
+        subject to s_i + b_i <= 1,  sum s_i <= service_target,  sum b_i <= max_ibl,
+                   sum moves_i * s_i <= max_shunting_moves (optional),
+                   s_i = 0 unless fitness is valid and the train is not in IBL,
+                   b_i = 0 unless the train needs maintenance.
+    vS rewards optimization score and branding exposure, charges shunting, and carries the
+    service-shortfall penalty; vI rewards sending low-scoring trains to the inspection bay.
+    Solved with SciPy's MILP (HiGHS) when installed, otherwise by branch-and-bound.
+    """
+    def __init__(self, time_budget=10.0, mip_gap=1e-6, backend=None):
+        self.time_budget = time_budget
+        self.mip_gap = mip_gap
+        self.backend = backend or ('milp' if HAS_MILP else 'branch_and_bound')
+    def build_model(self, trainsets, scores, constraints):
+        """Objective coefficients, eligibility and capacities for the fleet"""
+        cols = fleet_columns(trainsets, ['fitness.overall_valid', 'operational.status', 'job_cards.open',
+                                         'branding.hours_required_today', 'branding.exposure_deficit',
+                                         'stabling.shunting_moves_required'])
+        status = cols['operational.status']
+        valid = cols['fitness.overall_valid'].astype(bool)
+        brand_need = cols['branding.hours_required_today'] + cols['branding.exposure_deficit']
+        moves = cols['stabling.shunting_moves_required'].astype(float)
+        branding_weight = constraints.get('branding_weight',
+                                          BRANDING_PRIORITY_WEIGHTS.get(constraints.get('branding_priority'), 0.25))
+        shunting_weight = constraints.get('shunting_weight', 0.1)
+        shortfall_penalty = constraints.get('service_shortfall_penalty', 1.0)
+        value_service = (shortfall_penalty + scores + branding_weight * brand_need / max(1, brand_need.max(initial=0))
+                         - shunting_weight * moves / max(1, moves.max(initial=0)))
+        return {
+            'value_service': value_service,
+            'value_ibl': 1.0 - scores,
+            'can_service': valid & (status != 'IBL'),
+            'can_ibl': ~valid | (status == 'IBL') | (cols['job_cards.open'] > 2),
+            'moves': moves,
+            'service_target': constraints.get('service_target', min(15, len(trainsets))),
+            'max_ibl': constraints.get('max_ibl', 5),
+            'max_moves': constraints.get('max_shunting_moves')
+        }
+    def solve(self, trainsets, scores, constraints):
+        """Returns (assignment: array of SERVICE/STANDBY/IBL per trainset, report dict)"""
+        return self.solve_model(self.build_model(trainsets, np.asarray(scores, dtype=float), constraints))
+    def solve_model(self, model):
+        """solve() for a model already built by build_model (or a slice of one)"""
+        start = time.time()
+        if self.backend == 'milp':
+            assignment, report = self._solve_milp(model)
+        else:
+            assignment, report = self._solve_branch_and_bound(model)
+        report.update({'backend': self.backend, 'solve_time': round(time.time() - start, 4),
+                       'service': int(np.count_nonzero(assignment == SERVICE)),
+                       'ibl': int(np.count_nonzero(assignment == IBL))})
+        return assignment, report
+    def _solve_milp(self, model):
+        n = len(model['value_service'])
+        c = -np.concatenate([model['value_service'], model['value_ibl']])
+        upper = np.concatenate([model['can_service'], model['can_ibl']]).astype(float)
+        # Rows: one assignment per train, service target, IBL limit, optional shunting budget
+        rows = [np.arange(n), np.arange(n), np.full(n, n), np.full(n, n + 1)]
+        cols = [np.arange(n), np.arange(n, 2 * n), np.arange(n), np.arange(n, 2 * n)]
+        data = [np.ones(n)] * 4
+        upper_rhs = [np.ones(n), [model['service_target'], model['max_ibl']]]
+        if model['max_moves'] is not None:
+            rows.append(np.full(n, n + 2))
+            cols.append(np.arange(n))
+            data.append(model['moves'])
+            upper_rhs.append([model['max_moves']])
+        ub = np.concatenate(upper_rhs).astype(float)
+        A = csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(len(ub), 2 * n))
+        result = milp(c, integrality=np.ones(2 * n), bounds=Bounds(0, upper),
+                      constraints=LinearConstraint(A, -np.inf, ub),
+                      options={'time_limit': self.time_budget, 'mip_rel_gap': self.mip_gap})
+        assignment = np.full(n, STANDBY)
+        if result.x is None:
+            return assignment, {'status': 'no_solution', 'objective': 0.0, 'bound': None, 'gap': None}
+        x = np.round(result.x).astype(bool)
+        assignment[x[:n]] = SERVICE
+        assignment[x[n:]] = IBL
+        objective = -result.fun
+        bound = -getattr(result, 'mip_dual_bound', result.fun)
+        return assignment, {'status': 'optimal' if result.status == 0 else 'time_limit', 'objective': objective,
+                            'bound': bound, 'gap': _relative_gap(objective, bound)}
+    def solve_anytime(self, trainsets, scores, constraints, initial, deadline, seed=None):
+        """
+        Improve a starting plan by large-neighbourhood search until the deadline: repeatedly free a
+        random subset of trains and re-solve it exactly with the rest fixed. The best plan so far is
+        always kept, so stopping at any time returns a feasible plan.
+        Returns (assignment, report) with a convergence trace of (elapsed seconds, objective).
+        """
+        model = self.build_model(trainsets, np.asarray(scores, dtype=float), constraints)
+        start = time.time()
+        assignment = _repair(model, np.asarray(initial).copy())
+        value = _plan_value(model, assignment)
+        trace = [(0.0, value)]
+        # Root bound: the search stops early once the plan is provably optimal
+        v_s = np.where(model['can_service'], model['value_service'], -np.inf)
+        v_i = np.where(model['can_ibl'], model['value_ibl'], -np.inf)
+        budget = np.inf if model['max_moves'] is None else float(model['max_moves'])
+        bound = _lagrange_multipliers(v_s, v_i, model['moves'], model['service_target'], model['max_ibl'],
+                                      budget, value)[3]
+        rng = np.random.default_rng(seed)
+        n = len(assignment)
+        size = min(n, constraints.get('neighbourhood_size', 30))
+        iterations = 0
+        while n and time.time() < deadline and value < bound - 1e-9:
+            free = rng.choice(n, size=size, replace=False)
+            candidate = self._reoptimize(model, assignment, free, deadline)
+            iterations += 1
+            candidate_value = _plan_value(model, candidate)
+            if candidate_value > value + 1e-12:
+                assignment, value = candidate, candidate_value
+                trace.append((round(time.time() - start, 4), value))
+        status = 'optimal' if value >= bound - 1e-9 else 'deadline'
+        return assignment, {'backend': 'anytime_lns', 'status': status, 'objective': value, 'bound': bound,
+                            'gap': _relative_gap(value, bound), 'iterations': iterations, 'trace': trace,
+                            'solve_time': round(time.time() - start, 4),
+                            'service': int(np.count_nonzero(assignment == SERVICE)),
+                            'ibl': int(np.count_nonzero(assignment == IBL))}
+    def _reoptimize(self, model, assignment, free, deadline):
+        """Exactly re-solve the freed trains with every other assignment held fixed"""
+        fixed = np.ones(len(assignment), dtype=bool)
+        fixed[free] = False
+        fixed_service = fixed & (assignment == SERVICE)
+        sub_model = {key: model[key][free] for key in ('value_service', 'value_ibl', 'can_service', 'can_ibl', 'moves')}
+        sub_model['service_target'] = model['service_target'] - int(np.count_nonzero(fixed_service))
+        sub_model['max_ibl'] = model['max_ibl'] - int(np.count_nonzero(fixed & (assignment == IBL)))
+        sub_model['max_moves'] = (None if model['max_moves'] is None
+                                  else model['max_moves'] - model['moves'][fixed_service].sum())
+        # Neighbourhoods are small, so the pure-Python search beats MILP start-up cost here
+        sub_assignment, _ = self._solve_branch_and_bound(sub_model, min(deadline, time.time() + 0.05))
+        candidate = assignment.copy()
+        candidate[free] = sub_assignment
+        return candidate
+    def _solve_branch_and_bound(self, model, deadline=None):
+        """Depth-first branch-and-bound with a Lagrangian bound; stops at the deadline (or time budget)"""
+        deadline = time.time() + self.time_budget if deadline is None else deadline
+        v_s = np.where(model['can_service'], model['value_service'], -np.inf)
+        v_i = np.where(model['can_ibl'], model['value_ibl'], -np.inf)
+        moves = model['moves']
+        target, max_ibl = model['service_target'], model['max_ibl']
+        budget = np.inf if model['max_moves'] is None else float(model['max_moves'])
+        incumbent, best_value = self._greedy_assignment(v_s, v_s, v_i, moves, target, max_ibl, budget)
+        mu_s, mu_i, lam, root_bound = _lagrange_multipliers(v_s, v_i, moves, target, max_ibl, budget, best_value)
+        lam_moves = lam * moves if np.isfinite(budget) else np.zeros_like(moves)
+        # Second starting plan that prices shunting moves at the budget's multiplier
+        priced, priced_value = self._greedy_assignment(v_s - lam_moves, v_s, v_i, moves, target, max_ibl, budget)
+        if priced_value > best_value:
+            incumbent, best_value = priced, priced_value
+        # Relaxed value per train under the root multipliers; branch on the most valuable first
+        red_s = v_s - mu_s - lam_moves
+        red_i = v_i - mu_i
+        relaxed = np.maximum(0.0, np.maximum(red_s, red_i))
+        order = np.argsort(-relaxed, kind='stable')
+        suffix = np.concatenate([np.cumsum(relaxed[order][::-1])[::-1], [0.0]]).tolist()
+        vs, vi, mv = v_s[order].tolist(), v_i[order].tolist(), moves[order].tolist()
+        rs, ri = red_s[order].tolist(), red_i[order].tolist()
+        n = len(order)
+        # Node: (depth, value, services left, ibl left, moves left, choices)
+        stack = [(0, 0.0, target, max_ibl, budget, ())]
+        nodes = 0
+        best_choices = None
+        timed_out = False
+        while stack:
+            if nodes % 1024 == 0 and time.time() > deadline:
+                timed_out = True
+                break
+            depth, value, s_left, i_left, m_left, choices = stack.pop()
+            nodes += 1
+            bound = (value + mu_s * s_left + mu_i * i_left
+                     + (lam * m_left if np.isfinite(budget) else 0.0) + suffix[depth])
+            if bound <= best_value + 1e-9:
+                continue
+            if depth == n:
+                if value > best_value:
+                    best_value, best_choices = value, choices
+                continue
+            children = [(0.0, STANDBY, value, s_left, i_left, m_left)]
+            if vs[depth] > -np.inf and s_left > 0 and mv[depth] <= m_left:
+                children.append((rs[depth], SERVICE, value + vs[depth], s_left - 1, i_left, m_left - mv[depth]))
+            if vi[depth] > -np.inf and i_left > 0:
+                children.append((ri[depth], IBL, value + vi[depth], s_left, i_left - 1, m_left))
+            # Push the most promising child last so it is explored first
+            children.sort(key=lambda child: child[0])
+            for _, choice, child_value, child_s, child_i, child_m in children:
+                stack.append((depth + 1, child_value, child_s, child_i, child_m, choices + (choice,)))
+        if best_choices is not None:
+            incumbent = np.full(n, STANDBY)
+            incumbent[order] = best_choices
+        if timed_out:
+            open_bounds = [node[1] + mu_s * node[2] + mu_i * node[3] + (lam * node[4] if np.isfinite(budget) else 0.0)
+                           + suffix[node[0]] for node in stack]
+            bound = min(root_bound, max([best_value] + open_bounds))
+        else:
+            bound = best_value
+        return incumbent, {'status': 'time_limit' if timed_out else 'optimal', 'objective': best_value,
+                           'bound': bound, 'gap': _relative_gap(best_value, bound), 'nodes': nodes}
+    def _greedy_assignment(self, service_key, v_s, v_i, moves, target, max_ibl, budget):
+        """Feasible starting plan: trains to Service in service_key order, then best IBL candidates"""
+        n = len(v_s)
+        assignment = np.full(n, STANDBY)
+        value, moves_used, services = 0.0, 0.0, 0
+        for i in np.argsort(-service_key, kind='stable'):
+            if services >= target or service_key[i] <= 0 or v_s[i] == -np.inf:
+                break
+            if moves_used + moves[i] <= budget and v_s[i] >= v_i[i]:
+                assignment[i] = SERVICE
+                value += v_s[i]
+                moves_used += moves[i]
+                services += 1
+        ibl = 0
+        for i in np.argsort(-v_i, kind='stable'):
+            if ibl >= max_ibl or v_i[i] <= 0 or v_i[i] == -np.inf:
+                break
+            if assignment[i] == STANDBY:
+                assignment[i] = IBL
+                value += v_i[i]
+                ibl += 1
+        return assignment, float(value)
+
+def _lagrange_multipliers(v_s, v_i, moves, target, max_ibl, budget, lower_bound, iterations=200):
+    """Subgradient search for multipliers (service target, IBL limit, shunting budget) minimizing the
+    Lagrangian upper bound. Returns (mu_s, mu_i, lam, best bound)."""
+    has_budget = np.isfinite(budget)
+    mu_s = mu_i = lam = 0.0
+    best = (mu_s, mu_i, lam, np.inf)
+    # Polyak step, halved whenever the bound stops improving
+    alpha, stalled = 2.0, 0
+    for _ in range(iterations):
+        red_s = v_s - mu_s - (lam * moves if has_budget else 0.0)
+        red_i = v_i - mu_i
+        take_s = (red_s > 0) & (red_s >= red_i)
+        take_i = (red_i > 0) & ~take_s
+        bound = (mu_s * target + mu_i * max_ibl + (lam * budget if has_budget else 0.0)
+                 + np.maximum(0.0, np.maximum(red_s, red_i)).sum())
+        if bound < best[3] - 1e-12:
+            best = (mu_s, mu_i, lam, bound)
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled >= 5:
+                alpha, stalled = alpha / 2, 0
+        # Subgradient of the bound with respect to each multiplier
+        g_s = target - np.count_nonzero(take_s)
+        g_i = max_ibl - np.count_nonzero(take_i)
+        g_l = (budget - moves[take_s].sum()) if has_budget else 0.0
+        norm = g_s * g_s + g_i * g_i + g_l * g_l
+        if norm == 0 or bound - lower_bound <= 1e-9:
+            break
+        step = alpha * (bound - lower_bound) / norm
+        mu_s = max(0.0, mu_s - step * g_s)
+        mu_i = max(0.0, mu_i - step * g_i)
+        lam = max(0.0, lam - step * g_l)
+    return best
+
+def _plan_value(model, assignment):
+    """Objective value of a feasible assignment"""
+    return float(model['value_service'][assignment == SERVICE].sum() + model['value_ibl'][assignment == IBL].sum())
+
+def _repair(model, assignment):
+    """Make a plan feasible: drop ineligible assignments, then the least valuable ones over each limit"""
+    assignment[(assignment == SERVICE) & ~model['can_service']] = STANDBY
+    assignment[(assignment == IBL) & ~model['can_ibl']] = STANDBY
+    for label, values, limit in ((SERVICE, model['value_service'], model['service_target']),
+                                 (IBL, model['value_ibl'], model['max_ibl'])):
+        chosen = np.flatnonzero(assignment == label)
+        if len(chosen) > limit:
+            drop = chosen[np.argsort(values[chosen], kind='stable')[:len(chosen) - max(0, limit)]]
+            assignment[drop] = STANDBY
+    if model['max_moves'] is not None:
+        service = np.flatnonzero(assignment == SERVICE)
+        # Give up the services with the least value per shunting move first
+        per_move = model['value_service'][service] / np.maximum(model['moves'][service], 1e-9)
+        used = model['moves'][service].sum()
+        for i in service[np.argsort(per_move, kind='stable')]:
+            if used <= model['max_moves']:
+                break
+            if model['moves'][i] > 0:
+                assignment[i] = STANDBY
+                used -= model['moves'][i]
+    return assignment
+
+def _relative_gap(objective, bound):
+    if bound is None:
+        return None
+    return abs(bound - objective) / max(1e-9, abs(bound))
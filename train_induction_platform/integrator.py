@@ -1,4 +1,3 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
@@ -9,102 +8,278 @@ import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
 import warnings
-from utils import calculate_ai_score
+from collections import deque
+from utils import calculate_ai_scores, AI_SCORE_FIELDS
+from fleet_store import assign_field
+from tracing import traced
+
+class ChangeEvent:
+    """One field change reported by a data source"""
+    __slots__ = ('trainset_id', 'path', 'old', 'new', 'source', 'timestamp')
+    def __init__(self, trainset_id, path, old, new, source, timestamp):
+        self.trainset_id = trainset_id
+        self.path = path
+        self.old = old
+        self.new = new
+        self.source = source
+        self.timestamp = timestamp
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__})
+    def __eq__(self, other):
+        return isinstance(other, ChangeEvent) and self.to_dict() == other.to_dict()
+    def __repr__(self):
+        return f"ChangeEvent({self.trainset_id} {self.path}: {self.old!r} -> {self.new!r} from {self.source})"
+
+def coalesce(events):
+    """One event per (trainset, field): first old value, last new value; changes that cancel out are dropped"""
+    merged = {}
+    for event in events:
+        key = (event.trainset_id, event.path)
+        if key in merged:
+            first = merged[key]
+            merged[key] = ChangeEvent(event.trainset_id, event.path, first.old, event.new, event.source, event.timestamp)
+        else:
+            merged[key] = event
+    return [event for event in merged.values() if event.old != event.new]
+
+def apply_change_events(trainsets, events):
+    """Bulk-apply events: one column write per field for fleet-store views, dict writes otherwise.
+    Returns (applied events, {trainset id: trainset}); events for unknown trainsets are skipped."""
+    by_id = {trainset['id']: trainset for trainset in trainsets}
+    applied = [event for event in events if event.trainset_id in by_id]
+    by_path = {}
+    for event in applied:
+        targets, values = by_path.setdefault(event.path, ([], []))
+        targets.append(by_id[event.trainset_id])
+        values.append(event.new)
+    for path, (targets, values) in by_path.items():
+        assign_field(targets, path, values)
+    return applied, by_id
+
+def _matches(path, fields):
+    """Whether a field path is one of fields or lies under one of them (e.g. 'mileage.component_wear')"""
+    return path in fields or any(path.startswith(field + '.') for field in fields)
+
+class EventBus:
+    """Delivers batches of applied change events to subscribers by field, keeping recent events for replay"""
+    def __init__(self, history=10000):
+        self.subscribers = []
+        self.history = deque(maxlen=history)
+    def subscribe(self, callback, fields=None):
+        """callback(events) receives each applied batch, narrowed to the given fields (all when None)"""
+        subscription = (callback, None if fields is None else set(fields))
+        self.subscribers.append(subscription)
+        return subscription
+    def unsubscribe(self, subscription):
+        self.subscribers.remove(subscription)
+    def publish(self, events):
+        self.history.extend(events)
+        for callback, fields in list(self.subscribers):
+            batch = events if fields is None else [event for event in events if _matches(event.path, fields)]
+            if batch:
+                callback(batch)
+    def events_since(self, timestamp=None, fields=None):
+        """Recorded events from timestamp on, optionally only for some fields"""
+        return [event for event in self.history
+                if (timestamp is None or event.timestamp >= timestamp) and (fields is None or _matches(event.path, fields))]
+
+class ChangeLog:
+    """Trainsets (by id) and the fields changed on them since the owner last cleared the log"""
+    def __init__(self):
+        self.fields = {}
+        self.trainsets = {}
+    def record(self, trainset, fields):
+        self.fields.setdefault(trainset['id'], set()).update(fields)
+        self.trainsets[trainset['id']] = trainset
+    def touched(self, watched_fields=None):
+        """Changed trainsets, optionally only those where a watched field changed"""
+        return [self.trainsets[tid] for tid, fields in self.fields.items()
+                if watched_fields is None or not fields.isdisjoint(watched_fields)]
+    def clear(self):
+        self.fields = {}
+        self.trainsets = {}
+    def discard(self, trainset_ids):
+        """Forget the changes to some trainsets, e.g. those a consumer has just processed"""
+        for trainset_id in trainset_ids:
+            self.fields.pop(trainset_id, None)
+            self.trainsets.pop(trainset_id, None)
+    def __len__(self):
+        return len(self.fields)
 
 class RealTimeDataIntegrator:
+    """
+    Simulated Maximo, IoT and fitness feeds. Each poll_* method reports changes as ChangeEvents
+    without touching the trainsets; apply_events writes them in bulk, updates the change logs and
+    notifies EventBus subscribers. The connect_to_* methods poll and apply one source.
+    """
     def __init__(self):
         self.data_sources = {
             'maximo': {'connected': False, 'last_update': None},
             'iot_sensors': {'connected': False, 'last_update': None},
             'fitness_certs': {'connected': False, 'last_update': None}
         }
-    def connect_to_maximo(self, trainsets):
-        """Simulate connecting to IBM Maximo and updating job card status"""
+        # Changes not yet rescored, plus one log per downstream consumer
+        self.dirty = ChangeLog()
+        self.change_logs = []
+        self.events = EventBus()
+        # Optional TelemetryBuffer; when attached, component wear follows its rolling means
+        self.telemetry = None
+    def attach_telemetry(self, buffer):
+        self.telemetry = buffer
+    def mark_dirty(self, trainset, *fields):
+        """Record that the given fields of a trainset changed"""
+        self.dirty.record(trainset, fields)
+        for log in self.change_logs:
+            log.record(trainset, fields)
+    def track_changes(self):
+        """New change log that accumulates every update until its consumer clears it"""
+        log = ChangeLog()
+        self.change_logs.append(log)
+        return log
+    def subscribe(self, callback, fields=None):
+        """Receive applied change events for the given fields (see EventBus.subscribe)"""
+        return self.events.subscribe(callback, fields)
+    @traced()
+    def apply_events(self, trainsets, events, coalesced=True):
+        """Bulk-apply change events, record them in the change logs and notify subscribers"""
+        if coalesced:
+            events = coalesce(events)
+        applied, by_id = apply_change_events(trainsets, events)
+        for event in applied:
+            self.mark_dirty(by_id[event.trainset_id], event.path)
+        self.events.publish(applied)
+        return applied
+    def replay(self, trainsets, events):
+        """Re-apply recorded events (e.g. from events.events_since) to a fleet, in order, without coalescing"""
+        return self.apply_events(trainsets, list(events), coalesced=False)
+    def _mark_connected(self, source):
+        timestamp = datetime.now()
+        self.data_sources[source]['last_update'] = timestamp
+        self.data_sources[source]['connected'] = True
+        return timestamp
+    @traced()
+    def poll_maximo(self, trainsets):
+        """Simulate IBM Maximo job card updates. Returns (events, updated_count)."""
+        timestamp = self._mark_connected('maximo')
+        events = []
         updated_count = 0
         for trainset in trainsets:
             if random.random() < 0.3:  # 30% chance of update from Maximo
                 # Simulate job card updates
                 change = random.randint(-1, 2)
-                new_count = max(0, trainset['job_cards']['open'] + change)
-                if new_count != trainset['job_cards']['open']:
-                    trainset['job_cards']['open'] = new_count
+                open_jobs = trainset['job_cards']['open']
+                new_count = max(0, open_jobs + change)
+                if new_count != open_jobs:
+                    events.append(ChangeEvent(trainset['id'], 'job_cards.open', open_jobs, new_count, 'maximo', timestamp))
                     updated_count += 1
                 # Simulate priority changes
                 if random.random() < 0.2:
-                    trainset['job_cards']['priority'] = random.choice(['Low', 'Medium', 'High', 'Critical'])
+                    events.append(ChangeEvent(trainset['id'], 'job_cards.priority', trainset['job_cards']['priority'],
+                                              random.choice(['Low', 'Medium', 'High', 'Critical']), 'maximo', timestamp))
                     updated_count += 1
-        self.data_sources['maximo']['last_update'] = datetime.now()
-        self.data_sources['maximo']['connected'] = True
-        return trainsets, updated_count
-    def connect_to_iot_sensors(self, trainsets):
-        """Simulate IoT sensor data updates"""
+        return events, updated_count
+    @traced()
+    def poll_iot_sensors(self, trainsets):
+        """Simulate IoT sensor updates. Returns (events, updated_count)."""
+        timestamp = self._mark_connected('iot_sensors')
+        events = []
         updated_count = 0
+        if self.telemetry is not None:
+            events.extend(self.telemetry.wear_events(trainsets, timestamp=timestamp))
         for trainset in trainsets:
             if random.random() < 0.4:  # 40% chance of sensor update
                 # Update component wear based on recent operation
                 wear_increase = random.uniform(0.1, 2.0)
-                for component in trainset['mileage']['component_wear']:
-                    trainset['mileage']['component_wear'][component] = min(
-                        100, trainset['mileage']['component_wear'][component] + wear_increase
-                    )
+                wear = trainset['mileage']['component_wear']
+                if self.telemetry is None:
+                    for component in wear:
+                        events.append(ChangeEvent(trainset['id'], f'mileage.component_wear.{component}', wear[component],
+                                                  min(100, wear[component] + wear_increase), 'iot_sensors', timestamp))
                 # Update mileage
                 daily_km = random.randint(50, 300)
-                trainset['mileage']['total_km'] += daily_km
-                trainset['mileage']['since_maintenance'] += daily_km
+                for field in ('total_km', 'since_maintenance'):
+                    events.append(ChangeEvent(trainset['id'], f'mileage.{field}', trainset['mileage'][field],
+                                              trainset['mileage'][field] + daily_km, 'iot_sensors', timestamp))
                 updated_count += 1
-        self.data_sources['iot_sensors']['last_update'] = datetime.now()
-        self.data_sources['iot_sensors']['connected'] = True
-        return trainsets, updated_count
-    def connect_to_fitness_db(self, trainsets):
-        """Simulate fitness certificate database updates"""
+        return events, updated_count
+    @traced()
+    def poll_fitness_db(self, trainsets):
+        """Simulate fitness certificate database updates. Returns (events, updated_count)."""
+        timestamp = self._mark_connected('fitness_certs')
+        events = []
         updated_count = 0
+        departments = ['rolling_stock', 'signalling', 'telecom']
         for trainset in trainsets:
             if random.random() < 0.25:  # 25% chance of fitness update
+                fitness = trainset['fitness']
+                valid = {dept: fitness[dept] for dept in departments}
                 # Simulate certificate expiry/extension
                 if random.random() < 0.1:  # 10% chance of expiry
-                    department = random.choice(['rolling_stock', 'signalling', 'telecom'])
-                    trainset['fitness'][department] = False
+                    department = random.choice(departments)
+                    events.append(ChangeEvent(trainset['id'], f'fitness.{department}', valid[department], False,
+                                              'fitness_certs', timestamp))
+                    valid[department] = False
                     updated_count += 1
                 # Simplicate certificate renewal
-                if random.random() < 0.15 and not all([trainset['fitness']['rolling_stock'], 
-                                                     trainset['fitness']['signalling'], 
-                                                     trainset['fitness']['telecom']]):
+                if random.random() < 0.15 and not all(valid.values()):
                     # Renew expired certificates
-                    for dept in ['rolling_stock', 'signalling', 'telecom']:
-                        if not trainset['fitness'][dept]:
-                            trainset['fitness'][dept] = True
+                    for dept in departments:
+                        if not valid[dept]:
+                            events.append(ChangeEvent(trainset['id'], f'fitness.{dept}', valid[dept], True,
+                                                      'fitness_certs', timestamp))
                             updated_count += 1
                 # Update expiry dates
                 if random.random() < 0.2:
                     days_change = random.randint(-2, 7)
-                    new_expiry = trainset['fitness']['expires_at'] + timedelta(days=days_change)
-                    trainset['fitness']['expires_at'] = new_expiry
-                    trainset['fitness']['days_until_expiry'] = max(0, (new_expiry - datetime.now()).days)
+                    new_expiry = fitness['expires_at'] + timedelta(days=days_change)
+                    events.append(ChangeEvent(trainset['id'], 'fitness.expires_at', fitness['expires_at'], new_expiry,
+                                              'fitness_certs', timestamp))
+                    events.append(ChangeEvent(trainset['id'], 'fitness.days_until_expiry', fitness['days_until_expiry'],
+                                              max(0, (new_expiry - datetime.now()).days), 'fitness_certs', timestamp))
                     updated_count += 1
-        self.data_sources['fitness_certs']['last_update'] = datetime.now()
-        self.data_sources['fitness_certs']['connected'] = True
+        return events, updated_count
+    def connect_to_maximo(self, trainsets):
+        """Poll Maximo and apply its job card updates"""
+        events, updated_count = self.poll_maximo(trainsets)
+        self.apply_events(trainsets, events)
         return trainsets, updated_count
-    def refresh_all_data(self, trainsets):
-        """Refresh data from all sources"""
+    def connect_to_iot_sensors(self, trainsets):
+        """Poll IoT sensors and apply the wear and mileage updates"""
+        events, updated_count = self.poll_iot_sensors(trainsets)
+        self.apply_events(trainsets, events)
+        return trainsets, updated_count
+    def connect_to_fitness_db(self, trainsets):
+        """Poll the fitness certificate database and apply its updates"""
+        events, updated_count = self.poll_fitness_db(trainsets)
+        self.apply_events(trainsets, events)
+        return trainsets, updated_count
+    def refresh_all_data(self, trainsets, full_rescore=False):
+        """Poll all sources, apply their events in one bulk step, then rescore only trainsets whose
+        scoring inputs changed"""
+        events = []
         total_updates = 0
-        trainsets, updates = self.connect_to_maximo(trainsets)
-        total_updates += updates
-        trainsets, updates = self.connect_to_iot_sensors(trainsets)
-        total_updates += updates
-        trainsets, updates = self.connect_to_fitness_db(trainsets)
-        total_updates += updates
-        # Recalculate scores after updates
-        for trainset in trainsets:
-            score, reasons = calculate_ai_score(trainset)
-            trainset['ai_score'] = score
-            trainset['score_reasons'] = reasons
+        for poll in (self.poll_maximo, self.poll_iot_sensors, self.poll_fitness_db):
+            source_events, updates = poll(trainsets)
+            events.extend(source_events)
+            total_updates += updates
+        self.apply_events(trainsets, events)
+        self.rescore(trainsets, full_rescore)
         return trainsets, total_updates
+    @traced()
+    def rescore(self, trainsets, full_rescore=False):
+        """Recalculate AI scores of changed trainsets; reason strings are decoded only when read"""
+        rescore = trainsets if full_rescore else self.dirty.touched(AI_SCORE_FIELDS)
+        if rescore:
+            scores, reason_bits = calculate_ai_scores(rescore)
+            assign_field(rescore, 'ai_score', scores)
+            assign_field(rescore, 'score_reason_bits', reason_bits)
+        self.dirty.clear()
 # Alert & Notification System
\ No newline at end of file
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+class LRUMemo:
+    """
+    Bounded least-recently-used memo of computed results, keyed by tuples that include a fleet
+    version (see fleet_store.fleet_version). Keys containing None, such as the version of a plain
+    dict fleet, are never cached. on_evict, if given, is called with each value dropped by eviction
+    or clear(), e.g. to delete a cached file.
+    """
+    def __init__(self, maxsize=128, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    def get(self, key, compute):
+        """Cached result for key, computing and storing it on a miss"""
+        if None in key:
+            self.misses += 1
+            return compute()
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            _, evicted = self.entries.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+        return value
+    def clear(self):
+        values = list(self.entries.values())
+        self.entries.clear()
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
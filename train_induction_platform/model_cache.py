@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import tempfile
+import joblib
+import sklearn
+
+# Bump when the feature engineering or the cached payload changes; older entries are then ignored
+MODEL_CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get('KMRL_MODEL_CACHE',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'train_induction_platform', 'models'))
+
+class ModelCache:
+    """
+    Content-addressed on-disk cache of trained models.
+    Entries are joblib files named by a hash of the training data, the hyperparameters and the
+    version stamp (cache version + scikit-learn version). Least recently used entries are evicted
+    once the directory grows past max_bytes.
+    """
+    def __init__(self, directory=None, max_bytes=200 * 1024 * 1024):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.version = f"{MODEL_CACHE_VERSION}-sklearn-{sklearn.__version__}"
+        self.hits = 0
+        self.misses = 0
+    def key(self, features, labels, hyperparameters):
+        """Hash of training data, hyperparameters and version stamp"""
+        digest = hashlib.sha256(self.version.encode())
+        for array in (features, labels):
+            digest.update(str((array.shape, array.dtype.str)).encode())
+            digest.update(array.tobytes())
+        digest.update(json.dumps(hyperparameters, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.joblib")
+    def load(self, key):
+        """Cached payload for key, or None (unreadable or stale entries are removed)"""
+        path = self.path(key)
+        try:
+            payload = joblib.load(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            payload = None
+        if not isinstance(payload, dict) or payload.get('version') != self.version:
+            self._remove(path)
+            self.misses += 1
+            return None
+        # Loading counts as use for LRU eviction
+        os.utime(path)
+        self.hits += 1
+        return payload['data']
+    def store(self, key, data):
+        """Write an entry atomically, then evict down to max_bytes"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                joblib.dump({'version': self.version, 'key': key, 'data': data}, f)
+            os.replace(tmp_path, self.path(key))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self.evict(keep=key)
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.joblib'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name, path))
+        total = sum(entry[1] for entry in entries)
+        for _, size, name, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and name == f"{keep}.joblib":
+                continue
+            self._remove(path)
+            total -= size
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.joblib'):
+                    self._remove(os.path.join(self.directory, name))
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
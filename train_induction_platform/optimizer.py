@@ -1,4 +1,3 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
@@ -9,14 +8,28 @@ import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
 import warnings
+from fleet_store import attached_fleet, fleet_columns, register_derived_field, TrainsetView
+from induction_solver import InductionSolver, ASSIGNMENT_LABELS, SERVICE, IBL
+from sharding import DepotShardedSolver
+from pareto import pareto_front, non_dominated_sort, crowding_distance
+from tracing import traced
+
+# Objective order used for the objective matrix columns and weight vectors
+OBJECTIVES = ['punctuality', 'cost_efficiency', 'branding_compliance', 'maintenance_risk',
+              'energy_efficiency', 'operational_flexibility']
+# Trade-offs shown to planners by default when exploring the Pareto front
+PARETO_OBJECTIVES = ['punctuality', 'branding_compliance', 'maintenance_risk']
+# Fields read by calculate_objective_scores
+OBJECTIVE_FIELDS = {'fitness.overall_valid', 'operational.reliability_score', 'job_cards.open',
+                    'cleaning.deep_clean_due', 'branding.hours_required_today', 'branding.exposure_deficit',
+                    'mileage.component_wear.brake_pads', 'mileage.component_wear.bogies',
+                    'mileage.component_wear.hvac', 'mileage.since_maintenance',
+                    'stabling.shunting_moves_required', 'operational.status'}
 
 class MultiObjectiveOptimizer:
     def __init__(self):
@@ -28,6 +41,140 @@ class MultiObjectiveOptimizer:
             'energy_efficiency': 0.10,
             'operational_flexibility': 0.10
         } 
+        self.changes = None
+        self.last_solver_report = None
+    def watch(self, change_log):
+        """Also recompute the objective rows of trainsets the change log reports"""
+        self.changes = change_log
+    def weight_vector(self, weights=None):
+        """Weights as a vector in OBJECTIVES order"""
+        weights = self.weights if weights is None else weights
+        return np.array([weights[obj] for obj in OBJECTIVES], dtype=float)
+    def objective_matrix(self, trainsets):
+        """N x 6 matrix of objective scores (columns in OBJECTIVES order), one vectorized pass"""
+        cols = fleet_columns(trainsets, ['fitness.overall_valid', 'operational.reliability_score', 'job_cards.open',
+                                         'cleaning.deep_clean_due', 'branding.hours_required_today',
+                                         'branding.exposure_deficit', 'mileage.component_wear.brake_pads',
+                                         'mileage.component_wear.bogies', 'mileage.component_wear.hvac',
+                                         'mileage.since_maintenance', 'stabling.shunting_moves_required',
+                                         'operational.status'])
+        matrix = np.empty((len(trainsets), len(OBJECTIVES)))
+        # Punctuality (fitness and reliability)
+        matrix[:, 0] = np.where(cols['fitness.overall_valid'], 1.0, 0.3) * (cols['operational.reliability_score'] / 100)
+        # Cost efficiency (lower maintenance needs = better)
+        matrix[:, 1] = 1.0 - np.minimum(1.0, cols['job_cards.open'] * 0.2 + np.where(cols['cleaning.deep_clean_due'], 0.5, 0))
+        # Branding compliance
+        matrix[:, 2] = np.minimum(1.0, 0.5 + np.where(cols['branding.hours_required_today'] > 0, 0.3, 0.0)
+                                  + np.where(cols['branding.exposure_deficit'] > 10, 0.2, 0.0))
+        # Maintenance risk (component wear and mileage)
+        wear_avg = (cols['mileage.component_wear.brake_pads'] + cols['mileage.component_wear.bogies'] +
+                    cols['mileage.component_wear.hvac']) / 3 / 100
+        mileage_risk = np.minimum(1.0, cols['mileage.since_maintenance'] / 10000)
+        matrix[:, 3] = 1.0 - np.maximum(wear_avg, mileage_risk)
+        # Energy efficiency (less shunting = better)
+        matrix[:, 4] = 1.0 - cols['stabling.shunting_moves_required'] * 0.2
+        # Operational flexibility (status and availability)
+        status = cols['operational.status']
+        matrix[:, 5] = np.where(status == 'Available', 0.8, np.where(status == 'Standby', 0.5, 0.2))
+        return matrix
+    @traced()
+    def calculate_overall_scores(self, trainsets):
+        """Weighted overall scores for a fleet as one matrix-vector product.
+        Returns (scores: N array, objective matrix: N x 6). For fleets held in a FleetStore the
+        objective rows are kept in the store and only stale rows are recomputed."""
+        store, rows = attached_fleet(trainsets)
+        if store is None:
+            if self.changes is not None:
+                self.changes.discard(t['id'] for t in trainsets)
+            matrix = self.objective_matrix(trainsets)
+            return matrix @ self.weight_vector(), matrix
+        # The store marks rows stale on every write to an objective field, through any path
+        block = store.block('objective_scores', len(OBJECTIVES), sources=OBJECTIVE_FIELDS)
+        stale = store.block_stale('objective_scores')[rows]
+        if self.changes is not None:
+            # Consume only changes to trainsets in this call; the rest stay pending for later calls
+            in_call = set(rows.tolist())
+            consumed = [tid for tid, t in self.changes.trainsets.items()
+                        if isinstance(t, TrainsetView) and t.store is store and t.row in in_call]
+            changed = [self.changes.trainsets[tid].row for tid in consumed
+                       if not self.changes.fields[tid].isdisjoint(OBJECTIVE_FIELDS)]
+            stale |= np.isin(rows, changed)
+            self.changes.discard(consumed)
+        stale_rows = rows[stale]
+        if len(stale_rows):
+            store.refresh_block('objective_scores', stale_rows, self.objective_matrix(store.views(stale_rows)))
+        matrix = block[rows]
+        return matrix @ self.weight_vector(), matrix
+    def sweep_weights(self, trainsets, weight_matrix):
+        """Score and rank a fleet under K candidate weightings at once.
+        weight_matrix is K x 6 (OBJECTIVES order) or a list of weight dicts.
+        Returns (scores: N x K, rankings: K x N indices into trainsets, best first)."""
+        if len(weight_matrix) and isinstance(weight_matrix[0], dict):
+            weight_matrix = [self.weight_vector(w) for w in weight_matrix]
+        weight_matrix = np.atleast_2d(np.asarray(weight_matrix, dtype=float))
+        _, matrix = self.calculate_overall_scores(trainsets)
+        scores = matrix @ weight_matrix.T
+        rankings = np.argsort(-scores, axis=0, kind='stable').T
+        return scores, rankings
+    def pareto_trainsets(self, trainsets, objectives=None):
+        """Non-dominated sort of the per-train objective matrix.
+        Returns (front number per trainset, 0 = Pareto-optimal; crowding distance within its front)."""
+        columns = [OBJECTIVES.index(obj) for obj in (objectives or PARETO_OBJECTIVES)]
+        _, matrix = self.calculate_overall_scores(trainsets)
+        points = matrix[:, columns]
+        ranks = non_dominated_sort(points)
+        crowding = np.zeros(len(points))
+        for front in np.unique(ranks):
+            members = ranks == front
+            crowding[members] = crowding_distance(points[members])
+        return ranks, crowding
+    def pareto_plans(self, trainsets, constraints, n_weightings=200, objectives=None, seed=None):
+        """Pareto front of feasible induction plans.
+        Candidate plans come from a weight sweep: each weighting fills the service target with the
+        best eligible trainsets and IBL with the lowest-scoring trainsets needing maintenance. A plan is
+        scored by the mean of each objective over its service trainsets. Returns plan dicts on the front,
+        most isolated (largest crowding distance) first."""
+        objectives = list(objectives or PARETO_OBJECTIVES)
+        rng = np.random.default_rng(seed)
+        weight_matrix = np.vstack([self.weight_vector(), np.eye(len(OBJECTIVES)),
+                                   rng.dirichlet(np.ones(len(OBJECTIVES)), n_weightings)])
+        scores, rankings = self.sweep_weights(trainsets, weight_matrix)
+        _, matrix = self.calculate_overall_scores(trainsets)
+        model = InductionSolver().build_model(trainsets, scores[:, 0], constraints)
+        # Service: first service_target eligible trainsets in each ranking
+        eligible = model['can_service'][rankings]
+        picked = eligible & (np.cumsum(eligible, axis=1) <= model['service_target'])
+        service = np.zeros_like(picked)
+        np.put_along_axis(service, rankings, picked, axis=1)
+        # IBL: lowest-scoring maintenance candidates not already in service
+        ascending = rankings[:, ::-1]
+        needy = np.take_along_axis(model['can_ibl'][None, :] & ~service, ascending, axis=1)
+        picked = needy & (np.cumsum(needy, axis=1) <= model['max_ibl'])
+        ibl = np.zeros_like(picked)
+        np.put_along_axis(ibl, ascending, picked, axis=1)
+        # Drop duplicate plans and plans over the shunting budget
+        _, unique = np.unique(np.packbits(np.hstack([service, ibl]), axis=1), axis=0, return_index=True)
+        unique = np.sort(unique)
+        if model['max_moves'] is not None:
+            unique = unique[service[unique] @ model['moves'] <= model['max_moves']]
+        service, ibl, weight_matrix = service[unique], ibl[unique], weight_matrix[unique]
+        counts = service.sum(axis=1)
+        columns = [OBJECTIVES.index(obj) for obj in objectives]
+        points = (service @ matrix[:, columns]) / np.maximum(counts, 1)[:, None]
+        front = pareto_front(points)
+        crowding = crowding_distance(points[front])
+        ids = np.array([t['id'] for t in trainsets], dtype=object)
+        plans = []
+        for k, distance in sorted(zip(front.tolist(), crowding.tolist()), key=lambda item: -item[1]):
+            plans.append({
+                'weights': dict(zip(OBJECTIVES, weight_matrix[k].round(4).tolist())),
+                'objectives': dict(zip(objectives, points[k].round(4).tolist())),
+                'service': ids[service[k]].tolist(),
+                'ibl': ids[ibl[k]].tolist(),
+                'service_count': int(counts[k]),
+                'crowding_distance': distance
+            })
+        return plans
     def calculate_objective_scores(self, trainset):
         """Calculate individual objective scores for a trainset"""
         scores = {}
@@ -75,15 +222,31 @@ class MultiObjectiveOptimizer:
     def optimize_fleet_assignment(self, trainsets, constraints):
         """ Optimize fleet assignment using a weighted multi-objective approach """
         optimized_trainsets = trainsets.copy()
-        # Calculate scores for all trainsets
-        for trainset in optimized_trainsets:
-            overall_score, objective_scores = self.calculate_overall_score(trainset)
-            trainset['optimization_score'] = overall_score
-            trainset['objective_scores'] = objective_scores
+        # Calculate scores for all trainsets in one pass
+        scores, matrix = self.calculate_overall_scores(optimized_trainsets)
+        store, rows = attached_fleet(optimized_trainsets)
+        if store is not None:
+            # objective_scores dicts are built from the store block only when read
+            store.set_column('optimization_score', scores, rows)
+        else:
+            for trainset, score, objective_row in zip(optimized_trainsets, scores.tolist(), matrix.tolist()):
+                trainset['optimization_score'] = score
+                trainset['objective_scores'] = dict(zip(OBJECTIVES, objective_row))
         # Sort by optimization score
-        optimized_trainsets.sort(key=lambda x: x['optimization_score'], reverse=True)
+        order = np.argsort(-scores, kind='stable')
+        optimized_trainsets = [optimized_trainsets[i] for i in order]
+        if constraints.get('sharding') == 'depot':
+            return self._sharded_fleet_assignment(optimized_trainsets, scores[order], constraints)
+        if constraints.get('solver') == 'exact':
+            return self._exact_fleet_assignment(optimized_trainsets, scores[order], constraints)
+        result = self._greedy_fleet_assignment(optimized_trainsets, constraints)
+        if constraints.get('solver') == 'anytime':
+            return self._anytime_fleet_assignment(optimized_trainsets, scores[order], constraints)
+        return result
+    @traced()
+    def _greedy_fleet_assignment(self, optimized_trainsets, constraints):
+        """Assign Service to the top-scoring eligible trainsets, then IBL to the neediest"""
         # Apply constraints
-        service_count = sum(1 for t in optimized_trainsets if t['recommendation'] == 'Service')
         target_service = constraints.get('service_target', min(15, len(optimized_trainsets)))
         max_ibl = constraints.get('max_ibl', 5)
         # Reset all recommendations first
@@ -117,4 +280,50 @@ class MultiObjectiveOptimizer:
         standby = sum(1 for t in optimized_trainsets if t['recommendation'] == 'Standby')
         ibl = sum(1 for t in optimized_trainsets if t['recommendation'] == 'IBL')
         return optimized_trainsets, conflicts, service_ready, standby, ibl
+    @traced()
+    def _exact_fleet_assignment(self, trainsets, scores, constraints):
+        """Assign Service/Standby/IBL with the integer-programming solver instead of greedily"""
+        time_budget = constraints.get('time_budget', 10.0)
+        if constraints.get('deadline'):
+            time_budget = max(0.0, min(time_budget, constraints['deadline'] - time.time()))
+        solver = InductionSolver(time_budget=time_budget, backend=constraints.get('solver_backend'))
+        assignment, self.last_solver_report = solver.solve(trainsets, scores, constraints)
+        return self._apply_assignment(trainsets, assignment)
+    @traced()
+    def _sharded_fleet_assignment(self, trainsets, scores, constraints):
+        """Solve each depot separately (in parallel for large fleets), then rebalance shared targets"""
+        time_budget = constraints.get('time_budget', 10.0)
+        if constraints.get('deadline'):
+            time_budget = max(0.0, min(time_budget, constraints['deadline'] - time.time()))
+        solver = DepotShardedSolver(time_budget=time_budget, backend=constraints.get('solver_backend'))
+        assignment, self.last_solver_report = solver.solve(trainsets, scores, constraints)
+        return self._apply_assignment(trainsets, assignment)
+    @traced()
+    def _anytime_fleet_assignment(self, trainsets, scores, constraints):
+        """Improve the greedy plan by local search until the deadline, keeping the best plan so far"""
+        deadline = constraints.get('deadline') or time.time() + constraints.get('time_budget', 10.0)
+        initial = np.array([ASSIGNMENT_LABELS.index(t['recommendation']) for t in trainsets])
+        solver = InductionSolver()
+        assignment, self.last_solver_report = solver.solve_anytime(trainsets, scores, constraints, initial, deadline,
+                                                                   seed=constraints.get('seed'))
+        return self._apply_assignment(trainsets, assignment)
+    def _apply_assignment(self, trainsets, assignment):
+        """Write a solver's Service/Standby/IBL plan back to the trainsets"""
+        labels = [ASSIGNMENT_LABELS[a] for a in assignment.tolist()]
+        for trainset, label in zip(trainsets, labels):
+            trainset['recommendation'] = label
+            if label == 'Service':
+                trainset['optimization_note'] = 'Optimized for service'
+            elif label == 'IBL':
+                trainset['optimization_note'] = 'Required maintenance'
+        # Eligibility is enforced by the model, so no service conflicts can arise
+        service_ready = int(np.count_nonzero(assignment == SERVICE))
+        ibl = int(np.count_nonzero(assignment == IBL))
+        return trainsets, [], service_ready, len(trainsets) - service_ready - ibl, ibl
+def _stored_objective_scores(trainset):
+    """objective_scores for a fleet view, read from the optimizer's block in the store"""
+    if 'objective_scores' not in trainset.store.blocks:
+        raise KeyError('objective_scores')
+    return dict(zip(OBJECTIVES, trainset.store.blocks['objective_scores'][trainset.row].tolist()))
+register_derived_field('objective_scores', 'optimization_score', _stored_objective_scores)
 # Predictive Maintenance with ML
\ No newline at end of file
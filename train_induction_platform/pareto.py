@@ -0,0 +1,176 @@
+import numpy as np
+from bisect import bisect_left
+
+# Non-dominated sorting and crowding distance; every objective is maximized.
+# Two and three objectives use sort-based O(N log N) sweeps, more objectives fall back to
+# blocked NumPy dominance checks.
+
+def pareto_front(points):
+    """Indices of the non-dominated rows of an N x M matrix"""
+    points = np.asarray(points, dtype=float)
+    if points.ndim != 2 or len(points) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if points.shape[1] == 1:
+        return np.flatnonzero(points[:, 0] == points[:, 0].max())
+    if points.shape[1] == 2:
+        return _front_2d(points)
+    if points.shape[1] == 3:
+        return _front_3d(points)
+    return _front_blocked(points)
+
+def non_dominated_sort(points):
+    """Front number per row (0 = Pareto front)"""
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if n and points.shape[1] == 2:
+        return _ranks_2d(points)
+    if n and points.shape[1] == 3:
+        return _ranks_3d(points)
+    ranks = np.full(n, -1, dtype=np.int64)
+    remaining = np.arange(n)
+    front = 0
+    while len(remaining):
+        members = remaining[pareto_front(points[remaining])]
+        ranks[members] = front
+        remaining = remaining[ranks[remaining] < 0]
+        front += 1
+    return ranks
+
+def crowding_distance(points):
+    """NSGA-II crowding distance of each row within the given set (boundary rows are infinite)"""
+    points = np.asarray(points, dtype=float)
+    n, m = points.shape if points.ndim == 2 else (len(points), 0)
+    distance = np.zeros(n)
+    if n <= 2:
+        distance[:] = np.inf
+        return distance
+    for j in range(m):
+        order = np.argsort(points[:, j], kind='stable')
+        values = points[order, j]
+        span = values[-1] - values[0]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (values[2:] - values[:-2]) / span
+    return distance
+
+def select_diverse(points, k):
+    """Indices of up to k rows: best fronts first, most isolated (crowding) first within a front"""
+    points = np.asarray(points, dtype=float)
+    ranks = non_dominated_sort(points)
+    selected = []
+    for front in range(ranks.max() + 1 if len(ranks) else 0):
+        members = np.flatnonzero(ranks == front)
+        crowding = crowding_distance(points[members])
+        selected.extend(members[np.argsort(-crowding, kind='stable')].tolist())
+        if len(selected) >= k:
+            break
+    return np.array(selected[:k], dtype=np.int64)
+
+def _front_2d(points):
+    """Sweep by the first objective: a row survives if no row with a larger first objective matches its second"""
+    f0, f1 = points[:, 0], points[:, 1]
+    order = np.lexsort((-f1, -f0))
+    s0, s1 = f0[order], f1[order]
+    group_start = np.concatenate([[True], s0[1:] != s0[:-1]])
+    group_id = np.cumsum(group_start) - 1
+    starts = np.flatnonzero(group_start)
+    # Best second objective in the group (rows sorted descending) and in all earlier groups
+    group_best = s1[starts][group_id]
+    running_best = np.maximum.accumulate(s1)
+    earlier_best = np.concatenate([[-np.inf], running_best[starts[1:] - 1]])[group_id]
+    keep = (s1 == group_best) & (s1 > earlier_best)
+    return np.sort(order[keep])
+
+def _front_3d(points):
+    """Sweep by the first objective, keeping a staircase of the (f1, f2) projections seen so far"""
+    order = np.lexsort((-points[:, 2], -points[:, 1], -points[:, 0]))
+    stair = ([], [], [])
+    keep = []
+    for i in order.tolist():
+        point = points[i].tolist()
+        if not _stair_dominates(stair, point):
+            _stair_insert(stair, point)
+            keep.append(i)
+    return np.sort(np.array(keep, dtype=np.int64))
+
+def _ranks_3d(points):
+    """Full non-dominated sort for three objectives: one staircase per front, binary search over fronts.
+    Fronts are nested (whatever front k+1 dominates, front k dominates too), so the search is valid."""
+    order = np.lexsort((-points[:, 2], -points[:, 1], -points[:, 0]))
+    ranks = np.empty(len(points), dtype=np.int64)
+    stairs = []
+    for i in order.tolist():
+        point = points[i].tolist()
+        lo, hi = 0, len(stairs)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _stair_dominates(stairs[mid], point):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(stairs):
+            stairs.append(([], [], []))
+        _stair_insert(stairs[lo], point)
+        ranks[i] = lo
+    return ranks
+
+def _stair_dominates(stair, point):
+    """Whether a row seen earlier in the sweep (so with f0 >= point's) dominates point.
+    stair holds the non-dominated (f1, f2) projections: f1 ascending, f2 descending, plus their f0."""
+    f1s, f2s, f0s = stair
+    p0, p1, p2 = point
+    pos = bisect_left(f1s, p1)
+    if pos == len(f1s) or f2s[pos] < p2:
+        return False
+    # Matching an identical row is not domination
+    return (f1s[pos], f2s[pos], f0s[pos]) != (p1, p2, p0)
+
+def _stair_insert(stair, point):
+    """Add a non-dominated row's projection, dropping the projections it dominates"""
+    f1s, f2s, f0s = stair
+    p0, p1, p2 = point
+    pos = bisect_left(f1s, p1)
+    if pos < len(f1s) and f2s[pos] >= p2:
+        return  # an identical row is already on the staircase
+    stop = pos + 1 if pos < len(f1s) and f1s[pos] == p1 else pos
+    start = pos
+    while start > 0 and f2s[start - 1] <= p2:
+        start -= 1
+    del f1s[start:stop], f2s[start:stop], f0s[start:stop]
+    f1s.insert(start, p1)
+    f2s.insert(start, p2)
+    f0s.insert(start, p0)
+
+def _front_blocked(points, block=1024):
+    """Generic dominance check in blocks, O(M N^2) but vectorized"""
+    n = len(points)
+    dominated = np.zeros(n, dtype=bool)
+    for start in range(0, n, block):
+        chunk = points[start:start + block]
+        geq = (points[None, :, :] >= chunk[:, None, :]).all(axis=2)
+        gt = (points[None, :, :] > chunk[:, None, :]).any(axis=2)
+        dominated[start:start + block] = (geq & gt).any(axis=1)
+    return np.flatnonzero(~dominated)
+
+def _ranks_2d(points):
+    """Full non-dominated sort for two objectives in O(N log N)"""
+    f0, f1 = points[:, 0], points[:, 1]
+    order = np.lexsort((-f1, -f0))
+    ranks = np.empty(len(points), dtype=np.int64)
+    # Per front: best second objective so far (non-increasing across fronts, stored negated
+    # for bisect) and the first objective of the row holding it
+    neg_best, holder_f0 = [], []
+    for i in order.tolist():
+        p0, p1 = f0[i], f1[i]
+        k = bisect_left(neg_best, -p1)
+        # A front dominates p if its best is higher, or equal but held by a row with larger f0
+        while k < len(neg_best) and -neg_best[k] == p1 and holder_f0[k] > p0:
+            k += 1
+        if k == len(neg_best):
+            neg_best.append(-p1)
+            holder_f0.append(p0)
+        elif -neg_best[k] < p1:
+            neg_best[k] = -p1
+            holder_f0[k] = p0
+        ranks[i] = k
+    return ranks
@@ -1,4 +1,3 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
@@ -9,20 +8,72 @@ import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
 import warnings
+from fleet_store import attached_fleet
+from tracing import traced
+
+# Model inputs in feature-vector order (component wear is averaged, last_service becomes days from now)
+FEATURE_PATHS = ['mileage.total_km', 'mileage.since_maintenance', 'mileage.component_wear.brake_pads',
+                 'mileage.component_wear.bogies', 'mileage.component_wear.hvac', 'job_cards.open',
+                 'fitness.rolling_stock', 'fitness.signalling', 'fitness.telecom',
+                 'operational.last_service', 'operational.reliability_score']
+
+@traced()
+def fleet_features(trainsets, now=None):
+    """N x 9 feature matrix (same columns as prepare_training_data) built column-wise in one pass,
+    and a mask of rows with missing or non-numeric features"""
+    now = now or datetime.now()
+    store, rows = attached_fleet(trainsets)
+    if store is not None:
+        cols = {path: store.column(path)[rows] for path in FEATURE_PATHS}
+        last_service = cols['operational.last_service']
+        # .days floors, as does floor division of the timedelta
+        days = (last_service - np.datetime64(now, 'us')) // np.timedelta64(1, 'D')
+        cols['operational.last_service'] = np.where(np.isnat(last_service), 30, days)
+    else:
+        cols = {path: _gather(trainsets, path, now) for path in FEATURE_PATHS}
+    features = np.column_stack([
+        cols['mileage.total_km'],
+        cols['mileage.since_maintenance'],
+        (cols['mileage.component_wear.brake_pads'] + cols['mileage.component_wear.bogies'] +
+         cols['mileage.component_wear.hvac']) / 3,
+        cols['job_cards.open'],
+        cols['fitness.rolling_stock'],
+        cols['fitness.signalling'],
+        cols['fitness.telecom'],
+        cols['operational.last_service'],
+        cols['operational.reliability_score']
+    ]).astype(float)
+    return features, ~np.isfinite(features).all(axis=1)
+
+def _gather(trainsets, path, now):
+    """One feature column from trainset dicts, NaN where the field is absent or unusable"""
+    keys = path.split('.')
+    values = np.full(len(trainsets), np.nan)
+    for i, trainset in enumerate(trainsets):
+        try:
+            value = trainset
+            for key in keys:
+                value = value[key]
+            if path == 'operational.last_service':
+                value = (value - now).days if value else 30
+            values[i] = float(value)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return values
 
 class PredictiveMaintenanceModel:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.model = None
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.hyperparameters = {'n_estimators': 100, 'random_state': 42}
+        self.cache = cache
+        self.loaded_from_cache = False
     def prepare_training_data(self, historical_data):
         """Prepare training data from historical records"""
         features = []
@@ -58,12 +109,22 @@ class PredictiveMaintenanceModel:
                 # Not enough data for proper training
                 self.is_trained = False
                 return False
+            key = self.cache.key(features, labels, self.hyperparameters) if self.cache is not None else None
+            cached = self.cache.load(key) if key else None
+            self.loaded_from_cache = cached is not None
+            if cached is not None:
+                self.model, self.scaler = cached['model'], cached['scaler']
+                self.is_trained = True
+                return True
             # Scale features
+            self.scaler = StandardScaler()
             features_scaled = self.scaler.fit_transform(features)
             # Train Random Forest model
-            self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+            self.model = RandomForestRegressor(**self.hyperparameters)
             self.model.fit(features_scaled, labels)
             self.is_trained = True
+            if key:
+                self.cache.store(key, {'model': self.model, 'scaler': self.scaler})
             return True
         except Exception as e:
             print(f"Error training model: {e}")
@@ -73,51 +134,31 @@ class PredictiveMaintenanceModel:
         """Predict maintenance needs for all trainsets"""
         if not self.is_trained or self.model is None:
             return self._fallback_predictions(trainsets)
-        predictions = []
-        for trainset in trainsets:
+        features, missing = fleet_features(trainsets)
+        ids = [trainset['id'] for trainset in trainsets]
+        complete = ~missing
+        predictions = pd.DataFrame({'trainset_id': ids, 'risk_score': np.nan, 'days_until_maintenance': np.nan,
+                                    'recommended_action': None, 'priority': None, 'confidence': None})
+        if complete.any():
             try:
-                # Prepare features for prediction
-                features = np.array([[
-                    trainset['mileage']['total_km'],
-                    trainset['mileage']['since_maintenance'],
-                    sum(trainset['mileage']['component_wear'].values()) / 3,
-                    trainset['job_cards']['open'],
-                    1 if trainset['fitness']['rolling_stock'] else 0,
-                    1 if trainset['fitness']['signalling'] else 0,
-                    1 if trainset['fitness']['telecom'] else 0,
-                    (trainset['operational']['last_service'] - datetime.now()).days if trainset['operational']['last_service'] else 30,
-                    trainset['operational']['reliability_score']
-                ]])
-                # Scale and predict
-                features_scaled = self.scaler.transform(features)
-                days_until_maintenance = self.model.predict(features_scaled)[0]
-                # Calculate risk score
-                risk_score = min(100, max(0, 100 - (days_until_maintenance / 30 * 100)))
-                # Determine recommendation
-                if risk_score > 75:
-                    action = 'Schedule Immediately'
-                    priority = 'High'
-                elif risk_score > 50:
-                    action = 'Schedule Soon'
-                    priority = 'Medium'
-                elif risk_score > 25:
-                    action = 'Monitor Closely'
-                    priority = 'Low'
-                else:
-                    action = 'OK'
-                    priority = 'None'
-                predictions.append({
-                    'trainset_id': trainset['id'],
-                    'risk_score': round(risk_score, 1),
-                    'days_until_maintenance': round(max(0, days_until_maintenance), 1),
-                    'recommended_action': action,
-                    'priority': priority,
-                    'confidence': 'High' if self.is_trained else 'Low'
-                })
+                # One scale and one predict call for the whole fleet
+                days_until_maintenance = self.model.predict(self.scaler.transform(features[complete]))
             except Exception as e:
-                # Fallback if prediction fails
-                predictions.append(self._fallback_prediction(trainset))
-        return pd.DataFrame(predictions)
+                warnings.warn(f"Maintenance model prediction failed, using heuristic predictions for the whole fleet: {e}",
+                              RuntimeWarning)
+                return self._fallback_predictions(trainsets)
+            risk_score = np.clip(100 - days_until_maintenance / 30 * 100, 0, 100)
+            bands = [risk_score > 75, risk_score > 50, risk_score > 25]
+            predictions.loc[complete, 'risk_score'] = np.round(risk_score, 1)
+            predictions.loc[complete, 'days_until_maintenance'] = np.round(np.maximum(0, days_until_maintenance), 1)
+            predictions.loc[complete, 'recommended_action'] = np.select(
+                bands, ['Schedule Immediately', 'Schedule Soon', 'Monitor Closely'], 'OK')
+            predictions.loc[complete, 'priority'] = np.select(bands, ['High', 'Medium', 'Low'], 'None')
+            predictions.loc[complete, 'confidence'] = 'High'
+        # Heuristic fallback only for rows the model cannot score
+        for i in np.flatnonzero(missing).tolist():
+            predictions.loc[i] = self._fallback_prediction(trainsets[i])
+        return predictions
     def _fallback_predictions(self, trainsets):
         """Fallback predictions when model is not trained"""
         return pd.DataFrame([self._fallback_prediction(t) for t in trainsets])
@@ -1,4 +1,3 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
@@ -9,14 +8,79 @@ import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
 import warnings
+from fleet_store import fleet_columns
+from exporter import write_export, records_chunks
+from tracing import traced
+
+# Fleet fields read by the report templates
+AGGREGATE_FIELDS = ['id', 'manual_override', 'recommendation', 'fitness.overall_valid', 'fitness.days_until_expiry',
+                    'job_cards.open', 'job_cards.priority', 'mileage.component_wear.brake_pads',
+                    'mileage.component_wear.bogies', 'mileage.component_wear.hvac', 'mileage.since_maintenance',
+                    'branding.advertiser', 'branding.hours_required_today', 'branding.exposure_deficit',
+                    'branding.contract_value']
+
+class FleetAggregate:
+    """
+    Every fleet figure the report templates use, computed in one pass over the fleet columns:
+    counts and sums are whole-column reductions and per-advertiser totals are a bincount over
+    factorized advertiser labels. The templates only slice this object.
+    """
+    @traced('FleetAggregate')
+    def __init__(self, trainsets):
+        columns = fleet_columns(trainsets, AGGREGATE_FIELDS)
+        self.total_trainsets = len(trainsets)
+        self.ids = columns['id']
+        # Status counts (a manual override counts towards every status, as before)
+        override = columns['manual_override'].astype(bool)
+        self.status_counts = {status: int(np.count_nonzero(override | (columns['recommendation'] == status)))
+                              for status in ('Service', 'Standby', 'IBL')}
+        # Fitness and job cards
+        self.fitness_valid = int(np.count_nonzero(columns['fitness.overall_valid']))
+        self.fitness_expiring = int(np.count_nonzero(columns['fitness.days_until_expiry'] <= 2))
+        self.open_jobs = columns['job_cards.open']
+        self.total_open_jobs = int(self.open_jobs.sum())
+        self.job_priority = columns['job_cards.priority']
+        self.critical_jobs = int(np.count_nonzero(self.job_priority == 'Critical'))
+        # Mileage and wear
+        self.wear_avg = (columns['mileage.component_wear.brake_pads'] + columns['mileage.component_wear.bogies'] +
+                         columns['mileage.component_wear.hvac']) / 3
+        self.preventive_due = int(np.count_nonzero(columns['mileage.since_maintenance'] > 8000))
+        # Branding, grouped by advertiser in order of first appearance
+        hours_required = columns['branding.hours_required_today']
+        deficit = columns['branding.exposure_deficit']
+        value = columns['branding.contract_value']
+        codes, labels = pd.factorize(columns['branding.advertiser'], use_na_sentinel=False)
+        # Missing (None/NaN) and empty advertisers share the 'Unbranded' group
+        label_codes, advertisers = pd.factorize(np.array([label if isinstance(label, str) and label else 'Unbranded'
+                                                          for label in labels], dtype=object))
+        codes = label_codes[codes]
+        groups = len(advertisers)
+        sums = {name: np.bincount(codes, weights=values, minlength=groups)
+                for name, values in (('total_hours_required', hours_required), ('total_deficit', deficit),
+                                     ('total_value', value))}
+        counts = np.bincount(codes, minlength=groups)
+        self.advertiser_stats = {}
+        for g, advertiser in enumerate(advertisers):
+            self.advertiser_stats[advertiser] = {
+                'total_hours_required': int(sums['total_hours_required'][g]),
+                'total_deficit': int(sums['total_deficit'][g]),
+                'train_count': int(counts[g]),
+                'total_value': int(sums['total_value'][g])
+            }
+        self.total_exposure_deficit = int(deficit.sum())
+        self.total_contract_value = int(value.sum())
+        self.trains_requiring_exposure = int(np.count_nonzero(hours_required > 0))
+    def high_risk_trains(self, wear_threshold=70, job_threshold=2):
+        """Trainsets with high average wear or many open job cards, highest wear first"""
+        rows = np.flatnonzero((self.wear_avg > wear_threshold) | (self.open_jobs > job_threshold))
+        rows = rows[np.argsort(-self.wear_avg[rows], kind='stable')]
+        return [{'id': self.ids[i], 'wear_score': float(self.wear_avg[i]), 'open_jobs': int(self.open_jobs[i]),
+                 'priority': self.job_priority[i]} for i in rows.tolist()]
 
 class ReportGenerator:
     def __init__(self):
@@ -26,83 +90,65 @@ class ReportGenerator:
             'branding_compliance': self._generate_branding_report,
             'optimization_summary': self._generate_optimization_report
         }
-    def generate_report(self, report_type, trainsets, optimization_results=None, alerts=None):
-        """Generate a specific type of report"""
+    def generate_report(self, report_type, trainsets, optimization_results=None, alerts=None, aggregate=None):
+        """Generate a specific type of report; pass a FleetAggregate to reuse one fleet pass"""
         if report_type in self.report_templates:
-            return self.report_templates[report_type](trainsets, optimization_results, alerts)
+            if aggregate is None:
+                aggregate = FleetAggregate(trainsets)
+            return self.report_templates[report_type](aggregate, optimization_results, alerts)
         return None
-    def _generate_daily_operations_report(self, trainsets, optimization_results, alerts):
+    def generate_reports(self, trainsets, optimization_results=None, alerts=None, report_types=None):
+        """Generate several reports (all by default) from a single aggregation of the fleet"""
+        aggregate = FleetAggregate(trainsets)
+        return {report_type: self.generate_report(report_type, trainsets, optimization_results, alerts, aggregate)
+                for report_type in (report_types or self.report_templates)}
+    def _generate_daily_operations_report(self, aggregate, optimization_results, alerts):
         """Generate daily operations report"""
-        service_ready = sum(1 for t in trainsets if t.get('manual_override') or t['recommendation'] == 'Service')
-        standby = sum(1 for t in trainsets if t.get('manual_override') or t['recommendation'] == 'Standby')
-        ibl = sum(1 for t in trainsets if t.get('manual_override') or t['recommendation'] == 'IBL')
+        service_ready = aggregate.status_counts['Service']
+        total = aggregate.total_trainsets
         report = {
             'title': 'Daily Operations Report',
             'timestamp': datetime.now(),
             'summary': {
-                'total_trainsets': len(trainsets),
+                'total_trainsets': total,
                 'service_ready': service_ready,
-                'standby': standby,
-                'ibl_maintenance': ibl,
-                'availability_rate': round(service_ready / len(trainsets) * 100, 1) if trainsets else 0
+                'standby': aggregate.status_counts['Standby'],
+                'ibl_maintenance': aggregate.status_counts['IBL'],
+                'availability_rate': round(service_ready / total * 100, 1) if total else 0
             },
             'fitness_status': {
-                'all_valid': sum(1 for t in trainsets if t['fitness']['overall_valid']),
-                'expiring_soon': sum(1 for t in trainsets if t['fitness']['days_until_expiry'] <= 2)
+                'all_valid': aggregate.fitness_valid,
+                'expiring_soon': aggregate.fitness_expiring
             },
             'maintenance_status': {
-                'open_job_cards': sum(t['job_cards']['open'] for t in trainsets),
-                'critical_priority': sum(1 for t in trainsets if t['job_cards']['priority'] == 'Critical')
+                'open_job_cards': aggregate.total_open_jobs,
+                'critical_priority': aggregate.critical_jobs
             }
         }
         return report
-    def _generate_maintenance_report(self, trainsets, optimization_results, alerts):
+    def _generate_maintenance_report(self, aggregate, optimization_results, alerts):
         """Generate maintenance planning report"""
-        high_risk_trains = []
-        for t in trainsets:
-            wear_avg = sum(t['mileage']['component_wear'].values()) / 3
-            if wear_avg > 70 or t['job_cards']['open'] > 2:
-                high_risk_trains.append({
-                    'id': t['id'],
-                    'wear_score': wear_avg,
-                    'open_jobs': t['job_cards']['open'],
-                    'priority': t['job_cards']['priority']
-                })
         report = {
             'title': 'Maintenance Planning Report',
             'timestamp': datetime.now(),
-            'high_risk_trains': sorted(high_risk_trains, key=lambda x: x['wear_score'], reverse=True),
-            'total_open_jobs': sum(t['job_cards']['open'] for t in trainsets),
-            'preventive_maintenance_needed': sum(1 for t in trainsets if t['mileage']['since_maintenance'] > 8000),
-            'critical_issues': sum(1 for t in trainsets if t['job_cards']['priority'] == 'Critical')
-        }        
+            'high_risk_trains': aggregate.high_risk_trains(),
+            'total_open_jobs': aggregate.total_open_jobs,
+            'preventive_maintenance_needed': aggregate.preventive_due,
+            'critical_issues': aggregate.critical_jobs
+        }
         return report
-    def _generate_branding_report(self, trainsets, optimization_results, alerts):
+    def _generate_branding_report(self, aggregate, optimization_results, alerts):
         """Generate branding compliance report"""
-        branding_stats = {}
-        for t in trainsets:
-            advertiser = t['branding']['advertiser'] or 'Unbranded'
-            if advertiser not in branding_stats:
-                branding_stats[advertiser] = {
-                    'total_hours_required': 0,
-                    'total_deficit': 0,
-                    'train_count': 0,
-                    'total_value': 0
-                }
-            branding_stats[advertiser]['total_hours_required'] += t['branding']['hours_required_today']
-            branding_stats[advertiser]['total_deficit'] += t['branding']['exposure_deficit']
-            branding_stats[advertiser]['train_count'] += 1
-            branding_stats[advertiser]['total_value'] += t['branding']['contract_value']
         report = {
             'title': 'Branding Compliance Report',
             'timestamp': datetime.now(),
-            'advertiser_stats': branding_stats,
-            'total_exposure_deficit': sum(t['branding']['exposure_deficit'] for t in trainsets),
-            'total_contract_value': sum(t['branding']['contract_value'] for t in trainsets),
-            'trains_requiring_exposure': sum(1 for t in trainsets if t['branding']['hours_required_today'] > 0)
+            'advertiser_stats': aggregate.advertiser_stats,
+            'total_exposure_deficit': aggregate.total_exposure_deficit,
+            'total_contract_value': aggregate.total_contract_value,
+            'trains_requiring_exposure': aggregate.trains_requiring_exposure
         }
         return report
-    def _generate_optimization_report(self, trainsets, optimization_results, alerts):
+    def _generate_optimization_report(self, aggregate, optimization_results, alerts):
         """Generate optimization performance report"""
         if not optimization_results:
             return None
@@ -140,7 +186,8 @@ class ReportGenerator:
             for train in report['high_risk_trains']:
                 df_data.append(train)
         if df_data:
-            df = pd.DataFrame(df_data)
-            return df.to_csv(index=False)
+            buffer = io.BytesIO()
+            write_export(records_chunks(df_data), buffer, 'csv')
+            return buffer.getvalue().decode('utf-8')
         return None
 # System Integration Manager
\ No newline at end of file
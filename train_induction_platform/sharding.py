@@ -0,0 +1,189 @@
+import os
+import heapq
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from fleet_store import fleet_columns
+from induction_solver import InductionSolver, SERVICE, STANDBY, IBL, _relative_gap
+
+# Smaller fleets are solved shard by shard in the calling process: starting workers and moving the
+# shard models would cost more than the solves
+PARALLEL_MIN_TRAINSETS = 2000
+MAX_REBALANCE_ROUNDS = 3
+SHARD_ARRAYS = ('value_service', 'value_ibl', 'can_service', 'can_ibl', 'moves')
+_pool = None
+_pool_lock = threading.Lock()
+
+def shard_pool():
+    """Process pool for shard solves, one worker per CPU, created on first use and reused. Workers
+    are spawned rather than forked so they do not inherit the caller's threads and open files."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def allocate(total, weights):
+    """Split an integer total across shards in proportion to weights (largest remainder method)"""
+    weights = np.asarray(weights, dtype=float)
+    if total <= 0 or not len(weights):
+        return np.zeros(len(weights), dtype=int)
+    if weights.sum() <= 0:
+        weights = np.ones(len(weights))
+    exact = total * weights / weights.sum()
+    shares = np.floor(exact).astype(int)
+    shares[np.argsort(-(exact - shares), kind='stable')[:total - shares.sum()]] += 1
+    return shares
+
+def solve_shard(model, time_budget, backend):
+    """Solve one shard's model; runs in a worker process"""
+    return InductionSolver(time_budget=time_budget, backend=backend).solve_model(model)
+
+class DepotShardedSolver:
+    """
+    Induction plan per depot. The fleet model (InductionSolver.build_model) is built once and sliced
+    by depot. Each shard gets a share of service_target, max_ibl and the shunting budget, set
+    explicitly by constraints['depot_shares'] ({depot: {'service_target': n, 'max_ibl': n}}, either
+    key optional) or else in proportion to its eligible trainsets; whatever explicit shares leave of a
+    limit is spread over the other depots that way. Shards are solved exactly, in worker processes for
+    large fleets.
+
+    A coordination step then moves shared slots between depots. A slot goes from the depot where it
+    is worth least (the value of its weakest assigned trainset, or zero if unused) to the depot where
+    one more slot gains most (its best unassigned eligible trainset). Depots whose shares changed are
+    re-solved, for up to MAX_REBALANCE_ROUNDS rounds.
+    """
+    def __init__(self, time_budget=10.0, backend=None):
+        self.time_budget = time_budget
+        self.backend = backend
+    def solve(self, trainsets, scores, constraints):
+        """Returns (assignment: array of SERVICE/STANDBY/IBL per trainset, report dict)"""
+        start = time.time()
+        model = InductionSolver(backend=self.backend).build_model(trainsets, np.asarray(scores, dtype=float),
+                                                                  constraints)
+        index = {}
+        depots = fleet_columns(trainsets, ['depot'])['depot'].tolist()
+        codes = np.array([index.setdefault(depot, len(index)) for depot in depots], dtype=np.int64)
+        names = sorted(index, key=str)
+        shards = [np.flatnonzero(codes == index[name]) for name in names]
+        service, ibl = self._initial_shares(model, names, shards, constraints)
+        parallel = len(shards) > 1 and len(trainsets) >= PARALLEL_MIN_TRAINSETS
+        assignment = np.full(len(trainsets), STANDBY)
+        reports = [None] * len(shards)
+        pending = list(range(len(shards)))
+        transfers = rounds = 0
+        # Shares of the last complete plan, restored if a rebalancing re-solve runs out of time
+        previous = service.copy(), ibl.copy()
+        while True:
+            budgets = None if model['max_moves'] is None else allocate(int(model['max_moves']), service)
+            # Shards run side by side, so each may use what is left of the whole budget
+            time_budget = max(0.01, start + self.time_budget - time.time())
+            results = self._solve_shards(model, shards, service, ibl, budgets, pending, parallel, time_budget)
+            if rounds and any(report['status'] == 'no_solution' for _, report in results):
+                # Out of time while rebalancing: keep the last complete plan
+                service, ibl = previous
+                rounds -= 1
+                break
+            for k, (shard_assignment, report) in zip(pending, results):
+                assignment[shards[k]] = shard_assignment
+                reports[k] = report
+            transfers += len(pending) if rounds else 0
+            if rounds == MAX_REBALANCE_ROUNDS or constraints.get('rebalance') is False:
+                break
+            previous = service.copy(), ibl.copy()
+            moved_service = _rebalance(model, shards, assignment, service, SERVICE, 'value_service', 'can_service')
+            moved_ibl = _rebalance(model, shards, assignment, ibl, IBL, 'value_ibl', 'can_ibl')
+            pending = sorted(moved_service | moved_ibl)
+            if not pending:
+                break
+            rounds += 1
+        objective = float(sum(report['objective'] for report in reports))
+        bounds = [report['bound'] for report in reports]
+        bound = None if None in bounds else float(sum(bounds))
+        return assignment, {
+            'backend': f"depot_sharded_{reports[0]['backend'] if reports else self.backend}",
+            'status': 'optimal' if all(report['status'] == 'optimal' for report in reports) else 'time_limit',
+            'objective': objective,
+            # Against the shard bounds for the final shares, not a bound for the whole fleet
+            'bound': bound,
+            'gap': _relative_gap(objective, bound),
+            'parallel': parallel,
+            'rebalance_rounds': rounds,
+            'rebalanced_shards': transfers,
+            'shards': {str(name): {'trainsets': len(rows), 'service_target': int(service[k]), 'max_ibl': int(ibl[k]),
+                              'service': report['service'], 'ibl': report['ibl'], 'status': report['status'],
+                              'solve_time': report['solve_time']}
+                       for k, (name, rows, report) in enumerate(zip(names, shards, reports))},
+            'solve_time': round(time.time() - start, 4),
+            'service': int(np.count_nonzero(assignment == SERVICE)),
+            'ibl': int(np.count_nonzero(assignment == IBL))
+        }
+    def _initial_shares(self, model, names, shards, constraints):
+        """(service shares, IBL shares) per shard; they always add up to the fleet limits"""
+        explicit = constraints.get('depot_shares') or {}
+        unknown = set(explicit) - set(names)
+        if unknown:
+            raise ValueError(f"depot_shares for depots not in the fleet: {sorted(unknown, key=str)}")
+        shares = []
+        for limit, eligible in (('service_target', 'can_service'), ('max_ibl', 'can_ibl')):
+            total = int(model[limit])
+            fixed = {k: int(explicit[name][limit]) for k, name in enumerate(names) if limit in explicit.get(name, {})}
+            if any(value < 0 for value in fixed.values()):
+                raise ValueError(f"depot_shares: negative {limit}")
+            rest = [k for k in range(len(names)) if k not in fixed]
+            remainder = total - sum(fixed.values())
+            if remainder < 0 or (remainder and not rest):
+                raise ValueError(f"depot_shares: {limit} shares add up to {sum(fixed.values())}, "
+                                 f"but the fleet {limit} is {total}")
+            share = np.zeros(len(names), dtype=int)
+            share[list(fixed)] = list(fixed.values())
+            share[rest] = allocate(remainder, [model[eligible][shards[k]].sum() for k in rest])
+            shares.append(share)
+        return tuple(shares)
+    def _solve_shards(self, model, shards, service, ibl, budgets, pending, parallel, time_budget):
+        shard_models = []
+        for k in pending:
+            shard_model = {key: model[key][shards[k]] for key in SHARD_ARRAYS}
+            shard_model.update(service_target=int(service[k]), max_ibl=int(ibl[k]),
+                               max_moves=None if budgets is None else int(budgets[k]))
+            shard_models.append(shard_model)
+        if not parallel:
+            return [solve_shard(shard_model, time_budget, self.backend) for shard_model in shard_models]
+        pool = shard_pool()
+        futures = [pool.submit(solve_shard, shard_model, time_budget, self.backend) for shard_model in shard_models]
+        return [future.result() for future in futures]
+
+def _rebalance(model, shards, assignment, shares, label, values_key, eligible_key):
+    """Move slots of one shared limit between shards while that raises the plan value; updates
+    shares in place and returns the shards whose share changed"""
+    values, eligible = model[values_key], model[eligible_key]
+    gains, losses = [], []
+    for rows, share in zip(shards, shares.tolist()):
+        chosen = assignment[rows] == label
+        # Giving up a slot costs its weakest assigned trainset; unused slots cost nothing
+        unused = max(0, share - int(np.count_nonzero(chosen)))
+        losses.append([0.0] * unused + np.sort(values[rows][chosen]).tolist())
+        # An extra slot gains the best eligible trainset left on standby (kept negated: heaps are min-first)
+        free = eligible[rows] & (assignment[rows] == STANDBY) & (values[rows] > 0)
+        gains.append((-np.sort(values[rows][free])[::-1]).tolist())
+    changed = set()
+    while True:
+        best = None
+        for a, gain in enumerate(gains):
+            for b, loss in enumerate(losses):
+                if a != b and gain and loss and (best is None or -gain[0] - loss[0] > best[0]):
+                    best = (-gain[0] - loss[0], a, b)
+        if best is None or best[0] <= 1e-9:
+            return changed
+        _, a, b = best
+        value = -heapq.heappop(gains[a])
+        freed = heapq.heappop(losses[b])
+        heapq.heappush(losses[a], value)
+        if freed > 0:
+            heapq.heappush(gains[b], -freed)
+        shares[a] += 1
+        shares[b] -= 1
+        changed.update((a, b))
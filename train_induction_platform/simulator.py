@@ -1,5 +1,5 @@
 from common_imports import *
-from utils import calculate_ai_score
+from utils import calculate_ai_scores
 
 class KMRLDataSimulator:
     def __init__(self, n_trainsets=25):
@@ -113,15 +113,14 @@ class KMRLDataSimulator:
         return trainset
     def generate_realistic_dataset(self, n=25, historical_patterns=None):
         """Generate a more realistic dataset with correlated patterns """
-        trainsets = []
         simulator = KMRLDataSimulator(n)
-        for i in range(1, n + 1):
-            trainset_id = f"KMRL-{str(i).zfill(3)}"
-            trainset = simulator.generate_synthetic_trainset(trainset_id, historical_patterns) 
-            # AI scoring
-            ai_score, reasons = calculate_ai_score(trainset)
+        trainsets = [simulator.generate_synthetic_trainset(f"KMRL-{str(i).zfill(3)}", historical_patterns)
+                     for i in range(1, n + 1)]
+        # AI scoring for the whole fleet at once
+        scores, reason_bits = calculate_ai_scores(trainsets)
+        for trainset, ai_score, bits in zip(trainsets, scores.tolist(), reason_bits.tolist()):
             trainset['ai_score'] = ai_score
-            trainset['score_reasons'] = reasons
+            trainset['score_reason_bits'] = bits
             # Recommendation assignment
             if ai_score < 30 or trainset['operational']['status'] == 'IBL' or trainset['job_cards']['open'] > 2:
                 trainset['recommendation'] = 'IBL'
@@ -129,7 +128,6 @@ class KMRLDataSimulator:
                 trainset['recommendation'] = 'Service'
             else:
                 trainset['recommendation'] = 'Standby'
-            trainsets.append(trainset)
         # Sort descending by ai_score
         trainsets.sort(key=lambda x: x['ai_score'], reverse=True)
         return trainsets
@@ -0,0 +1,82 @@
+import os
+import pickle
+import tempfile
+import numpy as np
+from fleet_store import FleetStore, FLEET_SCHEMA
+
+DEFAULT_SNAPSHOT_PATH = os.environ.get('KMRL_SNAPSHOT',
+                                       os.path.join(os.path.expanduser('~'), '.local', 'share', 'train_induction_platform',
+                                                    'system.snapshot'))
+SNAPSHOT_MAGIC = b'KMRLSNP1'
+SNAPSHOT_VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('pad', '<u4'), ('meta_offset', '<u8'), ('meta_size', '<u8')])
+# Array offsets are aligned so every memory-mapped column is aligned for its dtype
+ALIGNMENT = 64
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def save_snapshot(path, fleet, state):
+    """
+    Write a fleet (FleetStore) and any picklable state to one file. The layout is a fixed header, then
+    the fleet's fixed-width arrays as raw aligned bytes, then a pickled trailer with the array index,
+    the rest of the fleet and `state`. The file is written to a uniquely named temporary file next to
+    `path` and renamed over it, so a reader sees either the old snapshot or the new one, and concurrent
+    saves never write into each other's file. Returns the size in bytes.
+    """
+    path = path or DEFAULT_SNAPSHOT_PATH
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    arrays, fleet_state = fleet.to_arrays()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    index = {}
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(bytes(HEADER_SIZE))
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                offset = _aligned(f.tell())
+                f.seek(offset)
+                f.write(array.view(np.uint8).data if array.size else b'')
+                index[name] = (offset, array.dtype.str, array.shape)
+            meta_offset = f.tell()
+            f.write(pickle.dumps({'schema': FLEET_SCHEMA, 'arrays': index, 'fleet': fleet_state, 'state': state},
+                                 protocol=pickle.HIGHEST_PROTOCOL))
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header['magic'] = SNAPSHOT_MAGIC
+            header['version'] = SNAPSHOT_VERSION
+            header['meta_offset'] = meta_offset
+            header['meta_size'] = f.tell() - meta_offset
+            f.seek(0)
+            f.write(header.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(path)
+
+def load_snapshot(path=None):
+    """(fleet, state) from save_snapshot. Fleet arrays are copy-on-write memory maps of the file:
+    pages are read on first touch and writes stay private to this process."""
+    path = path or DEFAULT_SNAPSHOT_PATH
+    mm = np.memmap(path, dtype=np.uint8, mode='c')
+    if len(mm) < HEADER_SIZE:
+        raise ValueError(f"{path} is not a system snapshot")
+    header = mm[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+    if header['magic'] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a system snapshot")
+    if header['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is a version {header['version']} snapshot; expected version {SNAPSHOT_VERSION}")
+    meta_offset, meta_size = int(header['meta_offset']), int(header['meta_size'])
+    meta = pickle.loads(mm[meta_offset:meta_offset + meta_size].tobytes())
+    if meta['schema'] != FLEET_SCHEMA:
+        raise ValueError(f"{path} was written for a different fleet schema")
+    arrays = {}
+    for name, (offset, dtype, shape) in meta['arrays'].items():
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = mm[offset:offset + size].view(dtype).reshape(shape)
+    return FleetStore.from_arrays(arrays, meta['fleet']), meta['state']
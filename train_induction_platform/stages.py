@@ -0,0 +1,78 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from tracing import TRACER
+
+# Shared by every stage graph; stages mostly run NumPy, pandas and scikit-learn code that releases the GIL
+MAX_WORKERS = min(8, (os.cpu_count() or 1) + 1)
+_executor = None
+_executor_lock = threading.Lock()
+
+def stage_executor():
+    """Process-wide thread pool for pipeline stages, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='stage')
+        return _executor
+
+class Stage:
+    """
+    One pipeline step: func is called with the values named by `inputs` (positionally) and its
+    result is stored under `outputs` (a tuple result is unpacked when there are several).
+    """
+    def __init__(self, name, func, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
+    def run(self, args, parent=None):
+        with TRACER.span(self.name, parent):
+            result = self.func(*args)
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return dict(zip(self.outputs, result or ()))
+
+class StageGraph:
+    """
+    Stages wired by their declared inputs and outputs. run() submits each stage to the pool as soon
+    as all its inputs are available, so independent stages overlap and the wall-clock time is that
+    of the slowest dependency chain rather than the sum of the stages. Stage spans nest under the
+    caller's current span.
+    """
+    def __init__(self, stages, executor=None):
+        self.stages = list(stages)
+        self.executor = executor
+        producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"Output {output!r} produced by both {producers[output]!r} and {stage.name!r}")
+                producers[output] = stage.name
+        self.producers = producers
+    def run(self, context):
+        """Run every stage; returns the context extended with all stage outputs"""
+        values = dict(context)
+        executor = self.executor or stage_executor()
+        parent = TRACER.current()
+        pending = list(self.stages)
+        running = {}
+        try:
+            while pending or running:
+                ready = [stage for stage in pending if all(name in values for name in stage.inputs)]
+                for stage in ready:
+                    pending.remove(stage)
+                    args = [values[name] for name in stage.inputs]
+                    running[executor.submit(stage.run, args, parent)] = stage
+                if not running:
+                    missing = {name for stage in pending for name in stage.inputs if name not in values}
+                    raise ValueError(f"Stages {[s.name for s in pending]} wait on inputs never produced: {sorted(missing)}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    values.update(future.result())
+        finally:
+            # Never leave stages running against state the caller is about to change
+            if running:
+                wait(running)
+        return values
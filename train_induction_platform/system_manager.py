@@ -1,98 +1,225 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
 from datetime import datetime, timedelta
 import io
+import os
 import time
 import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import re
+import weakref
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
+import pickle
+import sklearn
 import warnings
 
 from simulator import KMRLDataSimulator
 from optimizer import MultiObjectiveOptimizer
 from predictive_model import PredictiveMaintenanceModel
-from integrator import RealTimeDataIntegrator
+from model_cache import ModelCache
+from event_log import FleetEventLog
+from integrator import RealTimeDataIntegrator, ChangeEvent
+from telemetry import TelemetryBuffer, SyntheticTelemetry
 from alerts import AlertManager
+from alert_history import AlertHistory
 from reports import ReportGenerator
+from fleet_store import FleetStore, attached_fleet, resolve_fleet, fleet_version
+from memo import LRUMemo
+from history import OptimizationHistory
+from tracing import TRACER, PIPELINE_SPAN, span
+from stages import Stage, StageGraph
+from snapshot import DEFAULT_SNAPSHOT_PATH, save_snapshot, load_snapshot
+from exporter import (export_to_tempfile, export_to_named_file, fleet_chunks, optimization_history_chunks,
+                      alert_history_chunks)
 
 from timetable_b import TimetableGenerator
 
+# Each UI session (or batch scenario) keeps its alert history, event log and snapshot in its own data
+# directory, so sessions never restore, acknowledge or log into each other's state
+DATA_ROOT = os.environ.get('KMRL_DATA_DIR',
+                           os.path.join(os.path.expanduser('~'), '.local', 'share', 'train_induction_platform'))
+_SESSION_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+# Seconds of sensor readings ingested before each data refresh
+TELEMETRY_SECONDS_PER_REFRESH = 60
+
+def _remove_export(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def session_data_dir(session_id):
+    """Data directory of one UI session, DATA_ROOT/sessions/<session_id>"""
+    if not isinstance(session_id, str) or not _SESSION_ID.fullmatch(session_id):
+        raise ValueError(f"Invalid session id {session_id!r}")
+    return os.path.join(DATA_ROOT, 'sessions', session_id)
+
 class SystemIntegrationManager:
-    def __init__(self):
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir
+        # Saved after each run and restored at startup; per data_dir so sessions never resume each other's fleet
+        self.snapshot_path = os.path.join(data_dir, 'system.snapshot') if data_dir else DEFAULT_SNAPSHOT_PATH
         self.data_simulator = KMRLDataSimulator()
         self.optimizer = MultiObjectiveOptimizer()
-        self.ml_model = PredictiveMaintenanceModel()
+        # Trained models persist across sessions and resets, keyed by training data
+        self.model_cache = ModelCache()
+        self.ml_model = PredictiveMaintenanceModel(cache=self.model_cache)
         self.data_integrator = RealTimeDataIntegrator()
+        # Rolling wear aggregates over the fleet's sensor streams, set up when a fleet is loaded
+        self.telemetry = None
+        self.telemetry_feed = None
         self.alert_manager = AlertManager()
+        # Alert lifecycle history, kept across restarts; data_dir keeps it and the event log apart
+        # from other sessions and runs (see session_data_dir)
+        self.alert_manager.attach_history(AlertHistory(os.path.join(data_dir, 'alerts.sqlite3') if data_dir else None))
         self.report_generator = ReportGenerator()
         self.last_optimization_time = None
-        self.optimization_history = []
+        self.optimization_history = OptimizationHistory()
+        self.fleet = None
+        # Reports, metrics, trends and exports per fleet version; reruns reuse them until the data changes
+        self.memo = LRUMemo()
+        # Export files by the same keys, held as paths so every caller reads through its own handle;
+        # files are deleted when evicted, on reset and when the manager goes away
+        self.export_memo = LRUMemo(maxsize=16, on_evict=_remove_export)
+        weakref.finalize(self, self.export_memo.clear)
+        # Durable record of updates, decisions and overrides; survives reset_system
+        self.event_log = FleetEventLog(os.path.join(data_dir, 'events') if data_dir else None)
+        self._track_integrator_changes()
+        # After optimization, predictions run alongside the metrics -> alerts chain; all only read the fleet
+        self.post_optimization = StageGraph([
+            Stage('predict_maintenance', lambda trainsets: self.ml_model.predict_maintenance(trainsets),
+                  ['trainsets'], 'maintenance_predictions'),
+            Stage('performance_metrics', self._performance_metrics_stage,
+                  ['trainsets', 'constraints', 'assignment', 'start_time'], 'performance_metrics'),
+            Stage('check_alerts', lambda trainsets, metrics: self.alert_manager.check_alerts(trainsets, metrics),
+                  ['trainsets', 'performance_metrics'], 'alerts')
+        ])
+    def _track_integrator_changes(self):
+        """Let the optimizer and alerts recompute only trainsets the integrator changed, and have its
+        component wear follow the telemetry aggregates"""
+        self.optimizer.watch(self.data_integrator.track_changes())
+        self.alert_manager.watch(self.data_integrator.track_changes())
+        self.data_integrator.subscribe(self.event_log.record_updates)
+        if self.telemetry is not None:
+            self.data_integrator.attach_telemetry(self.telemetry)
+    def _start_telemetry(self, trainsets):
+        """Fresh telemetry buffer and synthetic sensor feed for a newly loaded fleet"""
+        self.telemetry = TelemetryBuffer([t['id'] for t in trainsets])
+        self.telemetry_feed = SyntheticTelemetry(trainsets)
+        self.data_integrator.attach_telemetry(self.telemetry)
+    def ingest_telemetry(self, seconds=TELEMETRY_SECONDS_PER_REFRESH):
+        """Feed the next `seconds` of sensor readings into the telemetry buffer; returns the reading count"""
+        if self.telemetry_feed is None:
+            return 0
+        return self.telemetry.ingest(*self.telemetry_feed.batch(seconds))
+    def refresh_data(self, trainsets):
+        """Ingest pending telemetry, then refresh every data source. Returns (trainsets, update_count)."""
+        self.ingest_telemetry()
+        return self.data_integrator.refresh_all_data(trainsets)
     def initialize_system(self, n_trainsets=25):
         """Initialize the complete system with data"""
-        trainsets = self.data_simulator.generate_realistic_dataset(n_trainsets)
+        return self.load_fleet(self.data_simulator.generate_realistic_dataset(n_trainsets))
+    def load_fleet(self, trainsets):
+        """Adopt a fleet (trainset dicts or a FleetStore), train the ML model on it and return its views"""
         # Train ML model with initial data
-        self.ml_model.train_model(trainsets)
-        return trainsets
+        self.ml_model.train_model(trainsets.views() if isinstance(trainsets, FleetStore) else trainsets)
+        # Hold the fleet column-wise; the UI works on dict-compatible views
+        self.fleet = trainsets if isinstance(trainsets, FleetStore) else FleetStore.from_trainsets(trainsets)
+        self.event_log.snapshot(self.fleet)
+        views = self.fleet.views()
+        self._start_telemetry(views)
+        return views
     def run_complete_optimization(self, trainsets, constraints):
-        """Run complete optimization pipeline"""
+        """Run complete optimization pipeline; each stage is a tracing span and its timings are kept
+        with the run in optimization_history"""
+        with span(PIPELINE_SPAN) as run:
+            result = self._run_pipeline(trainsets, constraints)
+        if run is not None:
+            self.optimization_history.set_stage_timings(TRACER.stage_timings(run.trace))
+        return result
+    def _run_pipeline(self, trainsets, constraints):
         start_time = time.time()
+        if 'time_budget' in constraints and 'deadline' not in constraints:
+            # Hard deadline for the whole run; the anytime optimizer stops there with its best plan
+            constraints = dict(constraints, deadline=start_time + constraints['time_budget'])
         # Refresh real-time data
-        trainsets, update_count = self.data_integrator.refresh_all_data(trainsets)
+        with span('refresh_data'):
+            trainsets, update_count = self.refresh_data(trainsets)
+            previous = {t['id']: t.get('recommendation') for t in trainsets}
         # Run optimization
-        optimized_trainsets, conflicts, service_ready, standby, ibl = self.optimizer.optimize_fleet_assignment(
-            trainsets, constraints
-        )
-        # Generate maintenance predictions
-        maintenance_predictions = self.ml_model.predict_maintenance(optimized_trainsets)
-        # Calculate performance metrics
-        performance_metrics = self._calculate_performance_metrics(optimized_trainsets, constraints)
-        performance_metrics.update({
-            'service_ready': service_ready,
-            'standby': standby,
-            'ibl_maintenance': ibl,
-            'conflicts': conflicts,
-            'data_updates': update_count,
-            'processing_time': round(time.time() - start_time, 2)
+        with span('optimize'):
+            optimized_trainsets, conflicts, service_ready, standby, ibl = self.optimizer.optimize_fleet_assignment(
+                trainsets, constraints
+            )
+        # Maintenance predictions, performance metrics and alerts
+        stages = self.post_optimization.run({
+            'trainsets': optimized_trainsets,
+            'constraints': constraints,
+            'assignment': {'service_ready': service_ready, 'standby': standby, 'ibl_maintenance': ibl,
+                           'conflicts': conflicts, 'data_updates': update_count},
+            'start_time': start_time
         })
-        # Check for alerts
-        alerts = self.alert_manager.check_alerts(optimized_trainsets, performance_metrics)
+        maintenance_predictions = stages['maintenance_predictions']
+        performance_metrics = stages['performance_metrics']
+        alerts = stages['alerts']
         # Store in history
-        optimization_record = {
-            'timestamp': datetime.now(),
-            'metrics': performance_metrics,
-            'constraints': constraints,
-            'alert_count': len(alerts)
-        }
-        self.optimization_history.append(optimization_record)
-        self.last_optimization_time = datetime.now()
+        with span('record'):
+            optimization_record = {
+                'timestamp': datetime.now(),
+                'metrics': performance_metrics,
+                'constraints': constraints,
+                'alert_count': len(alerts)
+            }
+            solver_report = self.optimizer.last_solver_report
+            if constraints.get('solver') == 'anytime' and solver_report:
+                optimization_record['convergence_trace'] = solver_report['trace']
+            self.optimization_history.append(optimization_record)
+            self.last_optimization_time = datetime.now()
+            self.event_log.record_decisions(optimized_trainsets, previous, optimization_record['timestamp'])
+            self.event_log.record_run(performance_metrics, len(alerts), optimization_record['timestamp'])
+            if self.fleet is not None and self.event_log.snapshot_due():
+                self.event_log.snapshot(self.fleet)
         return optimized_trainsets, performance_metrics, alerts, maintenance_predictions
+    def _performance_metrics_stage(self, trainsets, constraints, assignment, start_time):
+        performance_metrics = self._calculate_performance_metrics(trainsets, constraints)
+        performance_metrics.update(assignment)
+        performance_metrics['processing_time'] = round(time.time() - start_time, 2)
+        return performance_metrics
     def _calculate_performance_metrics(self, trainsets, constraints):
-        """Calculate comprehensive performance metrics"""
+        """Calculate comprehensive performance metrics (memoized per fleet version). The simulated
+        estimated_savings and energy_efficiency figures are drawn once per fleet version and then
+        kept, so reruns on unchanged data report the same numbers; this is intended."""
+        metrics = self.memo.get(('metrics', fleet_version(trainsets)),
+                                lambda: self._compute_performance_metrics(trainsets))
+        return dict(metrics)
+    def _compute_performance_metrics(self, trainsets):
         metrics = {}
+        store, rows, _ = resolve_fleet(trainsets)
+        n = len(rows)
         # Fitness metrics
-        metrics['fitness_compliance'] = round(sum(1 for t in trainsets if t['fitness']['overall_valid']) / len(trainsets) * 100, 1)
+        metrics['fitness_compliance'] = round(int(np.count_nonzero(store.column('fitness.overall_valid')[rows])) / n * 100, 1)
         # Maintenance metrics
-        metrics['maintenance_backlog'] = sum(t['job_cards']['open'] for t in trainsets)
+        metrics['maintenance_backlog'] = int(store.column('job_cards.open')[rows].sum())
         # Branding metrics
-        metrics['branding_compliance'] = round(sum(1 for t in trainsets if t['branding']['exposure_deficit'] == 0) / len(trainsets) * 100, 1)
+        metrics['branding_compliance'] = round(int(np.count_nonzero(store.column('branding.exposure_deficit')[rows] == 0)) / n * 100, 1)
         # Operational metrics
-        metrics['avg_reliability'] = round(sum(t['operational']['reliability_score'] for t in trainsets) / len(trainsets), 1)
+        metrics['avg_reliability'] = round(int(store.column('operational.reliability_score')[rows].sum()) / n, 1)
         # Economic metrics (simulated)
         metrics['estimated_savings'] = random.randint(5000, 20000)
         metrics['energy_efficiency'] = random.randint(85, 98)
         return metrics
     def generate_comprehensive_report(self, trainsets, metrics, alerts, report_type='daily_operations'):
-        """Generate comprehensive report for management"""
+        """Generate comprehensive report for management (memoized per report type and fleet version)"""
+        key = ('report', report_type, fleet_version(trainsets), self.optimization_history.total,
+               json.dumps(metrics, sort_keys=True, default=str), len(alerts or []))
+        return self.memo.get(key, lambda: self._build_report(trainsets, metrics, alerts, report_type))
+    def _build_report(self, trainsets, metrics, alerts, report_type):
         report = self.report_generator.generate_report(
             report_type, trainsets, metrics, alerts
         )
@@ -100,8 +227,9 @@ class SystemIntegrationManager:
         if report:
             report['system_performance'] = {
                 'last_optimization': self.last_optimization_time,
-                'total_optimizations': len(self.optimization_history),
+                'total_optimizations': self.optimization_history.total,
                 'ml_model_status': 'Trained' if self.ml_model.is_trained else 'Not Trained',
+                'ml_model_cached': self.ml_model.loaded_from_cache,
                 'data_sources_connected': {
                     source: status['connected'] 
                     for source, status in self.data_integrator.data_sources.items()
@@ -109,17 +237,10 @@ class SystemIntegrationManager:
             }
         return report
     def get_optimization_trends(self):
-        """Get historical optimization trends for analytics"""
+        """Get historical optimization trends for analytics (zero-copy views of the history columns)"""
         if not self.optimization_history:
             return None
-        trends = {
-            'timestamps': [record['timestamp'] for record in self.optimization_history],
-            'service_readiness': [record['metrics'].get('service_ready', 0) for record in self.optimization_history],
-            'fitness_compliance': [record['metrics'].get('fitness_compliance', 0) for record in self.optimization_history],
-            'alert_counts': [record['alert_count'] for record in self.optimization_history],
-            'processing_times': [record['metrics'].get('processing_time', 0) for record in self.optimization_history]
-        }
-        return trends
+        return self.optimization_history.trends()
     def simulate_operational_day(self, trainsets, constraints):
         """Simulate a full operational day with multiple optimizations"""
         results = []
@@ -127,6 +248,7 @@ class SystemIntegrationManager:
         morning_result = self.run_complete_optimization(trainsets, constraints)
         results.append(('morning', morning_result))
         # Mid-day check (12:00) - simulate some changes
+        self.ingest_telemetry()
         updated_trainsets, _ = self.data_integrator.connect_to_iot_sensors(trainsets)
         mid_day_result = self.run_complete_optimization(updated_trainsets, constraints)
         results.append(('mid_day', mid_day_result))
@@ -135,12 +257,105 @@ class SystemIntegrationManager:
         evening_result = self.run_complete_optimization(updated_trainsets, constraints)
         results.append(('evening', evening_result))
         return results
+    def record_override(self, trainset, status, reason):
+        """Apply a manual override (status None clears it) and log it"""
+        self.event_log.record_override(trainset, status, reason)
+        trainset['manual_override'] = status
+        trainset['override_reason'] = reason
+    def export_fleet_status(self, trainsets, fmt='csv', compression=None, columns=None):
+        """Fleet status streamed to a temporary file and opened for reading (the file is memoized per
+        fleet version; each call returns a new handle)"""
+        key = ('export', 'fleet_status', fleet_version(trainsets), fmt, compression or '', tuple(columns or ()))
+        return self._cached_export(key, lambda: fleet_chunks(trainsets, columns), fmt, compression)
+    def export_optimization_history(self, fmt='csv', compression=None, columns=None):
+        """One row per optimization run, streamed to a temporary file"""
+        key = ('export', 'optimization_history', self.optimization_history.total, fmt, compression or '',
+               tuple(columns or ()))
+        return self._cached_export(key, lambda: optimization_history_chunks(self.optimization_history, columns),
+                                   fmt, compression)
+    def _cached_export(self, key, chunks, fmt, compression):
+        if None in key:
+            return export_to_tempfile(chunks(), fmt, compression)
+        path = self.export_memo.get(key, lambda: export_to_named_file(chunks(), fmt, compression))
+        # Unbuffered, like export_to_tempfile, so st.download_button accepts it
+        return open(path, 'rb', buffering=0)
+    def export_alert_history(self, fmt='csv', compression=None, start=None, end=None, columns=None):
+        """Persisted alert history opened in [start, end), streamed to a temporary file"""
+        return export_to_tempfile(alert_history_chunks(self.alert_manager.history, start, end, columns), fmt, compression)
     def generate_timetable(self, trainsets, constraints):
         timetable_gen = TimetableGenerator()
         return timetable_gen.generate_timetable(trainsets, constraints)
+    def save_snapshot(self, trainsets=None, path=None):
+        """Save the fleet, trained model, optimization history and integrator state to a versioned
+        snapshot file (see snapshot.save_snapshot), by default self.snapshot_path; trainsets keeps the
+        caller's ordering of the fleet. Returns the snapshot size in bytes."""
+        if self.fleet is None:
+            raise ValueError("No fleet to snapshot; initialize the system first")
+        store, rows = attached_fleet(trainsets) if trainsets is not None else (None, None)
+        integrator = self.data_integrator
+        state = {
+            'rows': rows.tolist() if store is self.fleet else None,
+            'model': {'model': self.ml_model.model, 'scaler': self.ml_model.scaler,
+                      'is_trained': self.ml_model.is_trained, 'sklearn': sklearn.__version__},
+            'optimization_history': self.optimization_history,
+            'last_optimization_time': self.last_optimization_time,
+            'optimizer_weights': self.optimizer.weights,
+            'integrator': {
+                'data_sources': integrator.data_sources,
+                'dirty': integrator.dirty.fields,
+                'change_logs': [log.fields for log in integrator.change_logs],
+                'events': [event.to_dict() for event in integrator.events.history]
+            }
+        }
+        return save_snapshot(path or self.snapshot_path, self.fleet, state)
+    def restore_snapshot(self, path=None):
+        """Restore what save_snapshot wrote and return the fleet views. Everything is loaded before
+        anything is replaced, so a snapshot that fails to load leaves the running system as it was."""
+        fleet, state = load_snapshot(path or self.snapshot_path)
+        views = fleet.views(state['rows'])
+        by_id = {view['id']: view for view in views}
+        ml_model = PredictiveMaintenanceModel(cache=self.model_cache)
+        model = state['model']
+        if model['sklearn'] == sklearn.__version__:
+            ml_model.model, ml_model.scaler, ml_model.is_trained = model['model'], model['scaler'], model['is_trained']
+        else:
+            # Pickled estimators are not portable across scikit-learn versions
+            ml_model.train_model(views)
+        saved = state['integrator']
+        integrator = RealTimeDataIntegrator()
+        integrator.data_sources = saved['data_sources']
+        integrator.events.history.extend(ChangeEvent.from_dict(event) for event in saved['events'])
+        # Swap everything in at once
+        self.fleet = fleet
+        self.ml_model = ml_model
+        self.optimization_history = state['optimization_history']
+        self.last_optimization_time = state['last_optimization_time']
+        self.optimizer.weights = state['optimizer_weights']
+        self.memo.clear()
+        self.export_memo.clear()
+        self.data_integrator = integrator
+        self._start_telemetry(views)
+        self._track_integrator_changes()
+        for log, fields in zip([integrator.dirty] + integrator.change_logs, [saved['dirty']] + saved['change_logs']):
+            for trainset_id, changed in fields.items():
+                if trainset_id in by_id:
+                    log.record(by_id[trainset_id], changed)
+        return views
+    def restore_or_initialize(self, n_trainsets=25, path=None):
+        """Resume from the saved snapshot when there is a readable one, else initialize from scratch"""
+        path = path or self.snapshot_path
+        if os.path.exists(path):
+            try:
+                return self.restore_snapshot(path)
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError) as e:
+                print(f"Ignoring unreadable snapshot {path}: {e}")
+        return self.initialize_system(n_trainsets)
     def reset_system(self):
         """Reset the system to initial state"""
-        self.ml_model = PredictiveMaintenanceModel()
-        self.optimization_history = []
+        self.ml_model = PredictiveMaintenanceModel(cache=self.model_cache)
+        self.optimization_history = OptimizationHistory()
         self.last_optimization_time = None
-        self.data_integrator = RealTimeDataIntegrator()
\ No newline at end of file
+        self.memo.clear()
+        self.export_memo.clear()
+        self.data_integrator = RealTimeDataIntegrator()
+        self._track_integrator_changes()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import numpy as np
+from datetime import datetime
+from integrator import ChangeEvent
+
+# Sensor channels, in stream order within a trainset
+COMPONENTS = ['brake_pads', 'bogies', 'hvac']
+
+class TelemetryBuffer:
+    """
+    Preallocated ring buffers of the last `window` readings per (trainset, component) stream.
+    Batches are ingested with whole-array operations. Running sums (count, sum v, sum t, sum t^2,
+    sum t*v) are updated by adding new readings and subtracting the ones they overwrite, so mean
+    and least-squares slope are O(1) per reading; the window max is kept incrementally and rescanned
+    only for streams whose max was evicted. Memory is fixed at construction.
+    """
+    def __init__(self, trainset_ids, window=256, resync_every=1000):
+        self.trainset_ids = list(trainset_ids)
+        self.index = {tid: i for i, tid in enumerate(self.trainset_ids)}
+        self.window = window
+        self.resync_every = resync_every
+        streams = len(self.trainset_ids) * len(COMPONENTS)
+        self.values = np.zeros((streams, window))
+        self.times = np.zeros((streams, window))
+        self.valid = np.zeros((streams, window), dtype=bool)
+        self.head = np.zeros(streams, dtype=np.int64)
+        self.count = np.zeros(streams, dtype=np.int64)
+        self.sum_v = np.zeros(streams)
+        self.sum_t = np.zeros(streams)
+        self.sum_tt = np.zeros(streams)
+        self.sum_tv = np.zeros(streams)
+        self.max = np.full(streams, -np.inf)
+        self.last_time = np.full(streams, np.nan)
+        # Times are stored relative to t0 to keep the slope sums well conditioned
+        self.t0 = None
+        self.readings = 0
+        self.batches = 0
+    def ingest(self, trainset, component, timestamp, value):
+        """Add a batch of readings: trainset (row indices), component (indices into COMPONENTS),
+        timestamp (epoch seconds) and value arrays of equal length"""
+        trainset = np.asarray(trainset, dtype=np.int64)
+        stream = trainset * len(COMPONENTS) + np.asarray(component, dtype=np.int64)
+        timestamp = np.asarray(timestamp, dtype=float)
+        value = np.asarray(value, dtype=float)
+        if not len(stream):
+            return 0
+        if self.t0 is None:
+            self.t0 = float(timestamp.min())
+        n_streams, window = len(self.head), self.window
+        # Group by stream, oldest first, and keep at most `window` newest readings per stream
+        order = np.lexsort((timestamp, stream))
+        stream, timestamp, value = stream[order], timestamp[order] - self.t0, value[order]
+        per_stream = np.bincount(stream, minlength=n_streams)
+        starts = np.cumsum(per_stream) - per_stream
+        rank = np.arange(len(stream)) - starts[stream]
+        skipped = np.maximum(per_stream - window, 0)
+        keep = rank >= skipped[stream]
+        if not keep.all():
+            stream, timestamp, value, rank = stream[keep], timestamp[keep], value[keep], rank[keep]
+        rank -= skipped[stream]
+        position = (self.head[stream] + rank) % window
+        # Subtract the readings about to be overwritten
+        evicted = self.valid[stream, position]
+        old_v, old_t = self.values[stream, position], self.times[stream, position]
+        ev_stream = stream[evicted]
+        ev_v, ev_t = old_v[evicted], old_t[evicted]
+        self._accumulate(ev_stream, ev_t, ev_v, -1.0)
+        # Window max: streams that lose their max are rescanned after the write
+        lost_max = np.unique(ev_stream[ev_v >= self.max[ev_stream]])
+        self.values[stream, position] = value
+        self.times[stream, position] = timestamp
+        self.valid[stream, position] = True
+        self._accumulate(stream, timestamp, value, 1.0)
+        touched = np.flatnonzero(np.bincount(stream, minlength=n_streams))
+        group_starts = np.searchsorted(stream, touched)
+        np.maximum.at(self.max, touched, np.maximum.reduceat(value, group_starts))
+        if len(lost_max):
+            self.max[lost_max] = np.where(self.valid[lost_max], self.values[lost_max], -np.inf).max(axis=1)
+        kept = np.minimum(per_stream, window)
+        self.head = (self.head + kept) % window
+        self.last_time[touched] = timestamp[np.searchsorted(stream, touched, side='right') - 1] + self.t0
+        self.readings += len(order)
+        self.batches += 1
+        if self.batches % self.resync_every == 0:
+            self.resync()
+        return len(order)
+    def _accumulate(self, stream, t, v, sign):
+        n = len(self.head)
+        self.count += (sign * np.bincount(stream, minlength=n)).astype(np.int64)
+        self.sum_v += sign * np.bincount(stream, weights=v, minlength=n)
+        self.sum_t += sign * np.bincount(stream, weights=t, minlength=n)
+        self.sum_tt += sign * np.bincount(stream, weights=t * t, minlength=n)
+        self.sum_tv += sign * np.bincount(stream, weights=t * v, minlength=n)
+    def resync(self):
+        """Recompute the running sums exactly from the ring, re-basing times on the oldest reading"""
+        if self.valid.any():
+            shift = self.times[self.valid].min()
+            self.times[self.valid] -= shift
+            self.t0 += shift
+        values = np.where(self.valid, self.values, 0.0)
+        times = np.where(self.valid, self.times, 0.0)
+        self.count = self.valid.sum(axis=1)
+        self.sum_v = values.sum(axis=1)
+        self.sum_t = times.sum(axis=1)
+        self.sum_tt = (times * times).sum(axis=1)
+        self.sum_tv = (times * values).sum(axis=1)
+        self.max = np.where(self.valid, self.values, -np.inf).max(axis=1)
+    def stats(self):
+        """Rolling window statistics as (trainsets x components) arrays: count, mean, max and
+        slope (value units per hour); NaN where a stream has no readings"""
+        shape = (len(self.trainset_ids), len(COMPONENTS))
+        count = self.count.astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum_v / count
+            denominator = count * self.sum_tt - self.sum_t ** 2
+            slope = np.where(denominator > 1e-9, (count * self.sum_tv - self.sum_t * self.sum_v) / denominator * 3600, 0.0)
+        slope[count < 2] = np.nan
+        maximum = np.where(self.count > 0, self.max, np.nan)
+        return {'count': self.count.reshape(shape), 'mean': mean.reshape(shape), 'max': maximum.reshape(shape),
+                'slope': slope.reshape(shape)}
+    def wear_events(self, trainsets, min_change=0.05, timestamp=None):
+        """ChangeEvents moving component_wear to the rolling mean for streams with readings"""
+        timestamp = timestamp or datetime.now()
+        mean = self.stats()['mean']
+        events = []
+        for trainset in trainsets:
+            row = self.index.get(trainset['id'])
+            if row is None:
+                continue
+            wear = trainset['mileage']['component_wear']
+            for c, component in enumerate(COMPONENTS):
+                level = mean[row, c]
+                if np.isfinite(level):
+                    level = round(min(100.0, max(0.0, float(level))), 2)
+                    if abs(level - wear[component]) >= min_change:
+                        events.append(ChangeEvent(trainset['id'], f'mileage.component_wear.{component}', wear[component],
+                                                  level, 'telemetry', timestamp))
+        return events
+
+class SyntheticTelemetry:
+    """
+    Synthetic brake, bogie and HVAC wear readings for a fleet: each stream starts at the trainset's
+    current wear, drifts upward at its own rate and carries Gaussian sensor noise.
+    """
+    def __init__(self, trainsets, rate_hz=10.0, noise=0.5, drift_per_hour=(0.05, 0.5), seed=None, start=None):
+        self.rng = np.random.default_rng(seed)
+        self.rate_hz = rate_hz
+        self.noise = noise
+        self.base = np.array([[t['mileage']['component_wear'][c] for c in COMPONENTS] for t in trainsets], dtype=float)
+        self.drift = self.rng.uniform(*drift_per_hour, self.base.shape) / 3600
+        self.clock = datetime.now().timestamp() if start is None else start
+        self.elapsed = 0.0
+    def batch(self, seconds=1.0):
+        """Readings for the next `seconds` of operation, time-ordered:
+        (trainset index, component index, timestamp, value) arrays"""
+        n_trains, n_components = self.base.shape
+        steps = max(1, int(round(seconds * self.rate_hz)))
+        offsets = self.elapsed + (np.arange(steps) + 1) / self.rate_hz
+        self.elapsed = offsets[-1]
+        # Every stream reports at every step (shape: steps x trains x components)
+        level = self.base[None, :, :] + self.drift[None, :, :] * offsets[:, None, None]
+        value = np.clip(level + self.rng.normal(0, self.noise, level.shape), 0, 100)
+        trainset = np.broadcast_to(np.arange(n_trains)[None, :, None], level.shape)
+        component = np.broadcast_to(np.arange(n_components)[None, None, :], level.shape)
+        timestamp = np.broadcast_to(self.clock + offsets[:, None, None], level.shape)
+        return trainset.ravel(), component.ravel(), timestamp.ravel(), value.ravel()
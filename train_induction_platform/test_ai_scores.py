@@ -0,0 +1,30 @@
+import numpy as np
+from fleet_store import FleetStore
+from utils import calculate_ai_score, calculate_ai_scores, score_reasons
+
+def test_batch_scores_match_per_trainset_scores(make_fleet):
+    trainsets = make_fleet(200, seed=7)
+    # Cover the edges of every rule, not only what the simulator happens to produce
+    trainsets[0]['fitness']['overall_valid'] = False
+    trainsets[1]['job_cards']['open'] = 9
+    trainsets[2]['mileage']['component_wear'] = {'brake_pads': 95, 'bogies': 90, 'hvac': 80}
+    trainsets[3]['cleaning']['exterior_status'] = 'Dirty'
+    trainsets[4]['branding']['exposure_deficit'] = 11
+    trainsets[5]['operational']['reliability_score'] = 41
+    scores, reason_bits = calculate_ai_scores(trainsets)
+    for trainset, score, bits in zip(trainsets, scores.tolist(), reason_bits.tolist()):
+        expected_score, expected_reasons = calculate_ai_score(trainset)
+        assert score == expected_score
+        assert score_reasons(trainset, bits) == expected_reasons
+
+def test_batch_scores_from_fleet_views_match_dicts(make_fleet):
+    trainsets = make_fleet(200, seed=7)
+    views = FleetStore.from_trainsets(trainsets).views()
+    dict_scores, dict_bits = calculate_ai_scores(trainsets)
+    view_scores, view_bits = calculate_ai_scores(views)
+    np.testing.assert_array_equal(view_scores, dict_scores)
+    np.testing.assert_array_equal(view_bits, dict_bits)
+
+def test_empty_fleet():
+    scores, reason_bits = calculate_ai_scores([])
+    assert len(scores) == 0 and len(reason_bits) == 0
@@ -0,0 +1,50 @@
+import os
+from datetime import datetime, timedelta
+import pytest
+import system_manager
+from alerts import AlertManager, DEFAULT_ALERT_RULES, alert_id
+from alert_history import AlertHistory
+
+def _deficient(trainsets):
+    for trainset in trainsets:
+        trainset['branding']['exposure_deficit'] = 20
+    return trainsets
+
+def _manager(path):
+    manager = AlertManager(rules={'branding_deficit': DEFAULT_ALERT_RULES['branding_deficit']})
+    manager.attach_history(AlertHistory(str(path)))
+    return manager
+
+def test_lifecycle_is_persisted_and_restored(tmp_path, make_fleet):
+    path = tmp_path / 'alerts.sqlite3'
+    trainsets = _deficient(make_fleet(6, seed=4))
+    manager = _manager(path)
+    start = datetime.now() - timedelta(seconds=1)
+    manager.check_alerts(trainsets)
+    first = alert_id('branding_deficit', trainsets[0]['id'])
+    manager.acknowledge(first)
+    trainsets[1]['branding']['exposure_deficit'] = 0
+    manager.check_alerts(trainsets)
+    history = manager.history
+    assert history.count() == len(trainsets)
+    assert {record['status'] for record in history.last_for_trainset(trainsets[1]['id'])} == {'resolved'}
+    assert len(history.open_alerts()) == len(trainsets) - 1
+    assert sum(count for _, _, count in history.hourly_counts(start)) == len(trainsets)
+    # A new manager on the same history picks up the open alerts, acknowledgement included
+    restored = _manager(path)
+    assert set(restored.active) == {alert_id('branding_deficit', t['id']) for t in trainsets[:1] + trainsets[2:]}
+    assert restored.active[first]['status'] == 'acknowledged'
+
+def test_sessions_do_not_share_alerts(tmp_path, monkeypatch, make_fleet):
+    monkeypatch.setattr(system_manager, 'DATA_ROOT', str(tmp_path))
+    first = _manager(os.path.join(system_manager.session_data_dir('first'), 'alerts.sqlite3'))
+    first.check_alerts(_deficient(make_fleet(6, seed=4)))
+    assert first.active
+    second = _manager(os.path.join(system_manager.session_data_dir('second'), 'alerts.sqlite3'))
+    assert second.active == {}
+    assert second.history.count() == 0
+
+@pytest.mark.parametrize('session_id', ['', '../other', 'a/b', None, 'x' * 65])
+def test_invalid_session_ids_are_rejected(session_id):
+    with pytest.raises(ValueError):
+        system_manager.session_data_dir(session_id)
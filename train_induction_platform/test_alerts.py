@@ -0,0 +1,86 @@
+import random
+from datetime import timedelta
+import numpy as np
+import pytest
+from fleet_store import FleetStore
+from alerts import AlertManager, AlertRule, DEFAULT_ALERT_RULES, COMPARATORS, alert_id
+
+def _naive_trips(rule, trainset):
+    values = []
+    for field in rule.fields:
+        value = trainset
+        for key in field.split('.'):
+            value = value[key]
+        values.append(value)
+    value = values[0] if len(values) == 1 else {'mean': np.mean, 'max': max, 'min': min, 'sum': sum}[rule.aggregate](values)
+    return bool(COMPARATORS[rule.comparator](value, rule.threshold))
+
+@pytest.mark.parametrize('attached', [False, True])
+def test_compiled_rules_match_per_trainset_evaluation(attached, make_fleet):
+    trainsets = make_fleet(40, seed=2)
+    for trainset in trainsets[:10]:
+        trainset['fitness']['days_until_expiry'] = random.randint(0, 4)
+        trainset['branding']['exposure_deficit'] = random.randint(13, 17)
+    if attached:
+        trainsets = FleetStore.from_trainsets(trainsets).views()
+    manager = AlertManager()
+    alerts = manager.check_alerts(trainsets)
+    raised = {alert['id'] for alert in alerts}
+    for name, spec in DEFAULT_ALERT_RULES.items():
+        rule = AlertRule(name, spec)
+        if rule.scope != 'trainset':
+            continue
+        expected = {f"{name}:{t['id']}" for t in trainsets if _naive_trips(rule, t)}
+        assert {aid for aid in raised if aid.startswith(name + ':')} == expected
+
+@pytest.mark.parametrize('spec, message', [
+    ({'field': 'job_cards.open', 'comparator': '=>', 'threshold': 1}, 'comparator'),
+    ({'field': ['job_cards.open', 'job_cards.estimated_hours'], 'comparator': '>', 'threshold': 1}, 'aggregate'),
+    ({'scope': 'depot', 'field': 'job_cards.open', 'comparator': '>', 'threshold': 1}, 'scope'),
+])
+def test_invalid_rules_are_rejected(spec, message):
+    spec = dict(spec, priority='Low', message='{trainset_id}')
+    with pytest.raises(ValueError, match=message):
+        AlertManager().add_rule('bad', spec)
+
+def _single_rule_manager(**options):
+    return AlertManager(rules={'branding_deficit': DEFAULT_ALERT_RULES['branding_deficit']}, **options)
+
+def test_hysteresis_keeps_an_alert_open_inside_the_band(make_fleet):
+    trainsets = make_fleet(5, seed=2)
+    for trainset in trainsets:
+        trainset['branding']['exposure_deficit'] = 0
+    manager = _single_rule_manager()
+    deficit = trainsets[0]['branding']
+    # Threshold 15, hysteresis 2: opens at 15, holds down to 13, resolves below
+    for value, expected_open, event in [(14, False, None), (15, True, 'opened'), (13, True, None),
+                                        (15, True, None), (12, False, 'resolved'), (14, False, None)]:
+        deficit['exposure_deficit'] = value
+        alerts = manager.check_alerts(trainsets)
+        assert bool(alerts) == expected_open, value
+        assert [n['event'] for n in manager.notifications] == ([event] if event else []), value
+
+def test_acknowledged_alerts_are_not_renotified(make_fleet):
+    trainsets = make_fleet(5, seed=2)
+    for trainset in trainsets:
+        trainset['branding']['exposure_deficit'] = 20
+    manager = _single_rule_manager(renotify_interval=timedelta(0))
+    manager.check_alerts(trainsets)
+    manager.acknowledge(alert_id('branding_deficit', trainsets[0]['id']))
+    manager.check_alerts(trainsets)
+    renotified = {n['trainset_id'] for n in manager.notifications if n['event'] == 'renotify'}
+    assert renotified == {t['id'] for t in trainsets[1:]}
+
+def test_alert_storms_are_grouped(make_fleet):
+    trainsets = make_fleet(12, seed=2)
+    for trainset in trainsets:
+        trainset['branding']['exposure_deficit'] = 20
+    manager = _single_rule_manager(storm_threshold=5)
+    alerts = manager.check_alerts(trainsets)
+    assert len(alerts) == 12
+    summary, = manager.notifications
+    assert summary['event'] == 'opened' and summary['count'] == 12
+    assert sorted(summary['trainset_ids']) == sorted(t['id'] for t in trainsets)
+    # A rerun with nothing changed notifies nothing
+    manager.check_alerts(trainsets)
+    assert manager.notifications == []
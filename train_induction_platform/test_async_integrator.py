@@ -0,0 +1,58 @@
+import time
+import pytest
+from fleet_store import FleetStore
+from async_integrator import AsyncDataIntegrator, start_stub_servers, _get_path
+
+@pytest.fixture
+def servers():
+    # Maximo answers long after its timeout; the other sources are quick
+    servers = start_stub_servers({'maximo': 1.5, 'iot_sensors': 0.05, 'fitness_certs': 0.05}, seed=1)
+    yield servers
+    for server in servers.values():
+        server.stop()
+
+@pytest.mark.parametrize('attached', [False, True])
+def test_timed_out_source_is_flagged_while_the_others_apply(servers, make_fleet, attached):
+    trainsets = make_fleet(30, seed=10)
+    if attached:
+        trainsets = FleetStore.from_trainsets(trainsets).views()
+    integrator = AsyncDataIntegrator({source: server.url for source, server in servers.items()},
+                                     timeouts={'maximo': 0.3})
+    answered = []
+    try:
+        start = time.perf_counter()
+        trainsets, updates = integrator.refresh_all_data(
+            trainsets, on_source=lambda source, count, elapsed: answered.append(source))
+        elapsed = time.perf_counter() - start
+    finally:
+        integrator.close()
+    # Sources are fetched concurrently: the refresh ends at the Maximo timeout, not after its answer
+    assert elapsed < 1.0
+    assert sorted(answered) == ['fitness_certs', 'iot_sensors']
+    sources = integrator.data_sources
+    assert not sources['maximo']['connected'] and 'timed out' in sources['maximo']['error']
+    for source in ('iot_sensors', 'fitness_certs'):
+        assert sources[source]['connected'] and sources[source]['error'] is None
+    events = list(integrator.events.history)
+    assert events and {event.source for event in events} <= {'iot_sensors', 'fitness_certs'}
+    assert updates > 0
+    # Every applied event is reflected in the fleet (the last event per field wins)
+    by_id = {t['id']: t for t in trainsets}
+    latest = {(event.trainset_id, event.path): event.new for event in events}
+    for (trainset_id, path), value in latest.items():
+        assert _get_path(by_id[trainset_id], path) == value
+
+def test_unreachable_source_is_flagged(servers, make_fleet):
+    trainsets = make_fleet(10, seed=10)
+    servers['fitness_certs'].stop()
+    endpoints = {source: server.url for source, server in servers.items() if source != 'maximo'}
+    integrator = AsyncDataIntegrator(endpoints)
+    try:
+        integrator.refresh_all_data(trainsets)
+    finally:
+        integrator.close()
+    assert not integrator.data_sources['fitness_certs']['connected']
+    assert integrator.data_sources['fitness_certs']['error']
+    assert integrator.data_sources['iot_sensors']['connected']
+    # Sources without an endpoint are not polled at all
+    assert integrator.data_sources['maximo'] == {'connected': False, 'last_update': None}
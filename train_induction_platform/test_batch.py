@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from batch import read_fleet_csv, run_scenario, run_batch, load_scenario
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FLEET_CSV = os.path.join(HERE, 'trainsets_ml_ready.csv')
+
+def test_underscore_csv_columns_map_to_fleet_fields():
+    df = pd.read_csv(FLEET_CSV)
+    trainsets = read_fleet_csv(FLEET_CSV).to_trainsets()
+    assert len(trainsets) == len(df)
+    for trainset, (_, row) in zip(trainsets, df.iterrows()):
+        assert trainset['id'] == row['trainset_id']
+        assert trainset['depot'] == row['depot']
+        assert trainset['branding']['hours_required_today'] == row['branding_hours_required']
+        assert trainset['mileage']['component_wear'] == {'brake_pads': row['mileage_brake_wear'],
+                                                        'bogies': row['mileage_bogie_wear'],
+                                                        'hvac': row['mileage_hvac_wear']}
+        assert trainset['job_cards']['open'] == row['job_cards_open']
+        # Day counts become dates relative to the row's timestamp
+        timestamp = datetime.fromisoformat(row['timestamp'])
+        assert trainset['operational']['last_service'] == timestamp - timedelta(days=int(row['operational_days_since_service']))
+        assert trainset['cleaning']['last_cleaned'] == timestamp - timedelta(days=int(row['cleaning_days_since_clean']))
+        assert trainset['fitness']['expires_at'] == datetime.fromisoformat(row['fitness_expires_at'])
+        assert trainset['fitness']['overall_valid'] == bool(row['fitness_rolling_stock'] and row['fitness_signalling']
+                                                            and row['fitness_telecom'])
+        # Integer fields are rounded, not truncated
+        assert trainset['ai_score'] == round(row['ai_score'])
+
+def test_dotted_columns_and_derived_scores(tmp_path):
+    path = tmp_path / 'fleet.csv'
+    path.write_text('id,depot,fitness.rolling_stock,fitness.signalling,fitness.telecom,job_cards.open\n'
+                    'T1,Aluva Depot,true,true,true,1\n'
+                    'T2,Petta Depot,true,no,true,\n')
+    first, second = read_fleet_csv(str(path)).views()
+    assert first['fitness']['overall_valid'] and not second['fitness']['overall_valid']
+    # Missing numbers take the schema default; AI scores are computed when the file has none
+    assert second['job_cards']['open'] == 0
+    assert 0 <= first['ai_score'] <= 100 and first['score_reasons']
+
+def test_csv_without_ids_is_rejected(tmp_path):
+    path = tmp_path / 'fleet.csv'
+    path.write_text('depot\nAluva Depot\n')
+    with pytest.raises(ValueError, match='trainset id'):
+        read_fleet_csv(str(path))
+
+def test_run_scenario_on_the_sample_fleet(tmp_path, isolated_model_cache):
+    scenario = {'name': 'sample', 'fleet': FLEET_CSV, 'seed': 3,
+                'constraints': {'service_target': 12, 'max_ibl': 4}}
+    summary = run_scenario(scenario, str(tmp_path), fmt='jsonl')
+    assert summary['status'] == 'ok' and summary['trainsets'] == 25
+    metrics = summary['metrics']
+    assert metrics['service_ready'] <= 12 and metrics['ibl_maintenance'] <= 4
+    assert 'optimize' in summary['stage_timings']
+    assignments = pd.read_json(summary['outputs']['assignments'], lines=True)
+    assert sorted(assignments['Trainset']) == sorted(pd.read_csv(FLEET_CSV)['trainset_id'])
+    assert (assignments['Recommendation'] == 'Service').sum() == metrics['service_ready']
+    assert len(pd.read_json(summary['outputs']['maintenance'], lines=True)) == 25
+    assert os.path.getsize(summary['outputs']['timetable']) > 0
+    with open(summary['outputs']['reports']) as f:
+        assert set(json.load(f)) == {'daily_operations', 'maintenance_plan', 'branding_compliance',
+                                     'optimization_summary'}
+    with open(tmp_path / 'sample' / 'summary.json') as f:
+        assert json.load(f)['name'] == 'sample'
+
+def test_failed_scenarios_are_reported(tmp_path, isolated_model_cache):
+    scenario_path = tmp_path / 'broken.json'
+    scenario_path.write_text(json.dumps({'fleet': 'missing.csv'}))
+    scenario = load_scenario(str(scenario_path))
+    assert scenario['name'] == 'broken' and scenario['fleet'] == str(tmp_path / 'missing.csv')
+    summary, = run_batch([scenario], str(tmp_path / 'runs'), fmt='csv', workers=1)
+    assert summary['status'] == 'failed' and 'FileNotFoundError' in summary['error']
+    with open(tmp_path / 'runs' / 'batch_summary.json') as f:
+        assert json.load(f)['scenarios'][0]['status'] == 'failed'
+    with pytest.raises(ValueError, match='unique'):
+        run_batch([scenario, scenario], str(tmp_path / 'runs'))
@@ -0,0 +1,68 @@
+import multiprocessing
+from datetime import datetime
+from fleet_store import FleetStore
+from integrator import RealTimeDataIntegrator, ChangeEvent
+from event_log import FleetEventLog, EVENT_UPDATE
+
+def test_append_and_replay_round_trip(tmp_path, make_fleet):
+    fleet = FleetStore.from_trainsets(make_fleet(30, seed=11))
+    log = FleetEventLog(str(tmp_path), initial_capacity=8)
+    log.snapshot(fleet)
+    initial = FleetStore.from_trainsets(fleet.to_trainsets())
+    integrator = RealTimeDataIntegrator()
+    integrator.subscribe(log.record_updates)
+    trainsets = fleet.views()
+    for _ in range(5):
+        trainsets, _ = integrator.refresh_all_data(trainsets)
+    assert len(log) == len(integrator.events.history)
+    # Logged events decode to exactly what the integrator applied
+    assert [event for _, event in log.events()] == list(integrator.events.history)
+    # Replaying them onto the starting fleet reproduces the current one
+    log.replay_into(initial, 0, len(log))
+    assert initial.to_trainsets() == fleet.to_trainsets()
+    assert log.state_at().to_trainsets() == fleet.to_trainsets()
+    log.close()
+    # Everything is durable: a new instance reads the same log
+    reopened = FleetEventLog(str(tmp_path))
+    assert [event for _, event in reopened.events()] == list(integrator.events.history)
+
+def _writer_events(writer, count):
+    timestamp = datetime(2026, 1, 1)
+    return [ChangeEvent(f'W{writer}-{i}', f'field.{writer}.{i % 7}', None, f'value-{writer}-{i}', f'source-{writer}',
+                        timestamp) for i in range(count)]
+
+def _write(directory, writer, batches):
+    log = FleetEventLog(directory, initial_capacity=4)
+    for batch in range(batches):
+        log.append(_writer_events(writer, 40)[batch::batches], EVENT_UPDATE)
+    log.close()
+
+def _assert_writers_consistent(log, writers, count):
+    events = [event for _, event in log.events()]
+    assert len(events) == writers * count
+    for event in events:
+        writer = event.trainset_id.split('-')[0][1:]
+        index = event.trainset_id.split('-')[1]
+        assert event.path.split('.')[1] == writer
+        assert event.new == f'value-{writer}-{index}'
+        assert event.source == f'source-{writer}'
+
+def test_two_instances_on_one_directory_share_the_string_table(tmp_path):
+    first = FleetEventLog(str(tmp_path), initial_capacity=4)
+    second = FleetEventLog(str(tmp_path), initial_capacity=4)
+    # Interleaved appends, each adding strings the other instance has not seen
+    for batch in range(8):
+        first.append(_writer_events(1, 40)[batch::8])
+        second.append(_writer_events(2, 40)[batch::8])
+    for log in (first, second, FleetEventLog(str(tmp_path))):
+        _assert_writers_consistent(log, 2, 40)
+
+def test_concurrent_writer_processes(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    writers = [context.Process(target=_write, args=(str(tmp_path), writer, 20)) for writer in range(3)]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(60)
+        assert process.exitcode == 0
+    _assert_writers_consistent(FleetEventLog(str(tmp_path)), 3, 40)
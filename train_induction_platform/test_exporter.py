@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from fleet_store import FleetStore
+from exporter import (export_to_tempfile, export_to_named_file, fleet_chunks, frame_chunks, records_chunks,
+                      write_export, FLEET_STATUS_COLUMNS, HAS_PARQUET)
+
+CASES = [('csv', None), ('csv', 'gzip'), ('csv', 'bz2'), ('jsonl', None), ('jsonl', 'xz'),
+         pytest.param('parquet', None, marks=pytest.mark.skipif(not HAS_PARQUET, reason='pyarrow not installed')),
+         pytest.param('parquet', 'zstd', marks=pytest.mark.skipif(not HAS_PARQUET, reason='pyarrow not installed')),
+         pytest.param('parquet', 'none', marks=pytest.mark.skipif(not HAS_PARQUET, reason='pyarrow not installed'))]
+
+def _read_back(export, fmt, compression):
+    if fmt == 'parquet':
+        return pd.read_parquet(export)
+    if fmt == 'csv':
+        return pd.read_csv(export, compression=compression)
+    return pd.read_json(export, lines=True, compression=compression)
+
+def _expected_fleet_status(trainsets, columns):
+    return pd.DataFrame({name: [_field(t, FLEET_STATUS_COLUMNS.get(name, name)) for t in trainsets] for name in columns})
+
+def _field(trainset, path):
+    value = trainset
+    for key in path.split('.'):
+        value = value[key]
+    return value
+
+@pytest.mark.parametrize('fmt, compression', CASES)
+@pytest.mark.parametrize('columns', [None, ['Trainset', 'Open_Jobs', 'mileage.total_km']])
+@pytest.mark.parametrize('attached', [False, True])
+def test_fleet_status_round_trip(make_fleet, fmt, compression, columns, attached):
+    trainsets = make_fleet(23, seed=4)
+    if attached:
+        trainsets = FleetStore.from_trainsets(trainsets).views()
+    # Chunks smaller than the fleet, so the header and schema come from the first chunk only
+    export = export_to_tempfile(fleet_chunks(trainsets, columns, chunk_size=5), fmt, compression)
+    expected = _expected_fleet_status(trainsets, columns or list(FLEET_STATUS_COLUMNS))
+    pd.testing.assert_frame_equal(_read_back(export, fmt, compression), expected, check_dtype=False)
+
+@pytest.mark.parametrize('fmt, compression', CASES)
+def test_named_file_round_trip(tmp_path, fmt, compression):
+    start = datetime(2026, 4, 1, 6, 30)
+    frame = pd.DataFrame({'trainset_id': [f'KMRL-{i:03d}' for i in range(12)],
+                          'risk_score': [i * 7.5 for i in range(12)],
+                          'due': [start + timedelta(hours=i) for i in range(12)]})
+    path = export_to_named_file(frame_chunks(frame, ['trainset_id', 'risk_score'], chunk_size=5), fmt, compression,
+                                directory=str(tmp_path))
+    with open(path, 'rb') as export:
+        pd.testing.assert_frame_equal(_read_back(export, fmt, compression), frame[['trainset_id', 'risk_score']])
+
+def test_records_and_empty_exports(tmp_path):
+    records = ({'advertiser': f'A{i}', 'trains_count': i} for i in range(25))
+    path = tmp_path / 'records.csv'
+    assert write_export(records_chunks(records, chunk_size=10), str(path)) == 25
+    assert pd.read_csv(path)['trains_count'].tolist() == list(range(25))
+    assert write_export(iter(()), str(tmp_path / 'empty.jsonl'), 'jsonl') == 0
+    assert (tmp_path / 'empty.jsonl').read_bytes() == b''
+
+@pytest.mark.parametrize('fmt, compression', [('xml', None), ('csv', 'zip'), ('jsonl', 'snappy')])
+def test_invalid_options_are_rejected(fmt, compression):
+    with pytest.raises(ValueError):
+        export_to_tempfile(iter(()), fmt, compression)
+
+def test_unknown_columns_are_rejected():
+    with pytest.raises(KeyError):
+        list(fleet_chunks([], ['Nope']))
@@ -0,0 +1,65 @@
+import copy
+import numpy as np
+import pytest
+from fleet_store import FleetStore, fleet_columns, assign_field
+
+def test_round_trip_matches_the_dicts(make_fleet):
+    trainsets = make_fleet(25, seed=5)
+    trainsets[0]['custom_note'] = 'kept outside the schema'
+    store = FleetStore.from_trainsets(copy.deepcopy(trainsets))
+    materialized = store.to_trainsets()
+    # score_reasons is derived from the reason bits on read
+    assert all(t.pop('score_reasons') for t in materialized)
+    assert materialized == trainsets
+    # Views read like the dicts they replace
+    for view, trainset in zip(store.views(), trainsets):
+        assert view['id'] == trainset['id'] and view['fitness'] == trainset['fitness']
+        assert view['job_cards']['open'] == trainset['job_cards']['open']
+        assert dict(view['branding']) == trainset['branding']
+
+def test_view_writes_and_columns_agree(make_fleet):
+    trainsets = make_fleet(25, seed=5)
+    store = FleetStore.from_trainsets(trainsets)
+    views = store.views()
+    version = store.version
+    views[3]['job_cards']['open'] = 17
+    views[4]['depot'] = 'New Depot'
+    assert store.version > version
+    assert store.column('job_cards.open')[3] == 17
+    assert store.decoded('depot')[4] == 'New Depot'
+    store.set_column('mileage.total_km', np.arange(len(store)) * 10.0)
+    assert [view['mileage']['total_km'] for view in views] == [i * 10.0 for i in range(len(store))]
+    # Helpers work the same on plain dicts and on views
+    expected = [t['job_cards']['open'] for t in store.to_trainsets()]
+    assert fleet_columns(views, ['job_cards.open'])['job_cards.open'].tolist() == expected
+    plain = store.to_trainsets()
+    assign_field(plain, 'ai_score', np.arange(len(plain)))
+    assign_field(views, 'ai_score', np.arange(len(views)))
+    assert store.to_trainsets() == plain
+
+def test_optional_fields_are_absent_until_set(make_fleet):
+    store = FleetStore.from_trainsets(make_fleet(5, seed=5))
+    view = store[0]
+    assert 'optimization_score' not in view
+    with pytest.raises(KeyError):
+        view['optimization_score']
+    view['optimization_score'] = 71.5
+    assert view['optimization_score'] == 71.5 and 'optimization_score' not in store[1]
+    del view['optimization_score']
+    assert 'optimization_score' not in view
+
+def test_extend_keeps_rows_and_block_staleness(make_fleet):
+    trainsets = make_fleet(30, seed=5)
+    store = FleetStore.from_trainsets(trainsets[:20])
+    store.block('scores', 2, sources=['job_cards.open'])
+    store.refresh_block('scores', np.arange(20), np.ones((20, 2)))
+    added = store.extend(trainsets[20:])
+    assert len(store) == 30 and len(added) == 10
+    assert [view['id'] for view in store] == [t['id'] for t in trainsets]
+    assert [view['mileage'] for view in added] == [t['mileage'] for t in trainsets[20:]]
+    assert store.block('scores').shape == (30, 2)
+    assert store.block_stale('scores').tolist() == [False] * 20 + [True] * 10
+    store[2]['job_cards']['open'] += 1
+    assert store.block_stale('scores')[2]
+    store[3]['mileage']['total_km'] += 1
+    assert not store.block_stale('scores')[3]
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+import numpy as np
+from history import OptimizationHistory
+
+START = datetime(2026, 3, 1)
+
+def _record(i):
+    return {'timestamp': START + timedelta(minutes=20 * i), 'alert_count': i % 4,
+            'metrics': {'service_ready': i, 'fitness_compliance': 90 + i % 10, 'processing_time': 0.5},
+            'stage_timings': {'optimize': i / 10}}
+
+def test_window_keeps_the_latest_runs_in_order():
+    history = OptimizationHistory(capacity=8, detail=3)
+    for i in range(21):
+        history.append(_record(i))
+    assert len(history) == 8 and history.total == 21
+    trends = history.trends()
+    assert trends['service_readiness'].tolist() == list(range(13, 21))
+    assert trends['alert_counts'].tolist() == [i % 4 for i in range(13, 21)]
+    assert trends['stage_timings']['optimize'].tolist() == [i / 10 for i in range(13, 21)]
+    assert not trends['service_readiness'].flags.writeable
+    assert history.frame(2, 4)['service_ready'].tolist() == [15, 16]
+    assert [record['metrics']['service_ready'] for record in history.recent] == [18, 19, 20]
+    assert history.last()['metrics']['service_ready'] == 20
+
+def test_evicted_runs_are_rolled_up():
+    history = OptimizationHistory(capacity=4)
+    for i in range(10):
+        history.append(_record(i))
+    # Runs 0-5 left the window: 20-minute spacing puts 0-2 in the first hour and 3-5 in the second
+    hourly = history.rollup('hourly')
+    assert hourly['runs'].tolist() == [3, 3]
+    assert hourly['service_ready_mean'].tolist() == [1.0, 4.0]
+    assert hourly['service_ready_min'].tolist() == [0, 3]
+    assert hourly['service_ready_max'].tolist() == [2, 5]
+    daily = history.rollup('daily')
+    assert daily['runs'].tolist() == [6]
+    assert np.isclose(daily['stage.optimize_mean'][0], 0.25)
+
+def test_stage_timings_attach_to_the_latest_run():
+    history = OptimizationHistory(capacity=4)
+    history.set_stage_timings({'report': 1.0})
+    record = _record(0)
+    del record['stage_timings']
+    history.append(record)
+    history.set_stage_timings({'report': 0.2})
+    assert history.stages() == ['report']
+    assert history.view('stage.report').tolist() == [0.2]
+    assert history.last()['stage_timings'] == {'report': 0.2}
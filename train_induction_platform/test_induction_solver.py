@@ -0,0 +1,79 @@
+import itertools
+import time
+import numpy as np
+import pytest
+from induction_solver import InductionSolver, HAS_MILP, SERVICE, STANDBY, IBL, _plan_value
+
+def _random_model(rng, n, max_moves=None):
+    return {
+        'value_service': rng.uniform(-0.2, 2.0, n),
+        'value_ibl': rng.uniform(-0.5, 1.0, n),
+        'can_service': rng.random(n) < 0.8,
+        'can_ibl': rng.random(n) < 0.4,
+        'moves': rng.integers(0, 4, n).astype(float),
+        'service_target': int(rng.integers(1, max(2, n // 2))),
+        'max_ibl': int(rng.integers(0, 4)),
+        'max_moves': max_moves
+    }
+
+def _assert_feasible(model, assignment):
+    service, ibl = assignment == SERVICE, assignment == IBL
+    assert not (service & ~model['can_service']).any()
+    assert not (ibl & ~model['can_ibl']).any()
+    assert service.sum() <= model['service_target']
+    assert ibl.sum() <= model['max_ibl']
+    if model['max_moves'] is not None:
+        assert model['moves'][service].sum() <= model['max_moves'] + 1e-9
+
+def _brute_force(model):
+    n = len(model['value_service'])
+    best = 0.0
+    for labels in itertools.product((SERVICE, STANDBY, IBL), repeat=n):
+        assignment = np.array(labels)
+        service, ibl = assignment == SERVICE, assignment == IBL
+        if ((service & ~model['can_service']).any() or (ibl & ~model['can_ibl']).any()
+                or service.sum() > model['service_target'] or ibl.sum() > model['max_ibl']
+                or (model['max_moves'] is not None and model['moves'][service].sum() > model['max_moves'])):
+            continue
+        best = max(best, _plan_value(model, assignment))
+    return best
+
+@pytest.mark.parametrize('seed', range(20))
+def test_branch_and_bound_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    model = _random_model(rng, 7, max_moves=None if seed % 2 else 4.0)
+    assignment, report = InductionSolver(backend='branch_and_bound').solve_model(model)
+    _assert_feasible(model, assignment)
+    assert report['status'] == 'optimal'
+    assert report['objective'] == pytest.approx(_brute_force(model), abs=1e-9)
+    assert report['objective'] == pytest.approx(_plan_value(model, assignment))
+
+@pytest.mark.skipif(not HAS_MILP, reason="SciPy MILP not installed")
+@pytest.mark.parametrize('seed', range(20))
+def test_branch_and_bound_matches_milp(seed):
+    rng = np.random.default_rng(seed)
+    model = _random_model(rng, 40, max_moves=None if seed % 2 else 12.0)
+    bb_assignment, bb_report = InductionSolver(backend='branch_and_bound').solve_model(model)
+    milp_assignment, milp_report = InductionSolver(backend='milp').solve_model(model)
+    _assert_feasible(model, bb_assignment)
+    _assert_feasible(model, milp_assignment)
+    assert bb_report['status'] == milp_report['status'] == 'optimal'
+    assert bb_report['objective'] == pytest.approx(milp_report['objective'], abs=1e-6)
+
+def test_anytime_plan_is_feasible_and_improves_on_its_start(make_fleet):
+    trainsets = make_fleet(80, seed=5)
+    scores = np.array([t['ai_score'] for t in trainsets]) / 100
+    constraints = {'service_target': 20, 'max_ibl': 6, 'max_shunting_moves': 30}
+    solver = InductionSolver(backend='branch_and_bound')
+    model = solver.build_model(trainsets, scores, constraints)
+    optimum = solver.solve(trainsets, scores, constraints)[1]['objective']
+    # Start from an infeasible plan: everything in service
+    start = time.time()
+    assignment, report = solver.solve_anytime(trainsets, scores, constraints, np.full(80, SERVICE),
+                                              deadline=start + 1.0, seed=1)
+    assert time.time() - start < 2.0
+    _assert_feasible(model, assignment)
+    assert report['objective'] == pytest.approx(_plan_value(model, assignment))
+    assert report['objective'] <= optimum + 1e-9
+    values = [value for _, value in report['trace']]
+    assert values == sorted(values)
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+import pytest
+from fleet_store import FleetStore
+from integrator import ChangeEvent, ChangeLog, EventBus, RealTimeDataIntegrator, coalesce
+
+T0 = datetime(2026, 2, 1, 5, 0)
+
+def _event(trainset_id, path, old, new, source='maximo', minutes=0):
+    return ChangeEvent(trainset_id, path, old, new, source, T0 + timedelta(minutes=minutes))
+
+def test_coalesce_keeps_first_old_and_last_new_value():
+    events = [
+        _event('T1', 'job_cards.open', 1, 2, minutes=0),
+        _event('T2', 'job_cards.open', 5, 6, minutes=1),
+        _event('T1', 'job_cards.open', 2, 4, source='iot_sensors', minutes=2),
+        _event('T1', 'job_cards.priority', 'Low', 'High', minutes=3),
+        # T2 goes back to where it started: nothing to apply
+        _event('T2', 'job_cards.open', 6, 5, minutes=4),
+        _event('T1', 'job_cards.open', 4, 3, source='fitness_certs', minutes=5),
+    ]
+    assert coalesce(events) == [
+        _event('T1', 'job_cards.open', 1, 3, source='fitness_certs', minutes=5),
+        _event('T1', 'job_cards.priority', 'Low', 'High', minutes=3),
+    ]
+    assert coalesce([]) == []
+
+def test_subscribers_receive_only_their_fields():
+    bus = EventBus(history=3)
+    wear, everything, jobs = [], [], []
+    bus.subscribe(wear.append, ['mileage.component_wear'])
+    bus.subscribe(everything.append)
+    subscription = bus.subscribe(jobs.append, ['job_cards.open'])
+    first = [_event('T1', 'mileage.component_wear.hvac', 10, 11), _event('T1', 'mileage.total_km', 5, 9),
+             _event('T2', 'job_cards.open', 0, 1, minutes=1)]
+    bus.publish(first)
+    assert wear == [first[:1]] and everything == [first] and jobs == [first[2:]]
+    bus.unsubscribe(subscription)
+    second = [_event('T3', 'job_cards.open', 2, 3, minutes=2), _event('T3', 'mileage.total_km_extra', 1, 2, minutes=3)]
+    bus.publish(second)
+    # No empty batches, no prefix matches on partial names, nothing after unsubscribing
+    assert wear == [first[:1]] and jobs == [first[2:]] and everything == [first, second]
+    # History is bounded and filterable
+    assert list(bus.history) == first[2:] + second
+    assert bus.events_since(T0 + timedelta(minutes=2)) == second
+    assert bus.events_since(fields=['job_cards']) == [first[2], second[0]]
+
+def test_change_log_tracks_fields_per_trainset():
+    log = ChangeLog()
+    t1, t2 = {'id': 'T1'}, {'id': 'T2'}
+    log.record(t1, ['job_cards.open'])
+    log.record(t2, ['mileage.total_km'])
+    log.record(t1, ['fitness.telecom'])
+    assert log.fields == {'T1': {'job_cards.open', 'fitness.telecom'}, 'T2': {'mileage.total_km'}}
+    assert log.touched(['fitness.telecom']) == [t1]
+    assert log.touched() == [t1, t2]
+    log.discard(['T1', 'T9'])
+    assert list(log.fields) == ['T2'] and len(log) == 1
+    log.clear()
+    assert len(log) == 0
+
+@pytest.mark.parametrize('attached', [False, True])
+def test_apply_events_coalesces_and_notifies(make_fleet, attached):
+    trainsets = make_fleet(4, seed=2)
+    if attached:
+        trainsets = FleetStore.from_trainsets(trainsets).views()
+    integrator = RealTimeDataIntegrator()
+    log = integrator.track_changes()
+    received = []
+    integrator.subscribe(received.extend, ['job_cards'])
+    tid = trainsets[1]['id']
+    open_jobs = trainsets[1]['job_cards']['open']
+    events = [_event(tid, 'job_cards.open', open_jobs, open_jobs + 1),
+              _event(tid, 'job_cards.open', open_jobs + 1, open_jobs + 5),
+              _event(tid, 'mileage.total_km', 100, 200),
+              _event('unknown', 'job_cards.open', 0, 1)]
+    applied = integrator.apply_events(trainsets, events)
+    assert [(e.path, e.old, e.new) for e in applied] == [('job_cards.open', open_jobs, open_jobs + 5),
+                                                        ('mileage.total_km', 100, 200)]
+    assert trainsets[1]['job_cards']['open'] == open_jobs + 5
+    assert trainsets[1]['mileage']['total_km'] == 200
+    assert received == applied[:1]
+    assert log.fields == {tid: {'job_cards.open', 'mileage.total_km'}}
+    # Replays apply every event in order without merging them
+    replayed = integrator.replay(trainsets, [_event(tid, 'job_cards.open', 0, 7), _event(tid, 'job_cards.open', 7, 2)])
+    assert len(replayed) == 2 and trainsets[1]['job_cards']['open'] == 2
@@ -0,0 +1,65 @@
+import os
+import pytest
+from fleet_store import FleetStore, fleet_version
+from memo import LRUMemo
+from system_manager import SystemIntegrationManager
+
+def test_least_recently_used_entries_are_evicted():
+    evicted = []
+    memo = LRUMemo(maxsize=2, on_evict=evicted.append)
+    assert memo.get(('a',), lambda: 1) == 1
+    assert memo.get(('b',), lambda: 2) == 2
+    assert memo.get(('a',), lambda: pytest.fail('cached')) == 1
+    memo.get(('c',), lambda: 3)
+    assert evicted == [2] and list(memo.entries) == [('a',), ('c',)]
+    assert memo.stats() == {'entries': 2, 'hits': 1, 'misses': 3}
+    memo.clear()
+    assert sorted(evicted) == [1, 2, 3] and memo.stats()['entries'] == 0
+
+def test_keys_with_none_are_never_cached():
+    memo = LRUMemo()
+    calls = []
+    for _ in range(2):
+        memo.get(('metrics', None), lambda: calls.append(1))
+    assert len(calls) == 2 and not memo.entries
+
+def test_fleet_writes_invalidate_memoized_results(make_fleet):
+    views = FleetStore.from_trainsets(make_fleet(10, seed=1)).views()
+    memo = LRUMemo()
+    key = lambda: ('open_jobs', fleet_version(views))
+    total = lambda: sum(t['job_cards']['open'] for t in views)
+    before = memo.get(key(), total)
+    views[0]['job_cards']['open'] += 5
+    assert memo.get(key(), total) == before + 5
+    # Reordering the fleet is a different version too
+    assert fleet_version(views[::-1]) != fleet_version(views)
+    # Plain dicts have no version and are recomputed every time
+    assert fleet_version(make_fleet(3)) is None
+
+def test_metrics_are_memoized_per_fleet_version(tmp_path, isolated_model_cache):
+    manager = SystemIntegrationManager(data_dir=str(tmp_path))
+    views = manager.initialize_system(12)
+    first = manager._calculate_performance_metrics(views, {})
+    assert manager._calculate_performance_metrics(views, {}) == first
+    views[0]['job_cards']['open'] += 4
+    assert manager._calculate_performance_metrics(views, {})['maintenance_backlog'] == first['maintenance_backlog'] + 4
+
+def test_cached_exports_give_each_caller_its_own_handle(tmp_path, isolated_model_cache):
+    manager = SystemIntegrationManager(data_dir=str(tmp_path))
+    views = manager.initialize_system(12)
+    first = manager.export_fleet_status(views)
+    first.read(10)
+    second = manager.export_fleet_status(views)
+    assert second.name == first.name
+    # Reading one handle does not move the other
+    content = second.read()
+    assert content.startswith(b'Trainset,') and first.tell() == 10
+    first.close()
+    assert manager.export_fleet_status(views).read() == content
+    # A fleet change writes a new file; the old one stays cached until evicted or cleared
+    views[0]['job_cards']['open'] += 1
+    changed = manager.export_fleet_status(views)
+    assert changed.name != first.name and changed.read() != content
+    paths = list(manager.export_memo.entries.values())
+    manager.reset_system()
+    assert not any(os.path.exists(path) for path in paths)
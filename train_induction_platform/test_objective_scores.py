@@ -0,0 +1,54 @@
+import numpy as np
+from fleet_store import FleetStore
+from integrator import RealTimeDataIntegrator
+from optimizer import MultiObjectiveOptimizer
+
+CONSTRAINTS = {'service_target': 15, 'max_ibl': 5, 'maintenance_buffer': 3}
+
+def _views(trainsets):
+    return FleetStore.from_trainsets(trainsets).views()
+
+def _assert_current(optimizer, trainsets):
+    _, matrix = optimizer.calculate_overall_scores(trainsets)
+    np.testing.assert_allclose(matrix, optimizer.objective_matrix([t.to_dict() for t in trainsets]))
+
+def test_subset_call_keeps_other_changes_pending(make_fleet):
+    trainsets = _views(make_fleet(40, seed=3))
+    integrator = RealTimeDataIntegrator()
+    optimizer = MultiObjectiveOptimizer()
+    optimizer.watch(integrator.track_changes())
+    optimizer.optimize_fleet_assignment(trainsets, CONSTRAINTS)
+    for trainset in trainsets:
+        trainset['job_cards']['open'] += 3
+        integrator.mark_dirty(trainset, 'job_cards.open')
+    # Scoring a few trainsets must not drop the pending changes of the others
+    optimizer.pareto_trainsets(trainsets[:5])
+    _assert_current(optimizer, trainsets)
+
+def test_writes_outside_the_change_log_invalidate_cached_rows(make_fleet):
+    trainsets = _views(make_fleet(40, seed=3))
+    optimizer = MultiObjectiveOptimizer()
+    optimizer.watch(RealTimeDataIntegrator().track_changes())
+    optimizer.optimize_fleet_assignment(trainsets, CONSTRAINTS)
+    trainsets[0]['operational']['reliability_score'] = 10
+    trainsets[1]['mileage']['component_wear']['hvac'] = 99.0
+    trainsets[2].store.set_column('stabling.shunting_moves_required', [4], [trainsets[2].row])
+    _assert_current(optimizer, trainsets)
+
+def test_optimizer_writes_do_not_invalidate_cached_rows(make_fleet):
+    trainsets = _views(make_fleet(40, seed=3))
+    store = trainsets[0].store
+    optimizer = MultiObjectiveOptimizer()
+    optimizer.optimize_fleet_assignment(trainsets, CONSTRAINTS)
+    optimizer.calculate_overall_scores(trainsets)
+    assert not store.block_stale('objective_scores').any()
+
+def test_sweep_matches_single_weighting(make_fleet):
+    trainsets = _views(make_fleet(40, seed=3))
+    optimizer = MultiObjectiveOptimizer()
+    weights = [optimizer.weights, dict(optimizer.weights, punctuality=0.9)]
+    scores, rankings = optimizer.sweep_weights(trainsets, weights)
+    for k, weighting in enumerate(weights):
+        expected = optimizer.objective_matrix([t.to_dict() for t in trainsets]) @ optimizer.weight_vector(weighting)
+        np.testing.assert_allclose(scores[:, k], expected)
+        assert np.all(np.diff(scores[rankings[k], k]) <= 0)
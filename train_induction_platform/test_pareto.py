@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from pareto import pareto_front, non_dominated_sort, crowding_distance, select_diverse
+
+def _dominates(a, b):
+    return np.all(a >= b) and np.any(a > b)
+
+def _brute_force_ranks(points):
+    ranks = np.full(len(points), -1)
+    front = 0
+    while (ranks < 0).any():
+        remaining = np.flatnonzero(ranks < 0)
+        members = [i for i in remaining if not any(_dominates(points[j], points[i]) for j in remaining)]
+        ranks[members] = front
+        front += 1
+    return ranks
+
+def _brute_force_crowding(points):
+    n, m = points.shape
+    if n <= 2:
+        return np.full(n, np.inf)
+    distance = np.zeros(n)
+    for j in range(m):
+        order = np.argsort(points[:, j], kind='stable')
+        span = points[order[-1], j] - points[order[0], j]
+        for position, i in enumerate(order):
+            if position in (0, n - 1):
+                distance[i] = np.inf
+            elif span > 0:
+                distance[i] += (points[order[position + 1], j] - points[order[position - 1], j]) / span
+    return distance
+
+@pytest.mark.parametrize('objectives', [1, 2, 3, 5])
+@pytest.mark.parametrize('seed', range(10))
+def test_non_dominated_sort_matches_brute_force(objectives, seed):
+    rng = np.random.default_rng(seed)
+    # Small integer grid, so ties and duplicate points are common
+    points = rng.integers(0, 5, (60, objectives)).astype(float)
+    expected = _brute_force_ranks(points)
+    np.testing.assert_array_equal(non_dominated_sort(points), expected)
+    np.testing.assert_array_equal(np.sort(pareto_front(points)), np.flatnonzero(expected == 0))
+
+@pytest.mark.parametrize('seed', range(10))
+def test_crowding_distance_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    points = rng.random((25, 3))
+    np.testing.assert_allclose(crowding_distance(points), _brute_force_crowding(points))
+
+def test_select_diverse_takes_best_fronts_first():
+    rng = np.random.default_rng(0)
+    points = rng.random((50, 2))
+    ranks = non_dominated_sort(points)
+    selected = select_diverse(points, 10)
+    assert len(selected) == len(set(selected.tolist())) == 10
+    # Nothing from a later front is picked while an earlier front still has rows left out
+    assert ranks[selected].max() <= np.sort(ranks)[9]
+
+def test_empty_input():
+    assert len(pareto_front(np.zeros((0, 3)))) == 0
+    assert len(non_dominated_sort(np.zeros((0, 3)))) == 0
@@ -0,0 +1,80 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from fleet_store import FleetStore
+from predictive_model import PredictiveMaintenanceModel
+
+def _per_trainset_predictions(model, trainsets):
+    """Predictions as they were made before batching: one transform and predict call per trainset"""
+    predictions = []
+    for trainset in trainsets:
+        try:
+            features = np.array([[
+                trainset['mileage']['total_km'],
+                trainset['mileage']['since_maintenance'],
+                sum(trainset['mileage']['component_wear'].values()) / 3,
+                trainset['job_cards']['open'],
+                1 if trainset['fitness']['rolling_stock'] else 0,
+                1 if trainset['fitness']['signalling'] else 0,
+                1 if trainset['fitness']['telecom'] else 0,
+                (trainset['operational']['last_service'] - datetime.now()).days if trainset['operational']['last_service'] else 30,
+                trainset['operational']['reliability_score']
+            ]], dtype=float)
+            days_until_maintenance = model.model.predict(model.scaler.transform(features))[0]
+        except Exception:
+            predictions.append(model._fallback_prediction(trainset))
+            continue
+        risk_score = min(100, max(0, 100 - (days_until_maintenance / 30 * 100)))
+        if risk_score > 75:
+            action, priority = 'Schedule Immediately', 'High'
+        elif risk_score > 50:
+            action, priority = 'Schedule Soon', 'Medium'
+        elif risk_score > 25:
+            action, priority = 'Monitor Closely', 'Low'
+        else:
+            action, priority = 'OK', 'None'
+        predictions.append({'trainset_id': trainset['id'], 'risk_score': round(risk_score, 1),
+                            'days_until_maintenance': round(max(0, days_until_maintenance), 1),
+                            'recommended_action': action, 'priority': priority, 'confidence': 'High'})
+    return pd.DataFrame(predictions)
+
+@pytest.fixture
+def trained(make_fleet):
+    trainsets = make_fleet(60, seed=12)
+    model = PredictiveMaintenanceModel()
+    assert model.train_model(trainsets)
+    return model, trainsets
+
+def _assert_same(actual, expected):
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False)
+
+@pytest.mark.parametrize('attached', [False, True])
+def test_batched_predictions_match_per_trainset_predictions(trained, attached):
+    model, trainsets = trained
+    if attached:
+        trainsets = FleetStore.from_trainsets(trainsets).views()
+    _assert_same(model.predict_maintenance(trainsets), _per_trainset_predictions(model, trainsets))
+
+def test_only_rows_with_missing_features_use_the_heuristic(trained):
+    model, trainsets = trained
+    trainsets[3]['mileage']['total_km'] = None
+    del trainsets[7]['operational']['reliability_score']
+    predictions = model.predict_maintenance(trainsets)
+    heuristic = predictions['confidence'] == 'Low (Heuristic)'
+    assert np.flatnonzero(heuristic).tolist() == [3, 7]
+    for i in (3, 7):
+        assert predictions.loc[i].to_dict() == model._fallback_prediction(trainsets[i])
+    # The remaining rows are scored by the model exactly as before
+    complete = [t for i, t in enumerate(trainsets) if i not in (3, 7)]
+    _assert_same(predictions[~heuristic], _per_trainset_predictions(model, complete))
+
+def test_failed_model_call_warns_and_falls_back(trained, monkeypatch):
+    model, trainsets = trained
+    def fail(features):
+        raise ValueError('broken model')
+    monkeypatch.setattr(model.model, 'predict', fail)
+    with pytest.warns(RuntimeWarning, match='broken model'):
+        predictions = model.predict_maintenance(trainsets)
+    assert (predictions['confidence'] == 'Low (Heuristic)').all()
+    _assert_same(predictions, model._fallback_predictions(trainsets))
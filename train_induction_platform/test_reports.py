@@ -0,0 +1,105 @@
+import pytest
+from fleet_store import FleetStore
+from reports import ReportGenerator
+
+OPTIMIZATION_RESULTS = {'service_ready': 20, 'target_service': 18, 'ibl_maintenance': 4, 'max_ibl': 5,
+                        'conflicts': ['a', 'b'], 'punctuality_score': 99.2, 'cost_optimization': 1200,
+                        'energy_savings': 15}
+
+def _per_trainset_reports(trainsets):
+    """The templates as they were before the single-pass aggregate: one loop per figure"""
+    service_ready = sum(1 for t in trainsets if t.get('manual_override') or t['recommendation'] == 'Service')
+    high_risk = []
+    for t in trainsets:
+        wear_avg = sum(t['mileage']['component_wear'].values()) / 3
+        if wear_avg > 70 or t['job_cards']['open'] > 2:
+            high_risk.append({'id': t['id'], 'wear_score': wear_avg, 'open_jobs': t['job_cards']['open'],
+                              'priority': t['job_cards']['priority']})
+    branding_stats = {}
+    for t in trainsets:
+        stats = branding_stats.setdefault(t['branding']['advertiser'] or 'Unbranded', {
+            'total_hours_required': 0, 'total_deficit': 0, 'train_count': 0, 'total_value': 0})
+        stats['total_hours_required'] += t['branding']['hours_required_today']
+        stats['total_deficit'] += t['branding']['exposure_deficit']
+        stats['train_count'] += 1
+        stats['total_value'] += t['branding']['contract_value']
+    return {
+        'daily_operations': {
+            'title': 'Daily Operations Report',
+            'summary': {
+                'total_trainsets': len(trainsets),
+                'service_ready': service_ready,
+                'standby': sum(1 for t in trainsets if t.get('manual_override') or t['recommendation'] == 'Standby'),
+                'ibl_maintenance': sum(1 for t in trainsets if t.get('manual_override') or t['recommendation'] == 'IBL'),
+                'availability_rate': round(service_ready / len(trainsets) * 100, 1) if trainsets else 0
+            },
+            'fitness_status': {
+                'all_valid': sum(1 for t in trainsets if t['fitness']['overall_valid']),
+                'expiring_soon': sum(1 for t in trainsets if t['fitness']['days_until_expiry'] <= 2)
+            },
+            'maintenance_status': {
+                'open_job_cards': sum(t['job_cards']['open'] for t in trainsets),
+                'critical_priority': sum(1 for t in trainsets if t['job_cards']['priority'] == 'Critical')
+            }
+        },
+        'maintenance_plan': {
+            'title': 'Maintenance Planning Report',
+            'high_risk_trains': sorted(high_risk, key=lambda x: x['wear_score'], reverse=True),
+            'total_open_jobs': sum(t['job_cards']['open'] for t in trainsets),
+            'preventive_maintenance_needed': sum(1 for t in trainsets if t['mileage']['since_maintenance'] > 8000),
+            'critical_issues': sum(1 for t in trainsets if t['job_cards']['priority'] == 'Critical')
+        },
+        'branding_compliance': {
+            'title': 'Branding Compliance Report',
+            'advertiser_stats': branding_stats,
+            'total_exposure_deficit': sum(t['branding']['exposure_deficit'] for t in trainsets),
+            'total_contract_value': sum(t['branding']['contract_value'] for t in trainsets),
+            'trains_requiring_exposure': sum(1 for t in trainsets if t['branding']['hours_required_today'] > 0)
+        },
+        'optimization_summary': {
+            'title': 'Optimization Performance Report',
+            'optimization_results': OPTIMIZATION_RESULTS,
+            'constraint_compliance': {'service_target_met': True, 'ibl_within_limit': True},
+            'conflict_resolution': 2,
+            'predicted_impact': {'punctuality_improvement': pytest.approx(0.7), 'cost_savings': 1200,
+                                 'energy_savings': 15}
+        }
+    }
+
+def _without_timestamp(report):
+    report = dict(report)
+    del report['timestamp']
+    if 'high_risk_trains' in report:
+        report['high_risk_trains'] = [dict(train, wear_score=pytest.approx(train['wear_score']))
+                                      for train in report['high_risk_trains']]
+    return report
+
+@pytest.mark.parametrize('attached', [False, True])
+def test_reports_match_per_trainset_templates(make_fleet, attached):
+    trainsets = make_fleet(40, seed=9)
+    # Empty and missing advertisers both count as unbranded
+    trainsets[0]['branding']['advertiser'] = ''
+    trainsets[1]['branding']['advertiser'] = None
+    trainsets[2]['manual_override'] = True
+    trainsets[3]['mileage']['component_wear'] = {'brake_pads': 90, 'bogies': 80, 'hvac': 75}
+    if attached:
+        trainsets = FleetStore.from_trainsets(trainsets).views()
+    expected = _per_trainset_reports(trainsets)
+    reports = ReportGenerator().generate_reports(trainsets, OPTIMIZATION_RESULTS)
+    assert set(reports) == set(expected)
+    for report_type, report in reports.items():
+        assert _without_timestamp(report) == expected[report_type], report_type
+        single = ReportGenerator().generate_report(report_type, trainsets, OPTIMIZATION_RESULTS)
+        assert _without_timestamp(single) == expected[report_type], report_type
+    unbranded = reports['branding_compliance']['advertiser_stats']['Unbranded']
+    assert unbranded['train_count'] == sum(1 for t in trainsets if not t['branding']['advertiser'])
+
+def test_branding_csv_lists_each_advertiser_once(make_fleet):
+    trainsets = make_fleet(40, seed=9)
+    trainsets[0]['branding']['advertiser'] = ''
+    generator = ReportGenerator()
+    report = generator.generate_report('branding_compliance', trainsets)
+    rows = generator.export_report_to_csv(report, 'branding').splitlines()[1:]
+    advertisers = [row.split(',')[0] for row in rows]
+    assert sorted(advertisers) == sorted(report['advertiser_stats'])
+    assert len(advertisers) == len(set(advertisers))
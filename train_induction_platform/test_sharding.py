@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import sharding
+from induction_solver import InductionSolver, SERVICE, IBL
+from sharding import DepotShardedSolver, allocate
+
+@pytest.fixture
+def fleet(make_fleet):
+    trainsets = make_fleet(120, seed=6)
+    scores = np.array([t['ai_score'] for t in trainsets]) / 100
+    return trainsets, scores
+
+def _assert_feasible(trainsets, scores, constraints, assignment, report):
+    model = InductionSolver().build_model(trainsets, scores, constraints)
+    service, ibl = assignment == SERVICE, assignment == IBL
+    assert not (service & ~model['can_service']).any()
+    assert not (ibl & ~model['can_ibl']).any()
+    assert service.sum() <= constraints['service_target']
+    assert ibl.sum() <= constraints['max_ibl']
+    if constraints.get('max_shunting_moves') is not None:
+        assert model['moves'][service].sum() <= constraints['max_shunting_moves']
+    shards = report['shards'].values()
+    assert sum(shard['service_target'] for shard in shards) == constraints['service_target']
+    assert sum(shard['max_ibl'] for shard in shards) == constraints['max_ibl']
+    value = model['value_service'][service].sum() + model['value_ibl'][ibl].sum()
+    assert report['objective'] == pytest.approx(value)
+    return value
+
+@pytest.mark.parametrize('constraints', [
+    {'service_target': 40, 'max_ibl': 8},
+    {'service_target': 40, 'max_ibl': 8, 'max_shunting_moves': 25},
+    {'service_target': 15, 'max_ibl': 2, 'rebalance': False},
+])
+def test_sharded_plan_respects_fleet_limits(constraints, fleet):
+    trainsets, scores = fleet
+    assignment, report = DepotShardedSolver().solve(trainsets, scores, constraints)
+    value = _assert_feasible(trainsets, scores, constraints, assignment, report)
+    # Never better than the whole-fleet optimum
+    assert value <= InductionSolver().solve(trainsets, scores, constraints)[1]['objective'] + 1e-6
+
+def test_explicit_shares_and_remainder(fleet):
+    trainsets, scores = fleet
+    depots = sorted({t['depot'] for t in trainsets})
+    constraints = {'service_target': 30, 'max_ibl': 6, 'rebalance': False,
+                   'depot_shares': {depots[0]: {'service_target': 4, 'max_ibl': 0}}}
+    assignment, report = DepotShardedSolver().solve(trainsets, scores, constraints)
+    _assert_feasible(trainsets, scores, constraints, assignment, report)
+    assert report['shards'][depots[0]]['service_target'] == 4
+    assert report['shards'][depots[0]]['max_ibl'] == 0
+
+@pytest.mark.parametrize('depot_shares, message', [
+    ({'Nowhere Depot': {'service_target': 1}}, 'not in the fleet'),
+    ({'Aluva Depot': {'service_target': 31}}, 'add up to 31'),
+    ({'Aluva Depot': {'max_ibl': -1}}, 'negative'),
+])
+def test_invalid_shares_are_rejected(depot_shares, message, fleet):
+    trainsets, scores = fleet
+    with pytest.raises(ValueError, match=message):
+        DepotShardedSolver().solve(trainsets, scores, {'service_target': 30, 'max_ibl': 6, 'depot_shares': depot_shares})
+
+def test_shares_for_every_depot_must_cover_the_limits(fleet):
+    trainsets, scores = fleet
+    depots = sorted({t['depot'] for t in trainsets})
+    depot_shares = {depot: {'service_target': 5} for depot in depots}
+    with pytest.raises(ValueError, match='add up to'):
+        DepotShardedSolver().solve(trainsets, scores, {'service_target': 5 * len(depots) + 1, 'max_ibl': 6,
+                                                        'depot_shares': depot_shares})
+
+def test_worker_processes_give_the_same_plan(monkeypatch, fleet):
+    trainsets, scores = fleet
+    constraints = {'service_target': 40, 'max_ibl': 8, 'max_shunting_moves': 25}
+    serial_assignment, serial_report = DepotShardedSolver().solve(trainsets, scores, constraints)
+    monkeypatch.setattr(sharding, 'PARALLEL_MIN_TRAINSETS', 0)
+    assignment, report = DepotShardedSolver(time_budget=60).solve(trainsets, scores, constraints)
+    assert report['parallel'] and not serial_report['parallel']
+    np.testing.assert_array_equal(assignment, serial_assignment)
+
+def test_allocate_largest_remainder():
+    assert allocate(10, [1, 1, 1]).tolist() == [4, 3, 3]
+    assert allocate(7, [0, 0]).sum() == 7
+    assert allocate(0, [5, 1]).tolist() == [0, 0]
+    assert allocate(5, []).tolist() == []
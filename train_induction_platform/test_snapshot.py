@@ -0,0 +1,65 @@
+import os
+import threading
+import numpy as np
+import pytest
+from fleet_store import FleetStore
+from snapshot import save_snapshot, load_snapshot
+from system_manager import SystemIntegrationManager
+
+def _store(trainsets):
+    store = FleetStore.from_trainsets(trainsets)
+    store.views()[0]['custom_note'] = 'kept outside the schema'
+    return store
+
+def test_save_and_load_round_trip(tmp_path, make_fleet):
+    fleet = _store(make_fleet(30, seed=8))
+    fleet.block('objective_scores', 6, sources=['job_cards.open'])
+    fleet.refresh_block('objective_scores', np.arange(10), np.random.random((10, 6)))
+    path = str(tmp_path / 'system.snapshot')
+    save_snapshot(path, fleet, {'answer': 42})
+    loaded, state = load_snapshot(path)
+    assert state == {'answer': 42}
+    assert loaded.to_trainsets() == fleet.to_trainsets()
+    assert loaded.version == fleet.version
+    np.testing.assert_array_equal(loaded.block('objective_scores'), fleet.block('objective_scores'))
+    np.testing.assert_array_equal(loaded.block_stale('objective_scores'), fleet.block_stale('objective_scores'))
+    # Loaded arrays are private copy-on-write maps: writes never reach the file
+    loaded.views()[0]['job_cards']['open'] = 99
+    assert loaded.block_stale('objective_scores')[0]
+    assert load_snapshot(path)[0].to_trainsets() == fleet.to_trainsets()
+
+def test_concurrent_saves_leave_one_complete_snapshot(tmp_path, make_fleet):
+    path = str(tmp_path / 'system.snapshot')
+    fleets = [_store(make_fleet(20, seed)) for seed in range(6)]
+    threads = [threading.Thread(target=save_snapshot, args=(path, fleet, {'seed': seed}))
+               for seed, fleet in enumerate(fleets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    loaded, state = load_snapshot(path)
+    assert loaded.to_trainsets() == fleets[state['seed']].to_trainsets()
+    assert os.listdir(tmp_path) == ['system.snapshot']
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'not_a.snapshot'
+    path.write_bytes(b'x' * 100)
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+def test_system_restore_is_scoped_to_its_data_dir(tmp_path, isolated_model_cache):
+    first = SystemIntegrationManager(data_dir=str(tmp_path / 'first'))
+    trainsets = first.initialize_system(20)
+    constraints = {'service_target': 10, 'max_ibl': 3, 'maintenance_buffer': 3}
+    optimized, _, _, predictions = first.run_complete_optimization(trainsets, constraints)
+    first.save_snapshot(optimized)
+    # The same data dir resumes the saved fleet, model and history
+    resumed = SystemIntegrationManager(data_dir=str(tmp_path / 'first'))
+    restored = resumed.restore_or_initialize(20)
+    assert [t.to_dict() for t in restored] == [t.to_dict() for t in optimized]
+    assert len(resumed.optimization_history) == len(first.optimization_history) == 1
+    assert resumed.ml_model.predict_maintenance(restored).equals(first.ml_model.predict_maintenance(optimized))
+    # Another data dir starts from scratch
+    other = SystemIntegrationManager(data_dir=str(tmp_path / 'second'))
+    other.restore_or_initialize(5)
+    assert len(other.fleet) == 5 and len(other.optimization_history) == 0
@@ -0,0 +1,57 @@
+import threading
+import time
+import pytest
+from stages import Stage, StageGraph
+
+def test_stages_run_after_their_inputs():
+    order = []
+    lock = threading.Lock()
+    def step(name, value):
+        def run(*args):
+            time.sleep(0.02)
+            with lock:
+                order.append(name)
+            return value + sum(args)
+        return run
+    graph = StageGraph([
+        Stage('total', step('total', 0), ['left', 'right'], 'total'),
+        Stage('left', step('left', 1), ['seed'], 'left'),
+        Stage('right', step('right', 10), ['left'], 'right'),
+    ])
+    values = graph.run({'seed': 100})
+    assert order == ['left', 'right', 'total']
+    assert values == {'seed': 100, 'left': 101, 'right': 111, 'total': 212}
+
+def test_independent_stages_overlap():
+    graph = StageGraph([
+        Stage('slow', lambda: time.sleep(0.4) or 'slow', [], 'a'),
+        Stage('fast', lambda: time.sleep(0.3) or 'fast', [], 'b'),
+        Stage('join', lambda a, b: a + b, ['a', 'b'], 'c'),
+    ])
+    start = time.perf_counter()
+    values = graph.run({})
+    elapsed = time.perf_counter() - start
+    assert values['c'] == 'slowfast'
+    # About max(0.4, 0.3), well short of the 0.7 s of running them one after the other
+    assert 0.4 <= elapsed < 0.65
+
+def test_stage_errors_reach_the_caller_after_running_stages_finish():
+    finished = threading.Event()
+    def slow():
+        time.sleep(0.2)
+        finished.set()
+    def fail():
+        raise RuntimeError('stage failed')
+    graph = StageGraph([Stage('slow', slow, [], 'a'), Stage('fail', fail, [], 'b'),
+                        Stage('after', lambda b: b, ['b'], 'c')])
+    with pytest.raises(RuntimeError, match='stage failed'):
+        graph.run({})
+    assert finished.is_set()
+
+def test_multiple_outputs_and_wiring_errors():
+    graph = StageGraph([Stage('split', lambda x: (x, -x), ['x'], ['pos', 'neg'])])
+    assert graph.run({'x': 3}) == {'x': 3, 'pos': 3, 'neg': -3}
+    with pytest.raises(ValueError, match='never produced'):
+        StageGraph([Stage('orphan', lambda y: y, ['y'], 'z')]).run({})
+    with pytest.raises(ValueError, match='produced by both'):
+        StageGraph([Stage('one', lambda: 1, [], 'a'), Stage('two', lambda: 2, [], 'a')])
@@ -0,0 +1,90 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from telemetry import TelemetryBuffer, SyntheticTelemetry, COMPONENTS
+from system_manager import SystemIntegrationManager
+
+def _brute_force_stats(readings, window):
+    """Mean, max and slope (per hour) of the last `window` readings of each stream"""
+    stats = {name: np.full(len(readings), np.nan) for name in ('mean', 'max', 'slope')}
+    for stream, stream_readings in enumerate(readings):
+        last = sorted(stream_readings)[-window:]
+        if not last:
+            continue
+        t, v = np.array(last).T
+        stats['mean'][stream] = v.mean()
+        stats['max'][stream] = v.max()
+        if len(last) > 1:
+            stats['slope'][stream] = np.polyfit(t, v, 1)[0] * 3600
+    return stats
+
+@pytest.mark.parametrize('resync_every', [1, 3, 1000])
+def test_rolling_stats_match_numpy_over_the_window(resync_every):
+    rng = np.random.default_rng(resync_every)
+    trainset_ids = [f'T{i}' for i in range(4)]
+    window = 16
+    buffer = TelemetryBuffer(trainset_ids, window=window, resync_every=resync_every)
+    streams = len(trainset_ids) * len(COMPONENTS)
+    readings = [[] for _ in range(streams)]
+    clock = 1.7e9
+    # Batch sizes from a few readings to several windows' worth for one stream
+    for size in [5, 40, 1, 0, 120, 7, 64, 3, 200, 9]:
+        trainset = rng.integers(0, len(trainset_ids), size)
+        component = rng.integers(0, len(COMPONENTS), size)
+        timestamp = clock + np.sort(rng.uniform(0, 60, size))
+        value = rng.uniform(0, 100, size)
+        clock += 60
+        assert buffer.ingest(trainset, component, timestamp, value) == size
+        for tr, c, t, v in zip(trainset, component, timestamp, value):
+            readings[tr * len(COMPONENTS) + c].append((t, v))
+        stats = buffer.stats()
+        expected = _brute_force_stats(readings, window)
+        counts = np.array([min(len(r), window) for r in readings])
+        np.testing.assert_array_equal(stats['count'].ravel(), counts)
+        np.testing.assert_allclose(stats['mean'].ravel(), expected['mean'], rtol=1e-9)
+        np.testing.assert_array_equal(stats['max'].ravel(), expected['max'])
+        # Running sums drift slightly between resyncs; the slope is the most sensitive to it
+        np.testing.assert_allclose(stats['slope'].ravel(), expected['slope'], rtol=1e-5, atol=1e-6)
+
+def test_wear_events_move_wear_to_the_rolling_mean(make_fleet):
+    trainsets = make_fleet(3, seed=1)
+    buffer = TelemetryBuffer([t['id'] for t in trainsets[:2]], window=8)
+    wear = trainsets[0]['mileage']['component_wear']
+    # Only trainset 0 reports: brakes well away from the stored wear, bogies within min_change of it
+    buffer.ingest([0, 0, 0, 0], [0, 0, 1, 1], [1.0, 2.0, 1.0, 2.0],
+                  [wear['brake_pads'] + 9, wear['brake_pads'] + 11, wear['bogies'] + 0.01, wear['bogies'] - 0.01])
+    timestamp = datetime(2026, 5, 1)
+    events = buffer.wear_events(trainsets, min_change=0.05, timestamp=timestamp)
+    event, = events
+    assert event.trainset_id == trainsets[0]['id']
+    assert event.path == 'mileage.component_wear.brake_pads'
+    assert event.old == wear['brake_pads']
+    assert event.new == pytest.approx(min(100.0, wear['brake_pads'] + 10))
+    assert event.source == 'telemetry' and event.timestamp == timestamp
+
+def test_synthetic_feed_starts_at_the_current_wear(make_fleet):
+    trainsets = make_fleet(5, seed=1)
+    feed = SyntheticTelemetry(trainsets, rate_hz=4, noise=0.0, drift_per_hour=(0, 0), seed=0, start=0.0)
+    trainset, component, timestamp, value = feed.batch(2.0)
+    assert len(value) == 8 * len(trainsets) * len(COMPONENTS)
+    assert np.all(np.diff(timestamp) >= 0)
+    base = np.array([[t['mileage']['component_wear'][c] for c in COMPONENTS] for t in trainsets])
+    np.testing.assert_allclose(value, base[trainset, component])
+
+def test_manager_refresh_takes_wear_from_telemetry(tmp_path, isolated_model_cache):
+    manager = SystemIntegrationManager(data_dir=str(tmp_path))
+    trainsets = manager.initialize_system(10)
+    assert manager.data_integrator.telemetry is manager.telemetry
+    # Stored wear drifts away from what the sensors report
+    trainsets[0]['mileage']['component_wear']['hvac'] = 0
+    trainsets, _ = manager.refresh_data(trainsets)
+    assert manager.telemetry.readings > 0
+    wear_events = [event for event in manager.data_integrator.events.history
+                   if event.path.startswith('mileage.component_wear.')]
+    assert wear_events and {event.source for event in wear_events} == {'telemetry'}
+    mean = manager.telemetry.stats()['mean']
+    row = manager.telemetry.index[trainsets[0]['id']]
+    assert trainsets[0]['mileage']['component_wear']['hvac'] == pytest.approx(mean[row, COMPONENTS.index('hvac')], abs=0.01)
+    # A reset keeps the fleet's telemetry attached to the new integrator
+    manager.reset_system()
+    assert manager.data_integrator.telemetry is manager.telemetry
@@ -0,0 +1,67 @@
+import json
+import re
+import threading
+import numpy as np
+import pytest
+from tracing import Tracer, LatencyHistogram, PIPELINE_SPAN
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_histogram_quantiles_are_within_a_bucket(seed):
+    samples = np.random.default_rng(seed).lognormal(mean=np.log(0.02), sigma=1.0, size=20000)
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.observe(float(sample))
+    summary = histogram.summary()
+    assert summary['count'] == len(samples)
+    assert summary['sum'] == pytest.approx(samples.sum())
+    assert summary['min'] == samples.min() and summary['max'] == samples.max()
+    # Quarter-octave buckets: an interpolated quantile is within one bucket width (2^0.25) of the true one
+    for q in (0.5, 0.95, 0.99):
+        estimate, exact = summary[f'p{round(q * 100)}'], np.quantile(samples, q)
+        assert exact / 2 ** 0.25 <= estimate <= exact * 2 ** 0.25, q
+
+def test_histogram_edge_cases():
+    histogram = LatencyHistogram()
+    assert histogram.summary()['p50'] is None
+    histogram.observe(0.0)
+    histogram.observe(3.5)
+    assert histogram.quantile(0.99) == 3.5
+    assert histogram.quantile(0.01) == 0.0
+
+def test_prometheus_exposition_format():
+    tracer = Tracer()
+    for seconds in (0.1, 0.2, 0.4):
+        tracer.histograms.setdefault('optimize', LatencyHistogram()).observe(seconds)
+    tracer.histograms.setdefault('say "hi"', LatencyHistogram()).observe(1.0)
+    lines = tracer.to_prometheus().splitlines()
+    assert lines[:2] == ['# HELP kmrl_span_duration_seconds Duration of traced pipeline spans.',
+                         '# TYPE kmrl_span_duration_seconds summary']
+    sample = re.compile(r'kmrl_span_duration_seconds(_sum|_count)?\{span="((?:[^"\\]|\\.)*)"(?:,quantile="([0-9.]+)")?\} (\S+)')
+    parsed = [sample.fullmatch(line).groups() for line in lines[2:]]
+    optimize = [(suffix, quantile, float(value)) for suffix, span, quantile, value in parsed if span == 'optimize']
+    assert [quantile for suffix, quantile, _ in optimize if suffix is None] == ['0.5', '0.95', '0.99']
+    assert ('_sum', None, pytest.approx(0.7)) in optimize
+    assert ('_count', None, 3) in optimize
+    assert {span for _, span, _, _ in parsed} == {'optimize', 'say \\"hi\\"'}
+
+def test_helpers_traced_outside_the_pipeline_keep_the_pipeline_trace():
+    tracer = Tracer()
+    with tracer.span(PIPELINE_SPAN) as run:
+        with tracer.span('refresh_data'):
+            pass
+        def predict(parent):
+            with tracer.span('predict_maintenance', parent):
+                pass
+        worker = threading.Thread(target=predict, args=(tracer.current(),))
+        worker.start()
+        worker.join()
+    # A traced helper called on its own is a root span of its own
+    with tracer.span('calculate_ai_scores'):
+        pass
+    assert tracer.last_trace() == run.trace
+    assert [span['name'] for span in tracer.last_trace()] == [PIPELINE_SPAN, 'refresh_data', 'predict_maintenance']
+    assert set(tracer.stage_timings()) == {'refresh_data', 'predict_maintenance'}
+    assert [span['name'] for span in tracer.last_trace('calculate_ai_scores')] == ['calculate_ai_scores']
+    assert json.loads(tracer.to_json())['last_trace'][0]['name'] == PIPELINE_SPAN
+    tracer.reset()
+    assert tracer.last_trace() == [] and tracer.summary() == {}
@@ -0,0 +1,188 @@
+import json
+import math
+import threading
+import time
+from functools import wraps
+import numpy as np
+
+# Latency buckets: quarter-octave (x 2^0.25) from 1 microsecond to about 10 minutes
+BUCKETS_PER_OCTAVE = 4
+MIN_LATENCY = 1e-6
+N_BUCKETS = 40 * BUCKETS_PER_OCTAVE
+QUANTILES = (0.5, 0.95, 0.99)
+# Root span of the optimization pipeline, whose trace the exports and stage timings report
+PIPELINE_SPAN = 'run_complete_optimization'
+
+class LatencyHistogram:
+    """
+    Fixed-size log-bucketed latency histogram. Quantiles are interpolated geometrically inside a
+    bucket (within about 10%) and clamped to the observed min and max.
+    """
+    def __init__(self):
+        self.counts = [0] * (N_BUCKETS + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+    def observe(self, seconds):
+        if seconds <= MIN_LATENCY:
+            bucket = 0
+        else:
+            bucket = min(N_BUCKETS, int(math.log2(seconds / MIN_LATENCY) * BUCKETS_PER_OCTAVE) + 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = np.cumsum(self.counts)
+        bucket = int(np.searchsorted(cumulative, rank))
+        if bucket == 0:
+            return self.min
+        below = cumulative[bucket - 1]
+        fraction = (rank - below) / self.counts[bucket]
+        # Bucket b covers (MIN * 2^((b-1)/k), MIN * 2^(b/k)]
+        value = MIN_LATENCY * 2 ** ((bucket - 1 + fraction) / BUCKETS_PER_OCTAVE)
+        return min(max(value, self.min), self.max)
+    def summary(self):
+        summary = {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else None,
+                   'min': self.min if self.count else None, 'max': self.max if self.count else None}
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}"] = self.quantile(q)
+        return summary
+
+class Span:
+    """One timed block; used as a context manager via Tracer.span"""
+    __slots__ = ('tracer', 'name', 'link', 'parent', 'depth', 'root', 'spans', 'start', 'duration', 'trace')
+    def __init__(self, tracer, name, link=None):
+        self.tracer = tracer
+        self.name = name
+        # Explicit parent span, for work handed to another thread
+        self.link = link
+        self.parent = None
+        self.depth = 0
+        self.root = self
+        self.spans = None
+        self.start = None
+        self.duration = None
+        self.trace = None
+    def __enter__(self):
+        self.tracer._open(self)
+        return self
+    def __exit__(self, *exc):
+        self.tracer._close(self)
+        return False
+    def to_dict(self):
+        return {'name': self.name, 'parent': self.parent, 'depth': self.depth, 'start': self.start,
+                'duration': self.duration}
+
+class _NullSpan:
+    trace = None
+    def __enter__(self):
+        return None
+    def __exit__(self, *exc):
+        return False
+
+class Tracer:
+    """
+    Nested timing spans with a latency histogram per span name. Spans nest per thread, or under an
+    explicit parent span from another thread; when a root span closes, its tree (spans in start
+    order, start relative to the root) is attached to the root span as .trace and kept as the latest
+    trace for that root name (see last_trace), so helpers traced outside the pipeline never replace
+    the pipeline's trace.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self.last_traces = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    def span(self, name, parent=None):
+        """Context manager timing the enclosed block as `name`; parent (a Span, e.g. from current())
+        nests it under a span opened in another thread"""
+        return Span(self, name, parent) if self.enabled else _NullSpan()
+    def current(self):
+        """Innermost open span of the calling thread, or None"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+    def _open(self, span):
+        local = self._local
+        try:
+            stack = local.stack
+        except AttributeError:
+            stack = local.stack = []
+        parent = span.link if span.link is not None else (stack[-1] if stack else None)
+        if parent is not None:
+            span.parent = parent.name
+            span.depth = parent.depth + 1
+            span.root = parent.root
+        else:
+            span.spans = []
+        span.root.spans.append(span)
+        stack.append(span)
+        span.start = time.perf_counter()
+    def _close(self, span):
+        span.duration = time.perf_counter() - span.start
+        self._local.stack.pop()
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = LatencyHistogram()
+            histogram.observe(span.duration)
+        if span.root is span:
+            spans = sorted(span.spans, key=lambda s: s.start)
+            span.trace = [dict(s.to_dict(), start=s.start - span.start) for s in spans]
+            span.spans = None
+            with self._lock:
+                self.last_traces[span.name] = span.trace
+    def traced(self, name=None):
+        """Decorator recording every call of a function as a span"""
+        def decorate(func):
+            span_name = name or func.__qualname__
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+    def last_trace(self, root=PIPELINE_SPAN):
+        """Latest completed trace under a root span name ([] if none yet)"""
+        with self._lock:
+            return self.last_traces.get(root, [])
+    def stage_timings(self, trace=None):
+        """{span name: seconds} for the direct children of the root of a trace (the pipeline stages),
+        by default the latest pipeline run"""
+        trace = self.last_trace() if trace is None else trace
+        timings = {}
+        for span in trace:
+            if span['depth'] == 1:
+                timings[span['name']] = timings.get(span['name'], 0.0) + span['duration']
+        return timings
+    def summary(self):
+        """{span name: count, sum, mean, min, max, p50, p95, p99} in seconds"""
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+    def to_json(self, indent=None):
+        return json.dumps({'spans': self.summary(), 'last_trace': self.last_trace()}, indent=indent)
+    def to_prometheus(self, metric='kmrl_span_duration_seconds'):
+        """Prometheus text exposition: one summary (quantiles, _sum, _count) labelled per span"""
+        lines = [f"# HELP {metric} Duration of traced pipeline spans.", f"# TYPE {metric} summary"]
+        for name, summary in self.summary().items():
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{metric}{{span="{label}",quantile="{q}"}} {summary[f"p{round(q * 100)}"]:.9g}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {summary["sum"]:.9g}')
+            lines.append(f'{metric}_count{{span="{label}"}} {summary["count"]}')
+        return '\n'.join(lines) + '\n'
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.last_traces = {}
+
+# Process-wide tracer: modules decorate hot helpers with @traced() and the pipeline opens spans
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.traced
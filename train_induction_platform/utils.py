@@ -1,4 +1,3 @@
-import streamlit as st
 import pandas as pd
 import numpy as np
 import random
@@ -9,14 +8,13 @@ import math
 import threading
 import queue
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import requests
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
 import warnings
+from fleet_store import attached_fleet, register_derived_field
+from tracing import traced
 
 def calculate_ai_score(trainset):
     """ Calculate an AI score for a trainset based on multiple factors.
@@ -54,4 +52,76 @@ def calculate_ai_score(trainset):
     score = max(0, min(100, score))
     return score, reasons
 # Enhanced Data Generation & Simulation
-# Enhanced Data Simulation
\ No newline at end of file
+# Enhanced Data Simulation
+# Fields read by calculate_ai_score(s); changes elsewhere cannot move the score
+AI_SCORE_FIELDS = {'fitness.overall_valid', 'job_cards.open', 'mileage.component_wear.brake_pads',
+                   'mileage.component_wear.bogies', 'mileage.component_wear.hvac', 'cleaning.interior_status',
+                   'cleaning.exterior_status', 'operational.reliability_score', 'branding.exposure_deficit'}
+# Reason bits returned by calculate_ai_scores, in the order calculate_ai_score lists them
+REASON_INVALID_FITNESS = 1
+REASON_OPEN_JOB_CARDS = 2
+REASON_HIGH_WEAR = 4
+REASON_REQUIRES_CLEANING = 8
+REASON_RELIABILITY = 16
+REASON_BRANDING_DEFICIT = 32
+def _ai_score_inputs(trainsets):
+    """Columns needed for AI scoring, read from the fleet store when the trainsets are views"""
+    store, rows = attached_fleet(trainsets)
+    if store is not None:
+        return {
+            'overall_valid': store.column('fitness.overall_valid')[rows],
+            'open_jobs': store.column('job_cards.open')[rows],
+            'wear_sum': (store.column('mileage.component_wear.brake_pads')[rows] +
+                         store.column('mileage.component_wear.bogies')[rows] +
+                         store.column('mileage.component_wear.hvac')[rows]),
+            'needs_cleaning': ((store.column('cleaning.interior_status')[rows] != store.category_code('cleaning.interior_status', 'Clean')) |
+                               (store.column('cleaning.exterior_status')[rows] != store.category_code('cleaning.exterior_status', 'Clean'))),
+            'reliability': store.column('operational.reliability_score')[rows],
+            'exposure_deficit': store.column('branding.exposure_deficit')[rows]
+        }
+    return {
+        'overall_valid': np.array([bool(t['fitness']['overall_valid']) for t in trainsets], dtype=bool),
+        'open_jobs': np.array([t['job_cards']['open'] for t in trainsets]),
+        'wear_sum': np.array([sum(t['mileage']['component_wear'].values()) for t in trainsets], dtype=float),
+        'needs_cleaning': np.array([t['cleaning']['interior_status'] != "Clean" or t['cleaning']['exterior_status'] != "Clean"
+                                    for t in trainsets], dtype=bool),
+        'reliability': np.array([t['operational']['reliability_score'] for t in trainsets]),
+        'exposure_deficit': np.array([t['branding']['exposure_deficit'] for t in trainsets])
+    }
+@traced()
+def calculate_ai_scores(trainsets):
+    """ Batch version of calculate_ai_score for a whole fleet.
+    Returns: (scores: int array, reason_bits: int array); use score_reasons() to get the strings """
+    trainsets = list(trainsets)
+    if not trainsets:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cols = _ai_score_inputs(trainsets)
+    invalid = ~cols['overall_valid']
+    has_jobs = cols['open_jobs'] > 0
+    high_wear = cols['wear_sum'] / 3 > 70
+    deficit = cols['exposure_deficit'] > 10
+    score = (100 - 30 * invalid - np.where(has_jobs, np.minimum(20, cols['open_jobs'] * 5), 0)
+             - 20 * high_wear - 10 * cols['needs_cleaning'] - 10 * deficit
+             + np.floor_divide(cols['reliability'] - 70, 2))
+    reason_bits = (REASON_INVALID_FITNESS * invalid | REASON_OPEN_JOB_CARDS * has_jobs |
+                   REASON_HIGH_WEAR * high_wear | REASON_REQUIRES_CLEANING * cols['needs_cleaning'] |
+                   REASON_RELIABILITY | REASON_BRANDING_DEFICIT * deficit)
+    return np.clip(score, 0, 100).astype(np.int64), reason_bits.astype(np.int64)
+def score_reasons(trainset, reason_bits):
+    """Reason strings for one trainset's reason bitmask, as calculate_ai_score would list them"""
+    reasons = []
+    if reason_bits & REASON_INVALID_FITNESS:
+        reasons.append("Invalid fitness certificate")
+    if reason_bits & REASON_OPEN_JOB_CARDS:
+        reasons.append(f"{trainset['job_cards']['open']} open job cards")
+    if reason_bits & REASON_HIGH_WEAR:
+        reasons.append("High component wear")
+    if reason_bits & REASON_REQUIRES_CLEANING:
+        reasons.append("Requires cleaning")
+    if reason_bits & REASON_RELIABILITY:
+        reasons.append(f"Reliability score {trainset['operational']['reliability_score']}")
+    if reason_bits & REASON_BRANDING_DEFICIT:
+        reasons.append("Branding exposure deficit")
+    return reasons
+# Fleet views expose 'score_reasons' lazily, decoded from the bitmask on first read
+register_derived_field('score_reasons', 'score_reason_bits', lambda t: score_reasons(t, t['score_reason_bits']))